@@ -20,15 +20,19 @@ BOOTSTRAP_FLAG="/app/.bootstrap_done"
 
 # One-time jobs (set to 1 for first deploy)
 : "${IMPORT_MEALDB:=0}"
-: "${TOKENIZE_INGREDIENTS:=0}"   # maps to: python manage.py backfill_tokens
 : "${EMBED_MEALS:=0}"            # maps to: python manage.py embed_meals
 
+# Every start: re-tokenize rows left stale by a NORMALIZER_VERSION bump
+# (stale-only, so a start with nothing to do costs two count queries)
+: "${TOKENIZE_INGREDIENTS:=1}"   # maps to: python manage.py backfill_tokens
+
 # args
 : "${MEALDB_LIMIT:=0}"
 : "${MEALDB_SLEEP:=0.25}"
 : "${TOKENS_BATCH_SIZE:=300}"
 : "${TOKENS_LIMIT:=0}"
 : "${TOKENS_WITH_SYNONYMS:=1}"
+: "${TOKENS_WORKERS:=2}"
 
 echo "[entrypoint] DB=${DB_HOST}:${DB_PORT} name=${DB_NAME} user=${DB_USER}"
 
@@ -95,15 +99,6 @@ if [[ "${do_bootstrap}" == "1" ]]; then
     python manage.py import_mealdb --sleep "${MEALDB_SLEEP}" --limit "${MEALDB_LIMIT}"
   fi
 
-  if [[ "${TOKENIZE_INGREDIENTS}" == "1" ]]; then
-    echo "[entrypoint] backfill_tokens"
-    if [[ "${TOKENS_WITH_SYNONYMS}" == "1" ]]; then
-      python manage.py backfill_tokens --with-synonyms --batch-size "${TOKENS_BATCH_SIZE}" --limit "${TOKENS_LIMIT}"
-    else
-      python manage.py backfill_tokens --batch-size "${TOKENS_BATCH_SIZE}" --limit "${TOKENS_LIMIT}"
-    fi
-  fi
-
   if [[ "${EMBED_MEALS}" == "1" ]]; then
     echo "[entrypoint] embed_meals"
     python manage.py embed_meals
@@ -115,5 +110,15 @@ if [[ "${do_bootstrap}" == "1" ]]; then
   fi
 fi
 
+# Stale-token backfill (after the bootstrap import, so imported rows get synonyms)
+if [[ "${TOKENIZE_INGREDIENTS}" == "1" ]]; then
+  echo "[entrypoint] backfill_tokens (stale rows only)"
+  if [[ "${TOKENS_WITH_SYNONYMS}" == "1" ]]; then
+    python manage.py backfill_tokens --with-synonyms --batch-size "${TOKENS_BATCH_SIZE}" --limit "${TOKENS_LIMIT}" --workers "${TOKENS_WORKERS}"
+  else
+    python manage.py backfill_tokens --batch-size "${TOKENS_BATCH_SIZE}" --limit "${TOKENS_LIMIT}" --workers "${TOKENS_WORKERS}"
+  fi
+fi
+
 echo "[entrypoint] Exec: $*"
 exec "$@"
\ No newline at end of file
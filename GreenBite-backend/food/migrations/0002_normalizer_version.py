@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlogsys',
+            name='normalizer_version',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+    ]
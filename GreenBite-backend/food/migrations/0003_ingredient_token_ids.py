@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0002_normalizer_version'),
+        ('recipes', '0004_ingredient_token_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlogsys',
+            name='name_token',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipes.ingredienttoken'),
+        ),
+    ]
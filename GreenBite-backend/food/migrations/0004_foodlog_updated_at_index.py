@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0003_ingredient_token_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodlogsys',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
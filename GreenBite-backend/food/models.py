@@ -3,7 +3,7 @@ from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
-from project.utils.normalize import normalize_ingredient_name
+from project.utils.normalize import NORMALIZER_VERSION, normalize_many
 from django.core.validators import MinValueValidator
 from django.conf import settings
 
@@ -134,8 +134,16 @@ class FoodLogSys(models.Model):
         choices=StorageTypeChoices.choices
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     name_normalized = models.CharField(max_length=120, blank=True, default="", db_index=True)
+    normalizer_version = models.PositiveSmallIntegerField(default=0, db_index=True)
+    name_token = models.ForeignKey(
+        "recipes.IngredientToken",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
     is_consumed = models.BooleanField(default=False, db_index=True)
 
     def consume(self, used_qty: Decimal):
@@ -152,9 +160,31 @@ class FoodLogSys(models.Model):
             self.is_consumed = True
         self.save(update_fields=["quantity", "is_consumed"])
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # name as loaded; save() only re-derives name_normalized/name_token when it changes
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
+    def _name_changed(self) -> bool:
+        return (
+            self._state.adding
+            or self.name != getattr(self, "_loaded_name", None)
+            or self.normalizer_version != NORMALIZER_VERSION
+        )
+
     def save(self, *args, **kwargs):
-        self.name_normalized = normalize_ingredient_name(self.name)
+        update_fields = kwargs.get("update_fields")
+        if (update_fields is None or "name" in update_fields) and self._name_changed():
+            self.name_normalized = normalize_many([self.name])[0]
+            self.normalizer_version = NORMALIZER_VERSION
+            tokens = self._meta.get_field("name_token").related_model.objects
+            self.name_token_id = tokens.ids_for([self.name_normalized]).get(self.name_normalized)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "name_normalized", "normalizer_version", "name_token"}
         super().save(*args, **kwargs)
+        self._loaded_name = self.name
 
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit}) - Expires on {self.expiry_date}"
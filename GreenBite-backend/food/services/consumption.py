@@ -0,0 +1,131 @@
+"""
+Batched FoodLogSys consumption.
+
+consume_food_logs() validates every line up front, locks the affected rows
+once, applies all deductions with a single bulk_update, writes FoodLogUsage
+rows with a single bulk_create and bumps the user's `foodlog` cache version
+once the transaction commits.
+"""
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from food.models import FoodLogSys, FoodLogUsage
+from food.utils.caching import bump_list_version, detail_key
+
+logger = logging.getLogger(__name__)
+
+FOODLOG_NAMESPACE = "foodlog"
+
+
+class ConsumptionError(ValueError):
+    """A consumption request that can't be applied; nothing was written."""
+
+
+@dataclass
+class ConsumptionResult:
+    # foodlog_id -> quantity actually deducted
+    consumed: dict = field(default_factory=dict)
+    fully_consumed: list = field(default_factory=list)
+    usages: list = field(default_factory=list)
+
+
+def _invalidate_foodlog_cache(user_id: int, foodlog_ids: list[int]) -> None:
+    bump_list_version(FOODLOG_NAMESPACE, user_id)
+    cache.delete_many([detail_key(FOODLOG_NAMESPACE, user_id, pk) for pk in foodlog_ids])
+
+
+def consume_food_logs(
+    user,
+    lines,
+    *,
+    recipe=None,
+    meal=None,
+    allowed_norms=None,
+    fresh_only: bool = False,
+    lenient: bool = False,
+    record_usage: bool = True,
+) -> ConsumptionResult:
+    """
+    lines: iterable of (foodlog_id, quantity); repeated ids are summed.
+    allowed_norms: if given, every food log's name_normalized must be in it.
+    fresh_only: reject food logs that already expired.
+    lenient: consume what is available instead of failing on short quantity,
+             and skip missing/already-consumed logs and non-positive quantities.
+    """
+    wanted: dict[int, Decimal] = {}
+    for foodlog_id, qty in lines:
+        qty = Decimal(str(qty))
+        if qty <= 0:
+            if lenient:
+                continue
+            raise ConsumptionError(f"used_quantity must be > 0 for foodlog {foodlog_id}")
+        wanted[foodlog_id] = wanted.get(foodlog_id, Decimal("0")) + qty
+
+    result = ConsumptionResult()
+    if not wanted:
+        return result
+
+    with transaction.atomic():
+        qs = FoodLogSys.objects.select_for_update().filter(
+            user=user,
+            id__in=list(wanted),
+            is_consumed=False,
+        )
+        if fresh_only:
+            qs = qs.filter(expiry_date__gte=timezone.now().date())
+        log_map = {fl.id: fl for fl in qs}
+
+        # validate everything before touching any row
+        for foodlog_id, qty in wanted.items():
+            fl = log_map.get(foodlog_id)
+            if fl is None:
+                if lenient:
+                    continue
+                raise ConsumptionError(f"Invalid foodlog_id: {foodlog_id}")
+            if allowed_norms is not None and fl.name_normalized not in allowed_norms:
+                raise ConsumptionError(f"FoodLog {fl.id} not part of this recipe ingredients")
+            if fl.quantity < qty and not lenient:
+                raise ConsumptionError(
+                    f"Not enough quantity for foodlog {fl.id}: have {fl.quantity}, need {qty}"
+                )
+
+        now = timezone.now()
+        for foodlog_id, qty in wanted.items():
+            fl = log_map.get(foodlog_id)
+            if fl is None:
+                continue
+            if fl.quantity < qty:
+                logger.warning(
+                    "Not enough %s: have %s, need %s. Using available quantity.",
+                    fl.name, fl.quantity, qty,
+                )
+                qty = fl.quantity
+
+            fl.quantity = fl.quantity - qty
+            if fl.quantity <= 0:
+                fl.quantity = Decimal("0")
+                fl.is_consumed = True
+                result.fully_consumed.append(fl.id)
+            fl.updated_at = now
+            result.consumed[fl.id] = qty
+
+            if record_usage and qty > 0:
+                result.usages.append(
+                    FoodLogUsage(user=user, recipe=recipe, meal=meal, foodlog=fl, used_quantity=qty)
+                )
+
+        if not log_map:
+            return result
+        FoodLogSys.objects.bulk_update(list(log_map.values()), ["quantity", "is_consumed", "updated_at"])
+        if result.usages:
+            FoodLogUsage.objects.bulk_create(result.usages)
+
+        ids = list(log_map)
+        transaction.on_commit(lambda: _invalidate_foodlog_cache(user.id, ids))
+
+    return result
@@ -0,0 +1,152 @@
+"""
+Food log summary and category breakdown computed by Postgres.
+
+One `GROUP BY GROUPING SETS ((), (unit), (category))` query over the user's
+available food logs (unconsumed, not expired, in stock) returns the grand
+total, the per-unit and the per-category aggregates; conditional aggregates
+(`FILTER (WHERE ...)`) add the expiring counts, their average days left and
+the expiring rows themselves as one JSON array. Python only reshapes the
+rows into the JSON the summary endpoints have always returned.
+
+The cached variants are keyed by the user's `foodlog` list version, so any
+food log write (which bumps it) retires them.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from food.models import FoodLogSys
+from food.utils.caching import get_list_version
+
+FOODLOG_NAMESPACE = "foodlog"
+EXPIRING_DAYS = 3
+TOP_EXPIRING = 5
+SUMMARY_TTL_SECONDS = 5 * 60
+
+_SUMMARY_SQL = """
+SELECT
+    GROUPING(unit),
+    GROUPING(category),
+    unit,
+    category,
+    COUNT(*),
+    COALESCE(SUM(quantity), 0),
+    COUNT(DISTINCT NULLIF(name_normalized, '')),
+    COUNT(*) FILTER (WHERE expiry_date <= %(soon)s),
+    AVG(expiry_date - %(today)s) FILTER (WHERE expiry_date <= %(soon)s),
+    JSONB_AGG(
+        JSONB_BUILD_OBJECT(
+            'id', id,
+            'name', name,
+            'quantity', quantity,
+            'unit', unit,
+            'expiry_date', expiry_date,
+            'days_left', expiry_date - %(today)s,
+            'category', category
+        )
+        ORDER BY expiry_date, id
+    ) FILTER (WHERE expiry_date <= %(soon)s)
+FROM {table}
+WHERE user_id = %(user_id)s
+  AND NOT is_consumed
+  AND expiry_date >= %(today)s
+  AND quantity > 0
+GROUP BY GROUPING SETS ((), (unit), (category))
+"""
+
+
+def _aggregate(user_id: int, today: date) -> dict:
+    """The grouping-set rows, folded into plain per-unit / per-category dicts."""
+    sql = _SUMMARY_SQL.format(table=connection.ops.quote_name(FoodLogSys._meta.db_table))
+    params = {"user_id": user_id, "today": today, "soon": today + timedelta(days=EXPIRING_DAYS)}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    agg = {
+        "total_items": 0,
+        "unique_ingredients": 0,
+        "expiring_soon": 0,
+        "avg_days_left": None,
+        "expiring_items": [],
+        "quantity_by_unit": {},
+        "by_category": {},
+        "generated_at": timezone.now().isoformat(),
+    }
+    for g_unit, g_category, unit, category, count, qty, unique, expiring, avg_days, items in rows:
+        if g_unit and g_category:
+            agg["total_items"] = count
+            agg["unique_ingredients"] = unique
+            agg["expiring_soon"] = expiring
+            agg["avg_days_left"] = round(float(avg_days), 1) if avg_days is not None else None
+            # Django keeps jsonb as text on raw cursors (JSONField parses it itself)
+            agg["expiring_items"] = json.loads(items) if isinstance(items, str) else (items or [])
+        elif g_category:
+            key = unit or "unit"
+            agg["quantity_by_unit"][key] = agg["quantity_by_unit"].get(key, Decimal("0")) + qty
+        else:
+            key = category or "other"
+            entry = agg["by_category"].setdefault(key, {"count": 0, "total_quantity": Decimal("0")})
+            entry["count"] += count
+            entry["total_quantity"] += qty
+    return agg
+
+
+def _cached_aggregate(user_id: int) -> dict:
+    today = timezone.now().date()
+    version = get_list_version(FOODLOG_NAMESPACE, user_id)
+    key = f"{FOODLOG_NAMESPACE}:summary:{user_id}:v{version}:{today.isoformat()}"
+    agg = cache.get(key)
+    if agg is None:
+        agg = _aggregate(user_id, today)
+        cache.set(key, agg, timeout=SUMMARY_TTL_SECONDS)
+    return agg
+
+
+def _summary(agg: dict) -> dict:
+    total = agg["total_items"]
+    expiring = [
+        {**item, "quantity": float(item["quantity"])}
+        for item in agg["expiring_items"]
+    ]
+    return {
+        "total_items": total,
+        "unique_ingredients": agg["unique_ingredients"],
+        "expiring_soon": agg["expiring_soon"],
+        "expiring_items": expiring,
+        "by_category": {
+            cat: {
+                "count": info["count"],
+                "total_quantity": float(info["total_quantity"]),
+                "share": round((info["count"] / total) * 100, 1) if total else 0.0,
+            }
+            for cat, info in agg["by_category"].items()
+        },
+        "quantity_by_unit": {unit: float(qty) for unit, qty in agg["quantity_by_unit"].items()},
+        "avg_days_left": agg["avg_days_left"],
+        "soonest_expiring": expiring[0] if expiring else None,
+        "top_expiring": expiring[:TOP_EXPIRING],
+        "generated_at": agg["generated_at"],
+    }
+
+
+def food_log_summary(user, today: date | None = None) -> dict:
+    """Totals, per-unit quantities, category shares and expiring items, from one query."""
+    return _summary(_aggregate(user.id, today or timezone.now().date()))
+
+
+def category_breakdown(user, today: date | None = None) -> dict:
+    """{category: {count, total_quantity}} over the user's available food logs."""
+    return _aggregate(user.id, today or timezone.now().date())["by_category"]
+
+
+def cached_food_log_summary(user) -> dict:
+    return _summary(_cached_aggregate(user.id))
+
+
+def cached_category_breakdown(user) -> dict:
+    return _cached_aggregate(user.id)["by_category"]
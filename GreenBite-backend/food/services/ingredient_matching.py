@@ -0,0 +1,139 @@
+"""
+In-memory ingredient -> FoodLogSys matching over one user's inventory.
+
+InventoryMatcher loads the user's food logs once and indexes their distinct
+normalized names by trigram (pg_trgm style: words padded "  w ") and by
+synonym base. Resolving a recipe ingredient is then a dict walk instead of an
+`icontains` query, and tolerates near-variants:
+
+    exact normalized name                   1.0
+    same synonym base ("steak" ~ "beef")    SYNONYM_SCORE
+    inventory name holds every word of it   CONTAINMENT_SCORE ("chicken" ~ "chicken breast")
+    otherwise trigram similarity            |A & B| / |A | B|  ("chiken breast" ~ "chicken breast")
+
+Containment only runs one way: an inventory name made of a subset of the
+ingredient's words is a different ingredient ("butter" is not "peanut
+butter", "milk" is not "coconut milk") and is never matched, whatever its
+trigram score. Matches under the threshold are dropped.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from food.models import FoodLogSys
+from project.utils.ingredient_synonyms import SYNONYM_INDEX
+from project.utils.normalize import normalize_many
+
+DEFAULT_THRESHOLD = 0.5
+SYNONYM_SCORE = 0.9
+CONTAINMENT_SCORE = 0.8
+
+
+def _trigrams(name: str) -> frozenset:
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _base(name: str) -> str:
+    hit = SYNONYM_INDEX.get(name)
+    return hit[0] if hit else name
+
+
+@dataclass(frozen=True)
+class IngredientMatch:
+    ingredient: str
+    normalized: str
+    matched_name: str
+    score: float
+    # soonest expiry first
+    logs: tuple
+
+    @property
+    def foodlog_ids(self) -> list[int]:
+        return [fl.id for fl in self.logs]
+
+
+class InventoryMatcher:
+    def __init__(self, logs, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+
+        by_name = defaultdict(list)
+        for fl in sorted(logs, key=lambda fl: (fl.expiry_date, fl.id)):
+            if fl.name_normalized:
+                by_name[fl.name_normalized].append(fl)
+
+        self._names = list(by_name)
+        self._logs = [tuple(by_name[n]) for n in self._names]
+        self._words = [frozenset(n.split()) for n in self._names]
+        self._grams = [_trigrams(n) for n in self._names]
+        self._exact = {n: i for i, n in enumerate(self._names)}
+
+        self._by_gram = defaultdict(list)
+        self._by_base = defaultdict(list)
+        for i, name in enumerate(self._names):
+            for gram in self._grams[i]:
+                self._by_gram[gram].append(i)
+            self._by_base[_base(name)].append(i)
+
+    @classmethod
+    def for_user(cls, user, *, fresh_only: bool = False, threshold: float = DEFAULT_THRESHOLD):
+        """
+        The user's unconsumed food logs. fresh_only reads the shared inventory
+        snapshot (non-expired, in stock) instead of querying.
+        """
+        if fresh_only:
+            from meal_plans.services.inventory import InventorySnapshot
+
+            return cls(InventorySnapshot.for_user(user).items(), threshold=threshold)
+        return cls(FoodLogSys.objects.filter(user=user, is_consumed=False), threshold=threshold)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _best(self, norm: str) -> tuple[int, float] | None:
+        i = self._exact.get(norm)
+        if i is not None:
+            return i, 1.0
+
+        scores = {}
+        for j in self._by_base.get(_base(norm), ()):
+            scores[j] = SYNONYM_SCORE
+
+        grams = _trigrams(norm)
+        shared = defaultdict(int)
+        for gram in grams:
+            for j in self._by_gram.get(gram, ()):
+                shared[j] += 1
+
+        words = frozenset(norm.split())
+        for j, n in shared.items():
+            if self._words[j] < words:
+                continue
+            score = n / (len(grams) + len(self._grams[j]) - n)
+            if words <= self._words[j]:
+                score = max(score, CONTAINMENT_SCORE)
+            scores[j] = max(scores.get(j, 0.0), score)
+
+        if not scores:
+            return None
+        # best score, then the name whose soonest log expires first
+        j = max(scores, key=lambda j: (scores[j], -self._logs[j][0].expiry_date.toordinal(), -j))
+        return (j, scores[j]) if scores[j] >= self.threshold else None
+
+    def match_many(self, ingredients) -> list[IngredientMatch | None]:
+        """One result per ingredient (raw text), in order; None when nothing is close enough."""
+        ingredients = list(ingredients)
+        out = []
+        for raw, norm in zip(ingredients, normalize_many(ingredients)):
+            best = self._best(norm) if norm and self._names else None
+            if best is None:
+                out.append(None)
+                continue
+            j, score = best
+            out.append(IngredientMatch(raw, norm, self._names[j], round(score, 3), self._logs[j]))
+        return out
+
+    def match(self, ingredient: str) -> IngredientMatch | None:
+        return self.match_many([ingredient])[0]
@@ -0,0 +1,20 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from meal_plans.services.inventory import invalidate_inventory_snapshot, snapshot_key
+
+from .models import FoodLogSys
+
+
+@receiver([post_save, post_delete], sender=FoodLogSys)
+def invalidate_inventory_on_foodlog_change(sender, instance, **kwargs):
+    """
+    Backstop for write paths that don't bump the foodlog version themselves.
+    The current snapshot is dropped now; the version moves once, on commit,
+    which also retires a snapshot re-cached by a reader mid-transaction.
+    """
+    user_id = instance.user_id
+    cache.delete(snapshot_key(user_id))
+    transaction.on_commit(lambda: invalidate_inventory_snapshot(user_id))
@@ -9,6 +9,10 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from food.models import FoodLogSys, WasteLog
+from food.utils.caching import get_list_version
+from food.services.food_log_summary import cached_food_log_summary, food_log_summary
+from food.services.ingredient_matching import InventoryMatcher
+from meal_plans.services.inventory import InventoryService
 
 TEST_CACHES = {
     "default": {
@@ -233,4 +237,148 @@ class WasteLogAPITests(APITestCase):
         log = self._create_waste_log(name="DeleteMe")
         res = self.client.delete(f"/api/waste-log/{log.id}/")
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(WasteLog.objects.filter(id=log.id).exists())
\ No newline at end of file
+        self.assertFalse(WasteLog.objects.filter(id=log.id).exists())
+
+@override_settings(CACHES=TEST_CACHES)
+class InventoryMatcherTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="matcher@test.com",
+            password="pass1234",
+            is_active=True,
+        )
+
+    def _log(self, name, days=3):
+        return FoodLogSys.objects.create(
+            user=self.user,
+            name=name,
+            quantity=Decimal("1"),
+            unit="kg",
+            expiry_date=date.today() + timedelta(days=days),
+            storage_type="fridge",
+        )
+
+    def test_resolves_variants_in_memory(self):
+        breast = self._log("Chicken Breast")
+        late = self._log("Tomato", days=9)
+        soon = self._log("tomato", days=1)
+        steak = self._log("Steak")
+
+        matcher = InventoryMatcher.for_user(self.user)
+        with self.assertNumQueries(0):
+            exact, typo, contained, synonym, miss = matcher.match_many(
+                ["2 Tomatos", "chiken breast", "chicken", "beef", "chocolate"]
+            )
+
+        self.assertEqual(exact.score, 1.0)
+        self.assertEqual(exact.foodlog_ids, [soon.id, late.id])
+        self.assertEqual(typo.foodlog_ids, [breast.id])
+        self.assertGreaterEqual(typo.score, 0.5)
+        self.assertEqual(contained.matched_name, "chicken breast")
+        self.assertEqual(synonym.foodlog_ids, [steak.id])
+        self.assertIsNone(miss)
+
+    def test_item_named_by_part_of_an_ingredient_does_not_match(self):
+        for name in ["Butter", "Rice", "Chicken", "Milk", "Egg", "Olive"]:
+            self._log(name)
+
+        matcher = InventoryMatcher.for_user(self.user)
+        ingredients = ["Peanut Butter", "Rice Vinegar", "chicken stock", "Coconut Milk", "Egg Noodles", "Olive Oil"]
+        for ingredient, match in zip(ingredients, matcher.match_many(ingredients)):
+            self.assertIsNone(match, ingredient)
+        self.assertEqual(matcher.match("Chicken").matched_name, "chicken")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FoodLogSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="summary@test.com",
+            password="pass1234",
+            is_active=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        for name, qty, unit, days, category in [
+            ("Tomato", "2", "kg", 1, "vegetables"),
+            ("tomato", "1.5", "kg", 10, "vegetables"),
+            ("Chicken Breast", "500", "g", 3, "meat"),
+            ("Milk", "1", "l", 2, ""),
+            ("Old Milk", "1", "l", -1, "dairy"),
+            ("Empty Jar", "0", "g", 5, "pantry"),
+        ]:
+            self._log(name, qty, unit, days, category)
+
+    def _log(self, name, qty, unit, days, category):
+        return FoodLogSys.objects.create(
+            user=self.user,
+            name=name,
+            quantity=Decimal(qty),
+            unit=unit,
+            expiry_date=date.today() + timedelta(days=days),
+            category=category,
+            storage_type="fridge",
+        )
+
+    def test_one_query_matches_the_python_summary(self):
+        with self.assertNumQueries(1):
+            summary = food_log_summary(self.user)
+        expected = InventoryService(self.user).get_food_log_summary()
+
+        summary.pop("generated_at")
+        expected.pop("generated_at")
+        self.assertEqual(summary, expected)
+        self.assertEqual(summary["by_category"]["other"]["count"], 1)
+        self.assertEqual(summary["quantity_by_unit"], {"kg": 3.5, "g": 500.0, "l": 1.0})
+        self.assertEqual([i["name"] for i in summary["expiring_items"]], ["Tomato", "Milk", "Chicken Breast"])
+
+    def test_cached_summary_follows_the_foodlog_version(self):
+        self.assertEqual(cached_food_log_summary(self.user)["total_items"], 4)
+        with self.assertNumQueries(0):
+            cached_food_log_summary(self.user)
+
+        # the version moves when the write commits
+        rice = self._log("Rice", "1", "kg", 30, "grains")
+        with self.captureOnCommitCallbacks(execute=True):
+            rice.save(update_fields=["quantity"])
+        response = self.client.get("/api/food/summary/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_items"], 5)
+
+        response = self.client.get("/api/food/category-breakdown/")
+        self.assertEqual(response.data["grains"]["count"], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FoodLogSaveTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="save@test.com",
+            password="pass1234",
+            is_active=True,
+        )
+        self.log = FoodLogSys.objects.create(
+            user=self.user, name="Tomato", quantity=Decimal("2"), unit="kg",
+            expiry_date=date.today() + timedelta(days=3), category="vegetables",
+        )
+
+    def test_consume_skips_the_name_token_lookup(self):
+        log = FoodLogSys.objects.get(id=self.log.id)
+        token = log.name_token_id
+        with self.assertNumQueries(1):
+            log.consume(Decimal("1"))
+        with self.assertNumQueries(1):
+            log.save()
+        self.assertEqual(log.name_token_id, token)
+
+        log.name = "Cherry Tomato"
+        log.save(update_fields=["name"])
+        log.refresh_from_db()
+        self.assertEqual(log.name_normalized, "cherry tomato")
+        self.assertNotEqual(log.name_token_id, token)
+
+    def test_foodlog_version_moves_once_on_commit(self):
+        before = get_list_version("foodlog", self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log.consume(Decimal("1"))
+            self.assertEqual(get_list_version("foodlog", self.user.id), before)
+        self.assertEqual(get_list_version("foodlog", self.user.id), before + 1)
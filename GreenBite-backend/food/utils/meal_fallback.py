@@ -6,6 +6,7 @@ from recipes.models import MealDBRecipe
 from food.utils.embeddings import embed_text
 from food.utils.similarity import cosine_similarity
 from food.utils.normalize import normalize_ingredient_name
+from recipes.services.token_ids import overlapping_recipes, token_ids
 
 def fallback_meals_from_mealdb(
     ingredients: list[str],
@@ -27,7 +28,8 @@ def fallback_meals_from_mealdb(
     qs = MealDBRecipe.objects.exclude(embedding__isnull=True)
 
     if norms:
-        qs = qs.filter(ingredients_norm__overlap=norms)
+        # int[] && on interned token ids, best overlap first
+        qs = overlapping_recipes(token_ids(norms), qs=qs)
 
     candidates = list(qs[:800])  # safety cap
 
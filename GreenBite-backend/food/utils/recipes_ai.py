@@ -7,6 +7,7 @@ import logging
 from django.conf import settings
 from django.core.cache import cache
 from .prompts import waste_prompt, recipe_prompt, waste_ingredients_only_prompt
+from project.utils.prompt_compiler import dedupe_names, report_prompt
 
 try:
     from openai import OpenAI
@@ -41,16 +42,6 @@ def get_openai_client():
 def _norm(s: str) -> str:
     return " ".join((s or "").lower().strip().split())
 
-def _meal_mentions_any_ingredient(meal: dict, ing_norm: list[str]) -> bool:
-    recipe = _norm(meal.get("recipe") or meal.get("title") or meal.get("name"))
-    desc = _norm(meal.get("description"))
-    ingredients_list = meal.get("ingredients") or []
-    ingredients_text = " ".join(_norm(str(x)) for x in ingredients_list)
-
-    blob = f"{recipe} {desc} {ingredients_text}"
-    return any(i and i in blob for i in ing_norm)
-
-
 def generate_meals_openai(ingredients):
     client = get_openai_client()
     if not client:
@@ -58,25 +49,28 @@ def generate_meals_openai(ingredients):
         scored = fallback_meals_from_mealdb(ingredients or [])
         return [mealdb_recipe_to_ai_shape(m) for _, m in scored]
 
-    ing = [str(i).strip() for i in (ingredients or []) if str(i).strip()][:10]
+    ing = dedupe_names(str(i) for i in (ingredients or []))[:10]
     ing_norm = [_norm(i) for i in ing]
 
     # IMPORTANT: Make your prompt strict (edit recipe_prompt too if needed)
     prompt = recipe_prompt(", ".join(ing) if ing else "")
 
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You are a JSON API. Return ONLY valid JSON. "
+                "No explanations. No markdown. No code blocks."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+    report_prompt("food.recipes_ai.generate_meals", messages, items_in=len(ingredients or []), items_kept=len(ing))
+
     try:
         response = client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a JSON API. Return ONLY valid JSON. "
-                        "No explanations. No markdown. No code blocks."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
+            messages=messages,
             temperature=0.6,
             max_tokens=3500,
             response_format={"type": "json_object"},
@@ -235,11 +229,14 @@ def generate_waste_profile_openai(meal: str = "", ingredients: str = ""):
         .replace("{ingredients}", ingredients_clean)
     )
 
+  waste_input = [{"role": "user", "content": prompt}]
+  report_prompt("food.recipes_ai.waste_profile", waste_input)
+
   try:
     response = client.responses.create(
       model= "gpt-4.1-mini", 
       store = False,
-      input = [{"role": "user", "content": prompt}],
+      input = waste_input,
       text = {"format":{"type": "json_object"}},
     )
 
@@ -9,7 +9,7 @@ from ..serializers import FoodLogSysSerializer
 from ..filters import FoodLogFilter 
 from ..utils.caching import bump_list_version, detail_key, list_key, invalidate_cache
 from ..pagination import FoodLogPagination
-from meal_plans.services.inventory import InventoryService
+from ..services.food_log_summary import cached_category_breakdown, cached_food_log_summary
 from datetime import date, timedelta
 import logging
 logger = logging.getLogger(__name__)
@@ -177,8 +177,7 @@ def expiring_soon(request):
 @permission_classes([IsAuthenticated])
 def food_log_summary(request):
     try:
-        inv = InventoryService(request.user)
-        summary = inv.get_food_log_summary()
+        summary = cached_food_log_summary(request.user)
         return Response(summary, status=status.HTTP_200_OK)
     except Exception as e:
         import traceback
@@ -191,7 +190,5 @@ def food_log_category_breakdown(request):
     """
     Returns a breakdown of food logs by category.
     """
-    inv = InventoryService(request.user)
-    ava = inv.get_available_logs()
-    breakdown = inv._get_category_breakdown(ava)
+    breakdown = cached_category_breakdown(request.user)
     return Response(breakdown, status=status.HTTP_200_OK)
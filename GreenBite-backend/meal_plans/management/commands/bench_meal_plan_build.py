@@ -0,0 +1,104 @@
+"""
+Benchmark MealPlanBuilder.build (bulk day/meal inserts) against the old
+one-INSERT-per-row build, over a grid of plan sizes. Everything runs inside
+a transaction that is rolled back.
+
+    python manage.py bench_meal_plan_build
+    python manage.py bench_meal_plan_build --days 7 14 30 --meals 2 4 --repeat 5
+"""
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from meal_plans.models import MealPlan, MealPlanDay
+from meal_plans.services.meal_plan_builder import MealPlanBuilder
+from meal_plans.services.recipeProvider import RecipeCandidate
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _recipes(n):
+    return [
+        RecipeCandidate(
+            title=f"Recipe {i}",
+            ingredients=[{"name": "rice", "measure": "200g"}, {"name": "onion", "measure": "1"}],
+            source="mealdb",
+            cuisine="Test",
+            instructions="Cook.",
+            metadata={"mealdb_id": str(50000 + i)},
+        )
+        for i in range(n)
+    ]
+
+
+def _legacy_build(builder, recipes):
+    # what MealPlanBuilder.build did before bulk materialization
+    meal_plan = MealPlan.objects.create(
+        user=builder.user, start_date=builder.start_date, days=builder.days, is_confirmed=False
+    )
+    index = 0
+    for day_offset in range(builder.days):
+        plan_day = MealPlanDay.objects.create(
+            meal_plan=meal_plan, date=builder.start_date + timedelta(days=day_offset), is_confirmed=False
+        )
+        for meal_time in builder.meal_times:
+            if index >= len(recipes):
+                break
+            builder._draft(plan_day, meal_time, recipes[index], index).save()
+            index += 1
+    return meal_plan
+
+
+class Command(BaseCommand):
+    help = "Time meal plan materialization against days x meals_per_day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, nargs="+", default=[3, 7, 14, 30])
+        parser.add_argument("--meals", type=int, nargs="+", default=[2, 4])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _time(self, fn, repeat):
+        best, queries = None, 0
+        for _ in range(repeat):
+            try:
+                with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    fn()
+                    elapsed = time.perf_counter() - t0
+                    best = elapsed if best is None else min(best, elapsed)
+                    queries = len(ctx.captured_queries)
+                    raise _Rollback
+            except _Rollback:
+                pass
+        if best is None:
+            raise CommandError("the timed build never completed")
+        return best, queries
+
+    def handle(self, *args, **options):
+        # throwaway user; the whole run is rolled back at the end
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(email="bench-meal-plan@example.com", password=None)
+                self._bench(user, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _bench(self, user, options):
+        self.stdout.write(f"{'days x meals':>13} {'legacy ms':>10} {'queries':>8} {'bulk ms':>9} {'queries':>8} {'speedup':>8}")
+        for days in options["days"]:
+            for meals in options["meals"]:
+                builder = MealPlanBuilder(user, date.today(), days, meals)
+                recipes = _recipes(days * meals)
+                legacy_s, legacy_q = self._time(lambda: _legacy_build(builder, recipes), options["repeat"])
+                bulk_s, bulk_q = self._time(lambda: builder.build(recipes), options["repeat"])
+                self.stdout.write(
+                    f"{days:>6} x {meals:<4} {legacy_s * 1e3:>10.1f} {legacy_q:>8} "
+                    f"{bulk_s * 1e3:>9.1f} {bulk_q:>8} {legacy_s / bulk_s:>7.1f}x"
+                )
@@ -8,12 +8,16 @@ import logging
 from openai import OpenAI
 from django.conf import settings
 from project.utils.normalize import normalize_ingredient_name
+from project.utils.prompt_compiler import fit_names, report_prompt
 from .types import PlannedRecipe
 
 logger = logging.getLogger(__name__)
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+# estimated tokens for the ingredient list in the generation prompt
+INGREDIENT_TOKEN_BUDGET = 200
+
 
 def generate_ai_recipes(food_logs, limit):
     """
@@ -26,7 +30,8 @@ def generate_ai_recipes(food_logs, limit):
     Returns:
         List of PlannedRecipe objects
     """
-    ingredients = [log.name for log in food_logs[:20]]
+    names = [log.name for log in food_logs[:60]]
+    ingredients = fit_names(names, INGREDIENT_TOKEN_BUDGET)[:20]
     
     if not ingredients:
         logger.warning("No ingredients provided for AI recipe generation")
@@ -48,19 +53,22 @@ Return this exact JSON structure:
   {{"title": "Another Recipe", "ingredients": ["ingredient3", "ingredient4"]}}
 ]"""
 
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a recipe generator. Return ONLY valid JSON arrays with no markdown, no code blocks, no explanations. Keep strings short."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    report_prompt("meal_plans.ai_fallback.generate", messages, items_in=len(names), items_kept=len(ingredients))
+
     try:
         response = client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a recipe generator. Return ONLY valid JSON arrays with no markdown, no code blocks, no explanations. Keep strings short."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            messages=messages,
             temperature=0.7,
             max_tokens=4500,
             response_format={"type": "json_object"}  # ✅ Force JSON mode (if supported)
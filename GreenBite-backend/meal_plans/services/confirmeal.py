@@ -1,33 +1,16 @@
 import logging
-import re
 from django.db import transaction
 from django.utils import timezone
 from meal_plans.models import MealPlanDay, MealPlanMeal, MealPlanFoodUsage
 from food.models import FoodLogSys,Meal
 from decimal import Decimal
 from food.utils.caching import bump_list_version, invalidate_cache
+from food.services.consumption import consume_food_logs
+from food.services.ingredient_matching import InventoryMatcher
 
 
 logger = logging.getLogger(__name__)
 
-_UNIT_WORDS = {
-    "g", "kg", "mg", "lb", "lbs", "oz", "ml", "l",
-    "tsp", "tbsp", "cup", "cups", "teaspoon", "tablespoon",
-    "pinch", "clove", "cloves", "slice", "slices"
-}
-
-
-def _core_ingredient_name(text: str) -> str:
-    """
-    Best-effort normalization for matching inventory items.
-    Example: "2 tbsp Olive Oil" -> "olive oil"
-    """
-    s = (text or "").strip().lower()
-    s = re.sub(r"[\d/]+", " ", s)          # remove qty like 2, 1/2
-    s = re.sub(r"[^a-z\s-]", " ", s)       # remove punctuation
-    tokens = [t for t in s.split() if t and t not in _UNIT_WORDS]
-    return " ".join(tokens).strip()
-
 
 @transaction.atomic
 def confirm_meal_plan_day(meal_plan_day, user):
@@ -51,31 +34,24 @@ def confirm_meal_plan_day(meal_plan_day, user):
         raise ValueError("This day is already confirmed")
     bump_list_version("meals", user.id)
 
-    # Optional: if you create/update FoodLogSys during confirmation
-    bump_list_version("foodlog", user.id)
-
-    # Get all meals for this day (QuerySet, not list)
-    meals = MealPlanMeal.objects.filter(
-        meal_plan_day=meal_plan_day
-    ).select_related('meal', 'original_meal').prefetch_related('planned_usages__food_log')
+    # Get all meals for this day, with their planned usages, in one go
+    meals = list(
+        MealPlanMeal.objects.filter(meal_plan_day=meal_plan_day)
+        .select_related('meal', 'original_meal')
+        .prefetch_related('planned_usages__food_log')
+    )
 
-    if not meals.exists():
+    if not meals:
         raise ValueError("No meals found for this day")
 
-    logger.info(f"Confirming day {meal_plan_day.date} with {meals.count()} meals")
+    logger.info(f"Confirming day {meal_plan_day.date} with {len(meals)} meals")
+    meals = [meal for meal in meals if not meal.is_skipped]
 
-    # Track consumption per food log
-    consumption_tracker = {}
-
-    for meal in meals:
-        # Skip skipped meals
-        if meal.is_skipped:
-            logger.debug(f"Skipping meal {meal.id} ({meal.meal_time}) - skipped")
-            continue
-
-        # Create Meal only on confirmation
-        if meal.meal is None:
-            meal.meal = Meal.objects.create(
+    # Create Meals only on confirmation (one INSERT, one UPDATE)
+    drafts = [meal for meal in meals if meal.meal is None]
+    if drafts:
+        created = Meal.objects.bulk_create([
+            Meal(
                 user=user,
                 recipe=meal.draft_title or "",
                 ingredients=meal.draft_ingredients or [],
@@ -87,97 +63,76 @@ def confirm_meal_plan_day(meal_plan_day, user):
                 mealTime=meal.meal_time,
                 source_mealdb_id=(meal.draft_source_mealdb_id or None),
             )
-            meal.save(update_fields=["meal"])
-
-
-        planned_usages_qs = meal.planned_usages.select_related("food_log")
-
-        if planned_usages_qs.exists():
-            for usage in planned_usages_qs:
-                food_log = usage.food_log
-                quantity = usage.planned_quantity
+            for meal in drafts
+        ])
+        for meal, created_meal in zip(drafts, created):
+            meal.meal = created_meal
+        MealPlanMeal.objects.bulk_update(drafts, ["meal"])
 
-                if food_log.id not in consumption_tracker:
-                    consumption_tracker[food_log.id] = {"food_log": food_log, "total_quantity": Decimal("0")}
+    # Track consumption per food log
+    consumption_tracker = {}
 
-                consumption_tracker[food_log.id]["total_quantity"] += quantity
+    def track(food_log, quantity):
+        if food_log.id not in consumption_tracker:
+            consumption_tracker[food_log.id] = {"food_log": food_log, "total_quantity": Decimal("0")}
+        consumption_tracker[food_log.id]["total_quantity"] += quantity
 
+    # Meals built by MealPlanOptimizer carry planned usages; applying them is
+    # pure bookkeeping. Meals without any (plans from before the optimizer,
+    # replaced or added meals, recipes nothing could be allocated to) fall
+    # back to estimating 100 units per matched ingredient.
+    matcher = None
+    for meal in meals:
+        usages = meal.planned_usages.all()
+        if usages:
+            for usage in usages:
+                track(usage.food_log, usage.planned_quantity)
                 logger.debug(
-                    f"Meal {meal.meal_time}: {food_log.name} - {quantity}g (from planned usage)"
+                    f"Meal {meal.meal_time}: {usage.food_log.name} - {usage.planned_quantity} (from planned usage)"
                 )
-        else:
-            logger.debug(f"No planned usages for meal {meal.id}, using ingredient estimation")
-
-            ingredients = getattr(meal.meal, "ingredients", []) or []
-            if not ingredients:
-                logger.warning(f"Meal {meal.meal.id} has no ingredients; cannot estimate consumption")
-                continue
-
-            for ingredient in ingredients:
-                if isinstance(ingredient, dict):
-                    ingredient_text = ingredient.get("name") or ingredient.get("ingredient") or ""
-                else:
-                    ingredient_text = str(ingredient or "")
-
-                core = _core_ingredient_name(ingredient_text)
-                if not core:
-                    continue
-
-                # Try matching using core tokens
-                matching_logs = FoodLogSys.objects.filter(
-                    user=user,
-                    is_consumed=False,
-                    name__icontains=core
-                )
-
-                if not matching_logs.exists():
-                    logger.debug(f"No inventory match for ingredient='{ingredient_text}' core='{core}'")
-                    continue
+            continue
 
-                # Estimate quantity (default 100g per ingredient)
-                estimated_quantity = Decimal('100.00')
+        ingredients = getattr(meal.meal, "ingredients", []) or []
+        if not ingredients:
+            logger.warning(f"Meal {meal.meal.id} has no ingredients; cannot estimate consumption")
+            continue
 
-                if matching_logs.first().id not in consumption_tracker:
-                    consumption_tracker[matching_logs.first().id] = {
-                        'food_log': matching_logs.first(),
-                        'total_quantity': Decimal('0')
-                    }
+        texts = []
+        for ingredient in ingredients:
+            if isinstance(ingredient, dict):
+                texts.append(ingredient.get("name") or ingredient.get("ingredient") or "")
+            else:
+                texts.append(str(ingredient or ""))
 
-                consumption_tracker[matching_logs.first().id]['total_quantity'] += estimated_quantity
+        # one inventory load per confirmation; every ingredient resolves in memory
+        if matcher is None:
+            matcher = InventoryMatcher.for_user(user)
 
-                logger.debug(
-                    f"Meal {meal.meal_time}: {ingredient} → {matching_logs.first().name} - "
-                    f"{estimated_quantity}g (estimated)"
-                )
+        for ingredient_text, match in zip(texts, matcher.match_many(texts)):
+            if match is None:
+                logger.debug(f"No inventory match for ingredient='{ingredient_text}'")
+                continue
 
-    # Apply consumption to food logs
-    for food_log_id, data in consumption_tracker.items():
-        food_log = data['food_log']
-        consume_quantity = data['total_quantity']
+            food_log = match.logs[0]
+            # Estimate quantity (default 100g per ingredient)
+            estimated_quantity = Decimal('100.00')
+            track(food_log, estimated_quantity)
 
-        # Check if enough quantity available
-        if food_log.quantity < consume_quantity:
-            logger.warning(
-                f"Not enough {food_log.name}: have {food_log.quantity}g, "
-                f"need {consume_quantity}g. Using available quantity."
+            logger.debug(
+                f"Meal {meal.meal_time}: {ingredient_text} → {food_log.name} - "
+                f"{estimated_quantity}g (estimated, score {match.score})"
             )
-            consume_quantity = food_log.quantity
 
-        # Deduct quantity
-        food_log.quantity -= consume_quantity
-
-        # Mark as consumed if quantity reaches zero
-        if food_log.quantity <= 0:
-            food_log.is_consumed = True
-            food_log.quantity = Decimal('0')
-            logger.info(f" {food_log.name} fully consumed")
-
-        food_log.save(update_fields=['quantity', 'is_consumed'])
-
-        logger.info(
-            f"Consumed {consume_quantity}g of {food_log.name} "
-            f"(remaining: {food_log.quantity}g)"
-        )
+    # Apply consumption to food logs (one locked read, one bulk_update;
+    # the foodlog cache version is bumped after commit)
+    result = consume_food_logs(
+        user,
+        [(food_log_id, data["total_quantity"]) for food_log_id, data in consumption_tracker.items()],
+        lenient=True,
+        record_usage=False,
+    )
+    for food_log_id, consumed in result.consumed.items():
+        logger.info(f"Consumed {consumed}g of {consumption_tracker[food_log_id]['food_log'].name}")
 
     # Mark day as confirmed
     meal_plan_day.is_confirmed = True
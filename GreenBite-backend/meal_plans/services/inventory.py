@@ -1,86 +1,290 @@
+import hashlib
+import logging
+import struct
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+import numpy as np
+from django.core.cache import cache
 from django.utils import timezone
 from food.models import FoodLogSys
-from project.utils.ingredient_synonyms import expand_ingredient_tokens
-from project.utils.normalize import normalize_ingredient_name
-from decimal import Decimal
-from django.db.models.query import QuerySet
-def _safe_count(qs_or_list):
-    if qs_or_list is None:
-        return 0
+from food.utils.caching import bump_list_version, get_list_version
+from project.utils.ingredient_synonyms import expand_normalized
+from project.utils.normalize import NORMALIZER_VERSION, normalize_ingredient_name, normalize_many
 
-    #only QuerySet.count() takes zero args reliably
-    if isinstance(qs_or_list, QuerySet):
-        return qs_or_list.count()
+logger = logging.getLogger(__name__)
+
+FOODLOG_NAMESPACE = "foodlog"
+SNAPSHOT_TTL_SECONDS = 15 * 60
+
+# blob: header, ids (int64), expiry ordinals (int32), then the five string
+# columns (names, norms, units, categories, quantities) joined by _SNAPSHOT_SEP
+_SNAPSHOT_HEADER = struct.Struct("<4sIi")
+_SNAPSHOT_MAGIC = b"INV1"
+_SNAPSHOT_SEP = "\x1f"
+
+
+def snapshot_key(user_id: int, today: date | None = None) -> str:
+    """Redis key of a user's inventory snapshot: changes with the foodlog list version and the day."""
+    today = today or timezone.now().date()
+    version = get_list_version(FOODLOG_NAMESPACE, user_id)
+    return f"inventory:snapshot:{user_id}:v{version}:{today.isoformat()}"
+
+
+def invalidate_inventory_snapshot(user_id: int) -> None:
+    """
+    Drop the user's shared snapshot and move the foodlog version on (which also
+    retires the cached food-log lists). FoodLogSys save/delete call this via
+    food.signals; bulk writers bump the version themselves.
+    """
+    cache.delete(snapshot_key(user_id))
+    bump_list_version(FOODLOG_NAMESPACE, user_id)
 
-    # lists/tuples/dicts/etc.
-    try:
-        return len(qs_or_list)
-    except TypeError:
-        # generator/iterator
-        try:
-            return sum(1 for _ in qs_or_list)
-        except Exception:
-            return 0
 
 def _to_float(val):
     try:
         if val is None:
             return 0.0
         # Decimal -> float, dates remain as-is
-        from decimal import Decimal
         if isinstance(val, Decimal):
             return float(val)
         return float(val)
     except Exception:
         return 0.0
 
+
+class InventoryItem(NamedTuple):
+    """One available food log, as read by InventorySnapshot (quacks like FoodLogSys for reads)."""
+    id: int
+    name: str
+    name_normalized: str
+    quantity: Decimal
+    unit: str
+    expiry_date: date
+    days_left: int
+    category: str
+
+
+# columns read by the single snapshot query, in order
+_SNAPSHOT_FIELDS = (
+    "id", "name", "name_normalized", "normalizer_version",
+    "quantity", "unit", "expiry_date", "category",
+)
+
+
+@dataclass(frozen=True, eq=False)
+class InventorySnapshot:
+    """
+    Immutable, columnar view of a user's available food logs (unconsumed,
+    not expired, quantity > 0), soonest expiry first. Row i of every field
+    describes the same food log.
+    """
+    as_of: date
+    ids: np.ndarray         # int64
+    names: tuple
+    norms: tuple
+    quantities: tuple       # Decimal, exact for quantity checks
+    units: tuple
+    expiry_dates: tuple
+    days_left: np.ndarray   # int32, relative to as_of
+    categories: tuple
+
+    @classmethod
+    def from_rows(cls, rows, as_of: date) -> "InventorySnapshot":
+        """rows: (id, name, name_normalized, quantity, unit, expiry_date, category) tuples."""
+        rows = list(rows)
+        cols = list(zip(*rows)) if rows else [()] * 7
+        ids, names, norms, quantities, units, expiry, categories = cols
+        return cls(
+            as_of=as_of,
+            ids=np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            names=tuple(names),
+            norms=tuple(norms),
+            quantities=tuple(quantities),
+            units=tuple(units),
+            expiry_dates=tuple(expiry),
+            days_left=np.fromiter(((d - as_of).days for d in expiry), dtype=np.int32, count=len(rows)),
+            categories=tuple(categories),
+        )
+
+    @classmethod
+    def load(cls, user, today: date | None = None) -> "InventorySnapshot":
+        """One .values_list() query; names normalized with an older normalizer are redone in one batch."""
+        today = today or timezone.now().date()
+        rows = list(
+            FoodLogSys.objects.filter(
+                user=user,
+                is_consumed=False,
+                expiry_date__gte=today,
+                quantity__gt=0,
+            ).order_by("expiry_date", "id").values_list(*_SNAPSHOT_FIELDS)
+        )
+        stale = [i for i, r in enumerate(rows) if r[3] != NORMALIZER_VERSION]
+        fresh = dict(zip(stale, normalize_many(rows[i][1] for i in stale)))
+        return cls.from_rows(
+            (
+                (pk, name, fresh.get(i, norm), qty, unit, expiry, category)
+                for i, (pk, name, norm, _v, qty, unit, expiry, category) in enumerate(rows)
+            ),
+            today,
+        )
+
+    @classmethod
+    def for_user(cls, user, today: date | None = None) -> "InventorySnapshot":
+        """
+        The user's snapshot, shared through the cache by every consumer in the
+        same foodlog version; loaded from Postgres (and stored) on a miss.
+        """
+        today = today or timezone.now().date()
+        # key first: a write after this point bumps the version, so a snapshot
+        # loaded before that write is never found under the new key
+        key = snapshot_key(user.id, today)
+        blob = cache.get(key)
+        if blob is not None:
+            try:
+                return cls.from_bytes(blob)
+            except (ValueError, struct.error):
+                logger.warning("Discarding unreadable inventory snapshot %s", key)
+
+        snap = cls.load(user, today)
+        blob = snap.to_bytes()
+        if blob is not None:
+            cache.set(key, blob, timeout=SNAPSHOT_TTL_SECONDS)
+        return snap
+
+    def to_bytes(self) -> bytes | None:
+        """Compact binary form; None if a value contains the column separator."""
+        strings = (
+            *self.names, *self.norms, *self.units, *self.categories,
+            *(str(q) for q in self.quantities),
+        )
+        if any(_SNAPSHOT_SEP in v for v in strings):
+            return None
+        n = len(self)
+        ordinals = np.fromiter((d.toordinal() for d in self.expiry_dates), dtype="<i4", count=n)
+        return b"".join((
+            _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, n, self.as_of.toordinal()),
+            self.ids.astype("<i8").tobytes(),
+            ordinals.tobytes(),
+            _SNAPSHOT_SEP.join(strings).encode("utf-8"),
+        ))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "InventorySnapshot":
+        magic, n, as_of = _SNAPSHOT_HEADER.unpack_from(blob)
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError("not an inventory snapshot")
+        offset = _SNAPSHOT_HEADER.size
+        ids = np.frombuffer(blob, dtype="<i8", count=n, offset=offset)
+        offset += 8 * n
+        ordinals = np.frombuffer(blob, dtype="<i4", count=n, offset=offset)
+        offset += 4 * n
+
+        strings = blob[offset:].decode("utf-8").split(_SNAPSHOT_SEP) if n else []
+        if len(strings) != 5 * n:
+            raise ValueError("inventory snapshot columns don't line up")
+        names, norms, units, categories, quantities = (strings[i * n:(i + 1) * n] for i in range(5))
+
+        return cls(
+            as_of=date.fromordinal(as_of),
+            ids=ids.astype(np.int64),
+            names=tuple(names),
+            norms=tuple(norms),
+            quantities=tuple(Decimal(q) for q in quantities),
+            units=tuple(units),
+            expiry_dates=tuple(date.fromordinal(int(o)) for o in ordinals),
+            days_left=(ordinals - as_of).astype(np.int32),
+            categories=tuple(categories),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of what a meal plan depends on: which logs, their names, quantities and expiry."""
+        h = hashlib.sha256(self.ids.astype("<i8").tobytes())
+        h.update(np.fromiter((d.toordinal() for d in self.expiry_dates), dtype="<i4", count=len(self)).tobytes())
+        h.update(_SNAPSHOT_SEP.join((*self.norms, *(str(q) for q in self.quantities))).encode("utf-8"))
+        return h.hexdigest()
+
+    def item(self, i: int) -> InventoryItem:
+        return InventoryItem(
+            int(self.ids[i]), self.names[i], self.norms[i], self.quantities[i],
+            self.units[i], self.expiry_dates[i], int(self.days_left[i]), self.categories[i],
+        )
+
+    def items(self, indices=None) -> list[InventoryItem]:
+        if indices is None:
+            indices = range(len(self))
+        return [self.item(int(i)) for i in indices]
+
+    def expiring_within(self, days: int) -> np.ndarray:
+        """Row indices expiring within `days` days, soonest first."""
+        return np.flatnonzero(self.days_left <= days)
+
+
 class InventoryService:
-    """Service for managing user's food inventory for meal planning."""
+    """
+    Service for managing user's food inventory for meal planning.
+
+    Everything is derived in memory from one InventorySnapshot, fetched on
+    first use (shared through the cache, see InventorySnapshot.for_user);
+    clear_cache() drops it after inventory changes.
+    """
     
     def __init__(self, user):
         self.user = user
-        self._available_logs = None
-        self._inventory_tokens = None
+        self._snapshot = None
+        self._tokens = {}
         self._inventory_map = None
+
+    @property
+    def snapshot(self) -> InventorySnapshot:
+        if self._snapshot is None:
+            self._snapshot = InventorySnapshot.for_user(self.user)
+        return self._snapshot
+
     @property
     def food_logs(self):
-        return self.get_available_logs()
+        return self.snapshot.items()
 
     @property
     def inventory_tokens(self):
-        # return cached tokens or compute them
-        if self._inventory_tokens is None:
-            return self.get_inventory_tokens()
-        return self._inventory_tokens
+        return self.get_inventory_tokens()
 
     @property
     def inventory_map(self):
-        if self._inventory_map is None:
-            return self.get_inventory_map()
-        return self._inventory_map
+        return self.get_inventory_map()
+
+    def has_items(self) -> bool:
+        return len(self.snapshot) > 0
 
     def get_available_logs(self):
-        # filter FoodLogSys for user, not expired, >0 quantity
-        if self._available_logs is None:
-            self._available_logs = FoodLogSys.objects.filter(
-                user=self.user,
-                is_consumed=False,
-                expiry_date__gte=timezone.now().date(),
-                quantity__gt=0
-            ).select_related('user').order_by("expiry_date")
-        return self._available_logs
+        """
+        FoodLogSys queryset behind the snapshot, for callers that need model
+        instances; everything in this service reads the snapshot instead.
+        """
+        return FoodLogSys.objects.filter(
+            user=self.user,
+            is_consumed=False,
+            expiry_date__gte=timezone.now().date(),
+            quantity__gt=0
+        ).order_by("expiry_date")
 
     def get_inventory_tokens(self, use_synonyms=True):
-        tokens= set()
-        for log in self.get_available_logs():
-            if use_synonyms:
-                tokens.update(expand_ingredient_tokens(log.name))
-            else:
-                n = normalize_ingredient_name(log.name)
-                if n:
+        tokens = self._tokens.get(use_synonyms)
+        if tokens is None:
+            tokens = set()
+            for n in self.snapshot.norms:
+                if use_synonyms:
+                    tokens.update(expand_normalized(n))
+                elif n:
                     tokens.add(n)
-        self._inventory_tokens = tokens
-        return self._inventory_tokens
+            self._tokens[use_synonyms] = tokens
+        return tokens
 
     def map_food_logs(self):
         """
@@ -97,86 +301,64 @@ class InventoryService:
         """
         if self._inventory_map is None:
             inventory = {}
-            
-            for log in self.get_available_logs():
-                key = normalize_ingredient_name(log.name)
+            snap = self.snapshot
+            for key, qty in zip(snap.norms, snap.quantities):
                 if not key:
                     continue
-                
-                from decimal import Decimal
                 # Aggregate quantities for same ingredient
-                inventory.setdefault(key, Decimal('0'))
-                inventory[key] += log.quantity
-            
+                inventory[key] = inventory.get(key, Decimal('0')) + qty
             self._inventory_map = inventory
         
         return self._inventory_map
 
-    # return set of normalized tokens using synonyms
     def get_expiry_weighted_inventory(self):
         inventory = {}
-        for log in self.get_available_logs():
-            key = normalize_ingredient_name(log.name)
+        snap = self.snapshot
+        for key, qty, days_left in zip(snap.norms, snap.quantities, snap.days_left.tolist()):
             if not key:
                 continue
-            days_left = (log.expiry_date - timezone.now().date()).days
             weight = max(1, 30 - days_left)  # More weight for sooner expiry
             if key not in inventory:
                 inventory[key] = {'quantity': Decimal('0'), 'weighted_score': 0}
-            inventory[key]['quantity'] += log.quantity
-            inventory[key]['weighted_score'] += log.quantity * weight
+            inventory[key]['quantity'] += qty
+            inventory[key]['weighted_score'] += qty * weight
         return inventory
-    def get_expiry_soon(self ,days=3):
-        threshold_date = timezone.now().date() + timezone.timedelta(days=days)
-        return self.get_available_logs().filter(expiry_date__lte=threshold_date)
 
-        
+    def get_expiry_soon(self, days=3):
+        """Available items expiring within `days` days, soonest first."""
+        return self.snapshot.items(self.snapshot.expiring_within(days))
+
     def get_food_log_summary(self):
-        ava = self.get_available_logs() or []
-        exp = self.get_expiry_soon(days=3) or []
+        snap = self.snapshot
+        exp = self.get_expiry_soon(days=3)
 
         # prepare serialized expiring items
         exp_items = []
         days_list = []
-        for log in (exp if hasattr(exp, "__iter__") else []):
-            expiry_date = getattr(log, "expiry_date", getattr(log, "expiryDate", None))
-            # compute days left safely
-            try:
-                days_left = (expiry_date - timezone.now().date()).days if expiry_date is not None else None
-            except Exception:
-                # fallback if expiry_date is a string
-                try:
-                    from datetime import datetime
-                    expiry_dt = datetime.fromisoformat(str(expiry_date)).date()
-                    days_left = (expiry_dt - timezone.now().date()).days
-                except Exception:
-                    days_left = None
-
-            days_left = 0 if days_left is None else max(0, int(days_left))
+        for log in exp:
+            days_left = max(0, log.days_left)
             days_list.append(days_left)
-
             exp_items.append({
-                "id": getattr(log, "id", None),
-                "name": getattr(log, "name", None),
-                "quantity": _to_float(getattr(log, "quantity", 0)),
-                "unit": getattr(log, "unit", None),
-                "expiry_date": getattr(expiry_date, "isoformat", lambda: expiry_date)(),
+                "id": log.id,
+                "name": log.name,
+                "quantity": _to_float(log.quantity),
+                "unit": log.unit,
+                "expiry_date": log.expiry_date.isoformat(),
                 "days_left": days_left,
-                "category": getattr(log, "category", None),
+                "category": log.category,
             })
 
-        total_items = _safe_count(ava)
+        total_items = len(snap)
         unique_ingredients = len(self.map_food_logs() or {})
 
         # aggregate quantities per unit (best-effort)
         qty_by_unit = {}
-        for log in self.get_available_logs():
-            unit = getattr(log, "unit", "unit") or "unit"
-            qty_by_unit.setdefault(unit, 0.0)
-            qty_by_unit[unit] += _to_float(getattr(log, "quantity", 0))
+        for unit, qty in zip(snap.units, snap.quantities):
+            unit = unit or "unit"
+            qty_by_unit[unit] = qty_by_unit.get(unit, 0.0) + _to_float(qty)
 
         # category breakdown with percentages and float totals
-        raw_cat = self._get_category_breakdown(ava)
+        raw_cat = self._get_category_breakdown()
         by_category = {}
         for cat, info in raw_cat.items():
             count = info.get("count", 0)
@@ -188,17 +370,14 @@ class InventoryService:
             }
 
         avg_days_left = round((sum(days_list) / len(days_list)), 1) if days_list else None
-        soonest = None
-        if exp_items:
-            sorted_exp = sorted(exp_items, key=lambda x: x["days_left"])
-            soonest = sorted_exp[0]
-
-        top_expiring = sorted(exp_items, key=lambda x: x["days_left"])[:5]
+        # exp_items is already soonest first
+        soonest = exp_items[0] if exp_items else None
+        top_expiring = exp_items[:5]
 
         return {
             "total_items": total_items,
             "unique_ingredients": unique_ingredients,
-            "expiring_soon": _safe_count(exp),
+            "expiring_soon": len(exp_items),
             "expiring_items": exp_items,
             "by_category": by_category,
             "quantity_by_unit": qty_by_unit,
@@ -207,14 +386,27 @@ class InventoryService:
             "top_expiring": top_expiring,
             "generated_at": timezone.now().isoformat(),
         }
-    def _get_category_breakdown(self, food_logs):
-        category_map = {}
-        if not food_logs:
-            return category_map
 
-        for log in food_logs:
-            cat = getattr(log, "category", None) or "other"
-            qty = getattr(log, "quantity", 0) or 0
+    def get_inventory_summary(self):
+        snap = self.snapshot
+        return {
+            "total_items": len(snap),
+            "unique_ingredients": len(self.get_inventory_map()),
+            "expiring_soon": int(snap.expiring_within(3).size),
+        }
+
+    def _get_category_breakdown(self, food_logs=None):
+        """{category: {count, total_quantity}}; defaults to the snapshot's items."""
+        if food_logs is None:
+            snap = self.snapshot
+            pairs = zip(snap.categories, snap.quantities)
+        else:
+            pairs = ((getattr(log, "category", None), getattr(log, "quantity", 0)) for log in food_logs)
+
+        category_map = {}
+        for cat, qty in pairs:
+            cat = cat or "other"
+            qty = qty or 0
 
             if cat not in category_map:
                 category_map[cat] = {"count": 0, "total_quantity": Decimal("0")}
@@ -235,8 +427,6 @@ class InventoryService:
         if minQ is not None:
             return n_map[norm] >= Decimal(str(minQ))
 
-        if self.inventory_tokens is None:
-            self.get_inventory_tokens()
         return norm in self.inventory_tokens
     def check_recipe_ingredients(self, recipe_ingredients):
         recipe_set = set(recipe_ingredients)
@@ -257,8 +447,6 @@ class InventoryService:
     
     def clear_cache(self):
         """Clear cached data (useful after inventory changes)."""
-        self._available_logs = None
-        self._inventory_tokens = None
+        self._snapshot = None
+        self._tokens = {}
         self._inventory_map = None
-
-
@@ -1,10 +1,14 @@
 from datetime import timedelta
 import logging
 from django.db import transaction
-from meal_plans.models import MealPlan, MealPlanDay, MealPlanMeal
+from meal_plans.models import MealPlan, MealPlanDay, MealPlanFoodUsage, MealPlanMeal
 from food.models import Meal
 
 logger = logging.getLogger(__name__)
+# per-meal draft details: DEBUG only, and only every DRAFT_LOG_EVERY-th meal
+draft_logger = logging.getLogger(f"{__name__}.drafts")
+DRAFT_LOG_EVERY = 25
+
 def _val(obj, key, default=None):
     """
     Safe getter that supports:
@@ -57,16 +61,21 @@ class MealPlanBuilder:
         self.meal_times = ["breakfast", "lunch", "dinner", "snack"][:meals_per_day]
     
     @transaction.atomic
-    def build(self, recipes):
-      
+    def build(self, recipes, optimizer=None):
+        """
+        Persist the plan with one meal per recipe, in order: the plan, then
+        every day and every meal with one bulk_create each. With an optimizer
+        (MealPlanOptimizer), each meal also gets MealPlanFoodUsage rows
+        reserving concrete food log quantities for it.
+        """
         total_meals_needed = self.days * self.meals_per_day
-        
+
         if len(recipes) < total_meals_needed:
             logger.warning(
                 f"Not enough recipes: got {len(recipes)}, need {total_meals_needed}. "
                 f"Will create partial plan."
             )
-        
+
         # Create the meal plan
         meal_plan = MealPlan.objects.create(
             user=self.user,
@@ -74,93 +83,79 @@ class MealPlanBuilder:
             days=self.days,
             is_confirmed=False
         )
-        
+
         logger.info(f"Created MealPlan {meal_plan.id} for user {self.user.id}")
-        
-        recipe_index = 0
-        meals_created = 0
-        
-        # Build each day
-        for day_offset in range(self.days):
-            current_date = self.start_date + timedelta(days=day_offset)
-            
-            # Create day
-            plan_day = MealPlanDay.objects.create(
+
+        # ids come back from Postgres, so meals can point at their days
+        plan_days = MealPlanDay.objects.bulk_create([
+            MealPlanDay(
                 meal_plan=meal_plan,
-                date=current_date,
+                date=self.start_date + timedelta(days=day_offset),
                 is_confirmed=False
             )
-            
-            logger.debug(f"Created MealPlanDay for {current_date}")
-            
-            # Add meals for this day
+            for day_offset in range(self.days)
+        ])
+
+        plan_meals = []
+        planned = []  # (date, recipe), aligned with plan_meals
+        recipe_iter = iter(recipes)
+        for plan_day in plan_days:
             for meal_time in self.meal_times:
-                # Check if we have more recipes
-                if recipe_index >= len(recipes):
-                    logger.warning(
-                        f"Ran out of recipes at day {day_offset + 1}, {meal_time}. "
-                        f"Created {meals_created} meals total."
-                    )
+                recipe = next(recipe_iter, None)
+                if recipe is None:
                     break
-                
-                recipe = recipes[recipe_index]
-                cuisine = _val(recipe, "cuisine", "")
-                cuisine = "" if cuisine is None else str(cuisine).strip()
-
-                if cuisine is None:  # should never happen, but keep a hard guard
-                    cuisine = ""
-                mealdb_id = _meta(recipe, "mealdb_id") or _val(recipe, "mealdb_id") or _val(recipe, "idMeal")
-                mealdb_id = _s(mealdb_id)
-
-
-                # TEMP debug (remove later)
-                logger.error(
-                    "DEBUG draft_cuisine=%r type=%s recipe_class=%s recipe_repr=%r",
-                    cuisine,
-                    type(cuisine).__name__,
-                    type(recipe).__name__,
-                    str(recipe)[:500],
-                )
-                
-                # Create Meal object
-                MealPlanMeal.objects.create(
-                meal_plan_day=plan_day,
-                meal_time=meal_time,
-                meal=None,
-                draft_title=_s(_val(recipe, "title") or _val(recipe, "recipe")),
-                draft_ingredients=_list(_val(recipe, "ingredients")),
-                draft_steps=_list(_val(recipe, "steps") or _val(recipe, "instructions")),
-                draft_cuisine=cuisine,
-                draft_calories=_i(_val(recipe, "calories")),
-                draft_serving=_i(_val(recipe, "serving")),
-                draft_photo=_s(_val(recipe, "photo") or _val(recipe, "thumbnail")),
-                draft_source_mealdb_id=mealdb_id,
-                is_skipped=False,
-            )
-                
-                # Link meal to plan day
-                # MealPlanMeal.objects.create(
-                #     meal_plan_day=plan_day,
-                #     meal_time=meal_time,
-                #     meal=meal,
-                   
-                # )
-                
-                meals_created += 1
-                recipe_index += 1
-                
-                logger.debug(
-                    f"Added {meal_time} meal: {recipe.title} (source: {recipe.source})"
-                )
-        
+                plan_meals.append(self._draft(plan_day, meal_time, recipe, len(plan_meals)))
+                planned.append((plan_day.date, recipe))
+
+        if len(plan_meals) < total_meals_needed:
+            logger.warning(f"Ran out of recipes. Created {len(plan_meals)} meals total.")
+
+        MealPlanMeal.objects.bulk_create(plan_meals)
+
+        if optimizer is not None and planned:
+            allocations = optimizer.allocate(planned)
+            MealPlanFoodUsage.objects.bulk_create([
+                MealPlanFoodUsage(meal_plan_meal=plan_meal, food_log_id=food_log_id, planned_quantity=qty)
+                for plan_meal, usages in zip(plan_meals, allocations)
+                for food_log_id, qty in usages
+            ])
+
         logger.info(
-            f"Successfully built meal plan {meal_plan.id} with {meals_created} meals "
+            f"Successfully built meal plan {meal_plan.id} with {len(plan_meals)} meals "
             f"across {self.days} days"
         )
-        
+
         return meal_plan
-    
-    def build_partial(self, recipes, skip_incomplete_days=False):
+
+    def _draft(self, plan_day, meal_time, recipe, index):
+        """Unsaved MealPlanMeal holding the recipe as a draft."""
+        cuisine = _val(recipe, "cuisine", "")
+        cuisine = "" if cuisine is None else str(cuisine).strip()
+        mealdb_id = _meta(recipe, "mealdb_id") or _val(recipe, "mealdb_id") or _val(recipe, "idMeal")
+        mealdb_id = _s(mealdb_id)
+
+        if index % DRAFT_LOG_EVERY == 0 and draft_logger.isEnabledFor(logging.DEBUG):
+            draft_logger.debug(
+                "draft %s %s: cuisine=%r mealdb_id=%r recipe=%r",
+                plan_day.date, meal_time, cuisine, mealdb_id, str(recipe)[:500],
+            )
+
+        return MealPlanMeal(
+            meal_plan_day=plan_day,
+            meal_time=meal_time,
+            meal=None,
+            draft_title=_s(_val(recipe, "title") or _val(recipe, "recipe")),
+            draft_ingredients=_list(_val(recipe, "ingredients")),
+            draft_steps=_list(_val(recipe, "steps") or _val(recipe, "instructions")),
+            draft_cuisine=cuisine,
+            draft_calories=_i(_val(recipe, "calories")),
+            draft_serving=_i(_val(recipe, "serving")),
+            draft_photo=_s(_val(recipe, "photo") or _val(recipe, "thumbnail")),
+            draft_source_mealdb_id=mealdb_id,
+            is_skipped=False,
+        )
+
+    def build_partial(self, recipes, skip_incomplete_days=False, optimizer=None):
         
         if skip_incomplete_days:
             # Calculate how many complete days we can make
@@ -177,7 +172,7 @@ class MealPlanBuilder:
             original_days = self.days
             self.days = complete_days
             
-            meal_plan = self.build(recipes)
+            meal_plan = self.build(recipes, optimizer=optimizer)
             
             # Restore original
             self.days = original_days
@@ -185,4 +180,4 @@ class MealPlanBuilder:
             return meal_plan
         else:
             # Just build with what we have
-            return self.build(recipes)
\ No newline at end of file
+            return self.build(recipes, optimizer=optimizer)
\ No newline at end of file
@@ -19,7 +19,7 @@ def generate_meal_plan(user, start_date, num_days, meals_per_day, use_ai_fallbac
     # Initialize inventory service
     inventory = InventoryService(user)
     
-    if not inventory.get_available_logs().exists():
+    if not inventory.has_items():
         raise ValueError("No available food logs to base the meal plan on.")
     
     # Use composite provider (MealDB + AI fallback)
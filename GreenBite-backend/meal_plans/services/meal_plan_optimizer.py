@@ -0,0 +1,141 @@
+"""
+MealPlanOptimizer - assigns concrete inventory to planned meals.
+
+For every planned meal, each recipe ingredient is resolved against the
+user's inventory snapshot (InventoryMatcher) and its measure ("200g",
+"1 cup", "2") is converted into the matched food log's unit when both are
+mass, volume or count; otherwise a default portion is assumed. Quantities
+are then drawn greedily:
+
+    * meals are served in date order, so earlier meals get first pick;
+    * within one ingredient, the matched logs are used soonest expiry first;
+    * a log is only used by meals on or before its expiry date and never
+      beyond what is left of it once earlier meals have taken their share.
+
+The result is one list of (food_log_id, quantity) per meal, ready to be
+written as MealPlanFoodUsage rows.
+"""
+import logging
+import re
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from food.services.ingredient_matching import InventoryMatcher
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+# used when a measure is missing or doesn't convert to the food log's unit
+DEFAULT_PORTION = {"mass": Decimal("100"), "volume": Decimal("100"), "count": Decimal("1")}
+
+# unit -> (dimension, factor to the dimension's base unit: g / ml / piece)
+_UNITS = {
+    "g": ("mass", Decimal("1")), "gr": ("mass", Decimal("1")), "gram": ("mass", Decimal("1")),
+    "grams": ("mass", Decimal("1")), "kg": ("mass", Decimal("1000")), "kilogram": ("mass", Decimal("1000")),
+    "kilograms": ("mass", Decimal("1000")), "oz": ("mass", Decimal("28.35")), "lb": ("mass", Decimal("453.6")),
+    "lbs": ("mass", Decimal("453.6")),
+    "ml": ("volume", Decimal("1")), "l": ("volume", Decimal("1000")), "litre": ("volume", Decimal("1000")),
+    "liter": ("volume", Decimal("1000")), "cup": ("volume", Decimal("240")), "cups": ("volume", Decimal("240")),
+    "tbsp": ("volume", Decimal("15")), "tbs": ("volume", Decimal("15")), "tsp": ("volume", Decimal("5")),
+    "": ("count", Decimal("1")), "pc": ("count", Decimal("1")), "pcs": ("count", Decimal("1")),
+    "piece": ("count", Decimal("1")), "pieces": ("count", Decimal("1")), "unit": ("count", Decimal("1")),
+    "units": ("count", Decimal("1")),
+}
+
+_MEASURE_RE = re.compile(r"^\s*(?P<num>\d+(?:\.\d+)?(?:\s*/\s*\d+)?)\s*(?P<unit>[a-z]*)")
+
+
+def _unit(unit: str):
+    return _UNITS.get((unit or "").strip().lower().rstrip("."))
+
+
+def parse_measure(measure: str):
+    """'200g' -> ('mass', 200), '1/2 cup' -> ('volume', 120), '2' -> ('count', 2); None if unknown."""
+    m = _MEASURE_RE.match(str(measure or "").lower())
+    if not m:
+        return None
+    unit = _unit(m.group("unit"))
+    if unit is None:
+        return None
+    num = m.group("num")
+    try:
+        if "/" in num:
+            top, bottom = (Decimal(p.strip()) for p in num.split("/"))
+            amount = top / bottom
+        else:
+            amount = Decimal(num)
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+    dimension, factor = unit
+    return dimension, amount * factor
+
+
+def _need_in(demand, unit: str) -> Decimal:
+    """The demand expressed in a food log's unit (a default portion when they don't convert)."""
+    dimension, amount, fraction = demand
+    target = _unit(unit)
+    if amount is not None and target is not None and target[0] == dimension:
+        return amount * fraction / target[1]
+    portion = DEFAULT_PORTION[target[0]] / target[1] if target else DEFAULT_PORTION["count"]
+    return portion * fraction
+
+
+def _ingredients(recipe):
+    """(name, measure) pairs from a RecipeCandidate, dict recipe or plain list."""
+    raw = recipe.get("ingredients") if isinstance(recipe, dict) else getattr(recipe, "ingredients", None)
+    out = []
+    for ing in raw or []:
+        if isinstance(ing, dict):
+            out.append((ing.get("name") or ing.get("ingredient") or "", ing.get("measure") or ""))
+        else:
+            out.append((str(ing or ""), ""))
+    return [(name, measure) for name, measure in out if name]
+
+
+class MealPlanOptimizer:
+    def __init__(self, items):
+        """items: available inventory rows (InventoryItem or FoodLogSys), e.g. InventorySnapshot.items()."""
+        items = list(items)
+        self._matcher = InventoryMatcher(items)
+        self._remaining = {item.id: Decimal(item.quantity) for item in items}
+
+    @classmethod
+    def for_inventory(cls, inventory_service):
+        return cls(inventory_service.food_logs)
+
+    def allocate(self, meals) -> list[list[tuple[int, Decimal]]]:
+        """
+        meals: [(meal_date, recipe)] in plan order. Returns, per meal, the
+        (food_log_id, quantity) pairs to reserve for it.
+        """
+        out = [[] for _ in meals]
+        for i in sorted(range(len(meals)), key=lambda i: meals[i][0]):
+            meal_date, recipe = meals[i]
+            ingredients = _ingredients(recipe)
+            taken = defaultdict(Decimal)
+            for (_name, measure), match in zip(ingredients, self._matcher.match_many([n for n, _m in ingredients])):
+                if match is None:
+                    continue
+                parsed = parse_measure(measure)
+                # (dimension, amount in base units, share of it still needed)
+                demand = (*parsed, Decimal("1")) if parsed else (None, None, Decimal("1"))
+                for log in match.logs:
+                    if log.expiry_date < meal_date:
+                        continue
+                    left = self._remaining[log.id]
+                    need = _need_in(demand, log.unit).quantize(CENT, rounding=ROUND_HALF_UP)
+                    take = min(need, left)
+                    if take < CENT:
+                        continue
+                    taken[log.id] += take
+                    self._remaining[log.id] = left - take
+                    if take >= need:
+                        break
+                    demand = (demand[0], demand[1], demand[2] * (need - take) / need)
+            out[i] = list(taken.items())
+
+        logger.debug(
+            "Allocated %d usages across %d meals",
+            sum(len(u) for u in out), len(meals),
+        )
+        return out
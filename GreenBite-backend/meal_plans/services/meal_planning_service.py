@@ -3,10 +3,16 @@ MealPlanningService - Orchestrates the entire meal planning process.
 """
 import logging
 from typing import List
+
+import numpy as np
+
 from .inventory import InventoryService
-from .recipe_scorer import RecipeScorer
+from .recipe_scorer import RecipeScorer, incidence_matrix, inventory_vectors
 from .meal_plan_builder import MealPlanBuilder
-from .recipeProvider import RecipeProvider
+from .meal_plan_optimizer import MealPlanOptimizer
+from .progress import NullProgress
+from .provider_fanout import fan_out
+from .recipeProvider import RecipeProvider, load_recipe_details
 
 logger = logging.getLogger(__name__)
 
@@ -35,13 +41,25 @@ class MealPlanningService:
         self.scorer = RecipeScorer()
         self.builder = MealPlanBuilder(user, start_date, days, meals_per_day)
         self.use_diversity = use_diversity
+        # per-provider status and latency of the last generate()
+        self.provider_timings = []
     
-    def generate(self):
+    def generate(self, progress=None):
         """
-        Generate a complete meal plan.
+        Generate a complete meal plan. `progress` (a ProgressReporter) is told
+        about each stage and the partial results so far.
         """
+        progress = progress or NullProgress()
+        final_recipes = self.select_recipes(progress)
+        return self.build(final_recipes, progress)
+
+    def select_recipes(self, progress=None):
+        """Candidates from every provider, scored and best first (nothing is written)."""
+        progress = progress or NullProgress()
+
         # Step 1: Check inventory
-        if not self.inventory.get_available_logs().exists():
+        progress.stage("inventory")
+        if not self.inventory.has_items():
             raise ValueError("No available food inventory to base meal plan on")
         
 
@@ -55,30 +73,33 @@ class MealPlanningService:
         )
         logger.info(f"Inventory: {len(inventory_tokens)} unique ingredients available")
         
-        # Step 2: Collect candidates from all providers
-        candidates = []
-        
-        for provider in self.providers:
-            logger.info(f"Fetching recipes from {provider.provider_name}")
-            
-            try:
-                provider_candidates = provider.find_recipes(
-                    limit=self.days * self.meals_per_day
-                )
-                candidates.extend(provider_candidates)
-                logger.info(
-                    f"{provider.provider_name}: Added {len(provider_candidates)} candidates"
-                )
-            except Exception as e:
-                logger.exception(f"{provider.provider_name} failed: {e}")
-                continue
-        
+        # Step 2: Collect candidates from all providers, concurrently; a
+        # provider that misses its deadline is left out
+        progress.stage("candidates", inventory_items=len(self.inventory.snapshot))
+        collected = {}
+
+        def on_run(run, pending):
+            collected[run.provider] = run.as_dict()
+            if pending:
+                # the fast providers are in; waiting on the (optional) AI ones
+                progress.stage("ai_fallback", providers=dict(collected), waiting_for=pending)
+
+        fanout = fan_out(self.providers, limit=self.days * self.meals_per_day, on_run=on_run)
+        self.provider_timings = fanout.timings
+        candidates = fanout.candidates
+        for run in fanout.runs:
+            logger.info(
+                f"{run.provider}: Added {len(run.candidates)} candidates "
+                f"({run.status}, {run.seconds * 1000:.0f} ms)"
+            )
+
         if not candidates:
             raise ValueError("No recipe candidates found from any provider")
         
         logger.info(f"Total candidates collected: {len(candidates)}")
         
         # Step 3: Score and sort recipes
+        progress.stage("scoring", providers=dict(collected), waiting_for=[], candidates=len(candidates))
         if self.use_diversity:
             scored_recipes = self._score_with_diversity(
                 candidates,
@@ -111,60 +132,77 @@ class MealPlanningService:
             f"Top score: {valid_recipes[0][0]:.2f}"
         )
         
-        # Step 4: Build the meal plan
-        meal_plan = self.builder.build(final_recipes)
+        for score, recipe in valid_recipes:
+            recipe.score = score
+        return final_recipes
+
+    def build(self, final_recipes, progress=None):
+        """Persist a plan from ranked recipes (select_recipes() or a pre-generated draft)."""
+        progress = progress or NullProgress()
+
+        # Step 4: Build the meal plan (one query for the chosen recipes' details)
+        # and reserve concrete food log quantities for each meal
+        progress.stage(
+            "build",
+            top_recipes=[
+                {"title": recipe.title, "source": recipe.source, "score": round(float(recipe.score), 2)}
+                for recipe in final_recipes[:self.days * self.meals_per_day]
+            ],
+        )
+        load_recipe_details(final_recipes[:self.days * self.meals_per_day])
+        optimizer = MealPlanOptimizer.for_inventory(self.inventory)
+        meal_plan = self.builder.build(final_recipes, optimizer=optimizer)
         
         logger.info(f"✅ Successfully generated meal plan {meal_plan.id}")
         
         return meal_plan
     
+    def _batch_scores(self, candidates, inventory_tokens, inventory_map):
+        """All candidates scored at once; also returns the incidence matrix."""
+        incidence, vocab = incidence_matrix([recipe.ingredient_tokens for recipe in candidates])
+        inventory_days = None
+        if self.scorer.expiry_weight:
+            inventory_days = {}
+            snap = self.inventory.snapshot
+            for key, days in zip(snap.norms, snap.days_left.tolist()):
+                inventory_days[key] = min(days, inventory_days.get(key, days))
+        present, quantities, days_left = inventory_vectors(
+            vocab, inventory_tokens, inventory_map, inventory_days
+        )
+        batch = self.scorer.score_batch(
+            incidence,
+            present,
+            quantities if inventory_map else None,
+            days_left if inventory_days else None,
+        )
+        return batch, incidence
+
     def _score_simple(self, candidates, inventory_tokens, inventory_map):
         """Score recipes without diversity consideration."""
-        scored = []
-        
-        for recipe in candidates:
-            recipe_tokens = set(recipe.ingredient_tokens or [])
-            score = self.scorer.score(recipe_tokens, inventory_tokens, inventory_map)
-            scored.append((score, recipe))
-        
-        return scored
+        batch, _ = self._batch_scores(candidates, inventory_tokens, inventory_map)
+        return [
+            (float(score) if valid else None, recipe)
+            for score, valid, recipe in zip(batch.scores, batch.valid, candidates)
+        ]
     
     def _score_with_diversity(self, candidates, inventory_tokens, inventory_map):
         """
         Score recipes with diversity (penalize repetition).
         """
-        scored = []
-        used_tokens = set()
-        
-        # First pass: score all recipes
-        initial_scores = []
-        for recipe in candidates:
-            recipe_tokens = set(recipe.ingredient_tokens or [])
-            # ✅ Pass inventory_map correctly
-            score = self.scorer.score(recipe_tokens, inventory_tokens, inventory_map)
-            initial_scores.append((score, recipe, recipe_tokens))
-        
-        # Sort by initial score
-        initial_scores.sort(key=lambda x: x[0] if x[0] else -1, reverse=True)
-        
-        # Second pass: re-score with diversity consideration
-        for base_score, recipe, recipe_tokens in initial_scores:
-            if base_score is None:
-                scored.append((None, recipe))
-                continue
-            
-            # Calculate diversity bonus/penalty
-            diversity_score = self.scorer.score_diversity(recipe_tokens, used_tokens)
-            
-            # Combine scores (70% match, 30% diversity)
-            final_score = base_score * 0.7 + diversity_score * 0.3
-            
-            scored.append((final_score, recipe))
-            
-            # Update used tokens (for next iteration)
-            used_tokens.update(recipe_tokens)
-        
-        return scored
+        batch, incidence = self._batch_scores(candidates, inventory_tokens, inventory_map)
+        
+        # Best base score first (unscorable and zero scores last); each recipe
+        # is then compared with the ingredients of those ranked above it
+        order = np.argsort(-np.where(batch.valid & (batch.scores != 0), batch.scores, -1), kind="stable")
+        diversity = self.scorer.diversity_batch(incidence, order)
+        
+        # Combine scores (70% match, 30% diversity)
+        final = batch.scores * 0.7 + diversity * 0.3
+        
+        return [
+            (float(final[i]) if batch.valid[i] else None, candidates[i])
+            for i in order
+        ]
     
     def get_planning_summary(self) -> dict:
         """
@@ -177,5 +215,6 @@ class MealPlanningService:
             'total_meals_needed': self.days * self.meals_per_day,
             'inventory_summary': self.inventory.get_inventory_summary(),
             'providers': [p.provider_name for p in self.providers],
+            'provider_timings': self.provider_timings,
             'diversity_enabled': self.use_diversity,
         }
\ No newline at end of file
@@ -4,10 +4,12 @@ Service for replacing meals in a meal plan.
 import logging
 from django.utils import timezone
 from django.db import transaction
-from meal_plans.models import MealPlanMeal
+from meal_plans.models import MealPlanMeal, MealPlanFoodUsage
 from food.models import Meal
 from .inventory import InventoryService
+from .meal_plan_optimizer import MealPlanOptimizer
 from .recipeProvider import MealDBRecipeProvider, AIRecipeProvider
+from .provider_fanout import fan_out
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +49,7 @@ def replace_meal(meal_plan_meal_id, user, use_ai=True):
     # Get user's inventory
     inventory = InventoryService(user)
     
-    if not inventory.get_available_logs().exists():
+    if not inventory.has_items():
         raise ValueError("No available ingredients to generate alternative meal")
     
     # Get alternative recipes
@@ -55,13 +57,7 @@ def replace_meal(meal_plan_meal_id, user, use_ai=True):
     if use_ai:
         providers.append(AIRecipeProvider(inventory))
     
-    all_candidates = []
-    for provider in providers:
-        try:
-            candidates = provider.find_recipes(limit=10)
-            all_candidates.extend(candidates)
-        except Exception as e:
-            logger.exception(f"Provider {provider.provider_name} failed: {e}")
+    all_candidates = fan_out(providers, limit=10).candidates
     
     if not all_candidates:
         raise ValueError("No alternative recipes found")
@@ -99,6 +95,16 @@ def replace_meal(meal_plan_meal_id, user, use_ai=True):
     meal_plan_meal.replaced_at = timezone.now()
     meal_plan_meal.save(update_fields=['meal', 'is_replaced', 'replaced_at', 'original_meal'])
     
+    # The old recipe's reservations go with it; reserve for the new one
+    meal_plan_meal.planned_usages.all().delete()
+    [usages] = MealPlanOptimizer.for_inventory(inventory).allocate(
+        [(meal_plan_meal.meal_plan_day.date, best_alternative)]
+    )
+    MealPlanFoodUsage.objects.bulk_create([
+        MealPlanFoodUsage(meal_plan_meal=meal_plan_meal, food_log_id=food_log_id, planned_quantity=qty)
+        for food_log_id, qty in usages
+    ])
+    
     logger.info(
         f"Replaced meal {meal_plan_meal.id}: "
         f"{current_recipe} → {best_alternative.title}"
@@ -0,0 +1,148 @@
+"""
+Nightly pre-generation of draft meal plans.
+
+Off-peak, run_pregeneration() walks the users whose food logs changed
+recently, in chunks, and for each one ranks and scores recipes exactly as
+MealPlanningService does, but against MealDB only (no OpenAI calls in a
+batch) and on the shared in-memory catalog matrix (one ranking engine for
+every user instead of one Postgres top-k query each). The ranked recipes,
+details loaded, are stored in the cache as the user's draft together with
+the fingerprint of the inventory they were chosen for.
+
+When the user then asks for a plan, take_draft() hands the draft over if
+the inventory fingerprint still matches, the request would use every
+provider the draft was ranked with, and it holds enough recipes; only the
+(bulk) build is left to do. A MealDB-only draft therefore also serves the
+default request with AI fallback: AI only tops up a plan MealDB can't fill,
+and a draft that covers the plan means MealDB could. A draft is used once.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from food.models import FoodLogSys
+from recipes.services.ranking import get_ranking_engine
+from .inventory import InventoryService
+from .meal_planning_service import MealPlanningService
+from .recipeProvider import MealDBRecipeProvider, RecipeCandidate, load_recipe_details
+
+logger = logging.getLogger(__name__)
+
+# the draft holds enough recipes for a week of four meals a day
+PREGEN_DAYS = 7
+PREGEN_MEALS_PER_DAY = 4
+DRAFT_TTL_SECONDS = 36 * 60 * 60
+ACTIVE_WINDOW = timedelta(days=1)
+CHUNK_SIZE = 200
+LAST_RUN_KEY = "mealplan:pregen:last_run"
+
+
+def draft_key(user_id: int) -> str:
+    return f"mealplan:draft:{user_id}"
+
+
+def active_user_ids(since) -> list[int]:
+    """Users with a food log created or changed since `since`."""
+    return list(
+        FoodLogSys.objects.filter(updated_at__gte=since)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+
+def pregenerate_for_user(user, engine=None) -> bool:
+    """Rank, score and store the user's draft; False if there was nothing to plan with."""
+    inventory = InventoryService(user)
+    if not inventory.has_items():
+        cache.delete(draft_key(user.id))
+        return False
+
+    service = MealPlanningService(
+        user=user,
+        start_date=timezone.now().date(),
+        days=PREGEN_DAYS,
+        meals_per_day=PREGEN_MEALS_PER_DAY,
+        providers=[MealDBRecipeProvider(inventory, ranking_engine=engine or get_ranking_engine())],
+    )
+    providers = [p.provider_name for p in service.providers]
+    try:
+        recipes = service.select_recipes()[:PREGEN_DAYS * PREGEN_MEALS_PER_DAY]
+    except ValueError as e:
+        logger.info(f"No draft for user {user.id}: {e}")
+        cache.delete(draft_key(user.id))
+        return False
+
+    load_recipe_details(recipes)
+    cache.set(
+        draft_key(user.id),
+        {
+            "fingerprint": inventory.snapshot.fingerprint,
+            "providers": providers,
+            "created_at": timezone.now().isoformat(),
+            "recipes": [recipe.to_dict() for recipe in recipes],
+        },
+        timeout=DRAFT_TTL_SECONDS,
+    )
+    return True
+
+
+def run_pregeneration(since=None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Draft plans for every recently active user; returns (and records) the run's metrics."""
+    started = time.monotonic()
+    since = since or timezone.now() - ACTIVE_WINDOW
+    user_ids = active_user_ids(since)
+    engine = get_ranking_engine()
+    User = get_user_model()
+
+    drafted = skipped = failed = 0
+    for start in range(0, len(user_ids), chunk_size):
+        for user in User.objects.filter(id__in=user_ids[start:start + chunk_size]).order_by("id"):
+            try:
+                if pregenerate_for_user(user, engine):
+                    drafted += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                logger.exception(f"Pre-generation failed for user {user.id}: {e}")
+
+    seconds = time.monotonic() - started
+    metrics = {
+        "users": len(user_ids),
+        "drafted": drafted,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "users_per_sec": round(len(user_ids) / seconds, 1) if seconds > 0 else 0.0,
+        "finished_at": timezone.now().isoformat(),
+    }
+    cache.set(LAST_RUN_KEY, metrics, timeout=None)
+    logger.info(f"Meal plan pre-generation: {metrics}")
+    return metrics
+
+
+def take_draft(user, inventory: InventoryService, days: int, meals_per_day: int, providers) -> list | None:
+    """
+    The user's pre-generated recipes, best first, if they were chosen for the
+    inventory the user has now, from providers the request would also use
+    (`providers`; extra ones such as AI fallback are fine), and cover
+    days x meals_per_day; None otherwise.
+    """
+    key = draft_key(user.id)
+    draft = cache.get(key)
+    if draft is None:
+        return None
+    if not set(draft["providers"]) <= {p.provider_name for p in providers}:
+        return None
+    if draft["fingerprint"] != inventory.snapshot.fingerprint:
+        cache.delete(key)
+        return None
+    if len(draft["recipes"]) < days * meals_per_day:
+        return None
+    cache.delete(key)
+    return [RecipeCandidate.from_dict(data) for data in draft["recipes"]]
@@ -0,0 +1,110 @@
+"""
+Progress of async meal plan generation, published to the cache (Redis).
+
+The Celery task reports each pipeline stage through a ProgressReporter; the
+record under `mealplan:progress:<task_id>` holds the current stage, a
+percentage, partial results gathered so far and a sequence number that grows
+with every update. Status endpoints read it directly (no AsyncResult round
+trip) and can block until `seq` moves past what the client has already seen
+(long-poll / Server-Sent Events), so clients get updates as they happen
+instead of polling blindly.
+
+Waiting holds the request's worker, so waits are short (see the views'
+caps) and the cache is polled with a back-off rather than a fixed beat.
+"""
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+PROGRESS_TTL_SECONDS = 60 * 60
+# first re-read after 50ms, then 1.5x longer each time, at most 1s apart
+POLL_MIN_INTERVAL_SECONDS = 0.05
+POLL_MAX_INTERVAL_SECONDS = 1.0
+POLL_BACKOFF = 1.5
+
+STAGES = ("inventory", "candidates", "ai_fallback", "scoring", "build")
+
+STATE_QUEUED = "QUEUED"
+STATE_RUNNING = "RUNNING"
+STATE_RETRYING = "RETRYING"
+STATE_SUCCESS = "SUCCESS"
+STATE_FAILURE = "FAILURE"
+TERMINAL_STATES = (STATE_SUCCESS, STATE_FAILURE)
+
+
+def progress_key(task_id: str) -> str:
+    return f"mealplan:progress:{task_id}"
+
+
+def read_progress(task_id: str) -> dict | None:
+    return cache.get(progress_key(task_id))
+
+
+def wait_for_progress(task_id: str, since: int = -1, timeout: float = 0.0) -> dict | None:
+    """
+    The task's progress once its `seq` is past `since` (or it finished),
+    waiting up to `timeout` seconds; the latest record (maybe None) otherwise.
+    """
+    deadline = time.monotonic() + max(0.0, timeout)
+    interval = POLL_MIN_INTERVAL_SECONDS
+    while True:
+        progress = read_progress(task_id)
+        if progress is not None and (progress["seq"] > since or progress["state"] in TERMINAL_STATES):
+            return progress
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return progress
+        time.sleep(min(interval, remaining))
+        interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL_SECONDS)
+
+
+class NullProgress:
+    """Reporter for synchronous generation: every update is dropped."""
+
+    def stage(self, name, **partial):
+        pass
+
+
+class ProgressReporter:
+    def __init__(self, task_id: str, user_id: int):
+        self.task_id = task_id
+        self.user_id = user_id
+        self._record = read_progress(task_id) or {
+            "task_id": task_id,
+            "user_id": user_id,
+            "state": STATE_QUEUED,
+            "stage": None,
+            "stages": list(STAGES),
+            "percent": 0,
+            "partial": {},
+            "seq": -1,
+        }
+
+    def _publish(self, **changes):
+        self._record.update(changes)
+        self._record["seq"] += 1
+        self._record["updated_at"] = timezone.now().isoformat()
+        cache.set(progress_key(self.task_id), self._record, timeout=PROGRESS_TTL_SECONDS)
+
+    def queued(self):
+        self._publish(state=STATE_QUEUED)
+
+    def stage(self, name: str, **partial):
+        """Enter stage `name`; `partial` is merged into the partial results."""
+        done = STAGES.index(name)
+        self._publish(
+            state=STATE_RUNNING,
+            stage=name,
+            percent=round(100 * done / len(STAGES)),
+            partial={**self._record["partial"], **partial},
+        )
+
+    def done(self, **result):
+        self._publish(state=STATE_SUCCESS, percent=100, result=result)
+
+    def retrying(self, error: str):
+        self._publish(state=STATE_RETRYING, error=error)
+
+    def fail(self, error: str):
+        self._publish(state=STATE_FAILURE, error=error)
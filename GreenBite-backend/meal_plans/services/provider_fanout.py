@@ -0,0 +1,147 @@
+"""
+Run recipe providers concurrently, each under its own deadline.
+
+fan_out() starts every provider's find_recipes() at once on a shared thread
+pool and collects whatever finished by each provider's deadline (measured
+from the start of the fan-out), so the OpenAI round trip overlaps the MealDB
+query instead of being added to it. A provider that misses its deadline or
+raises contributes nothing; its thread finishes in the background and the
+result is dropped.
+
+Providers that read the database (`uses_db`) run on the calling thread when
+it is inside a transaction: a pool thread has its own connection and
+wouldn't see the caller's uncommitted rows. They also do when they are the
+only provider: there is nothing to overlap them with, and batch callers
+would otherwise open (and close) a connection per call.
+
+Deadlines default to each provider's `deadline_seconds` and can be
+overridden per provider class name with settings.MEAL_PLAN_PROVIDER_DEADLINES.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 8
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="recipe-provider")
+        return _executor
+
+
+@dataclass
+class ProviderRun:
+    provider: str
+    status: str
+    seconds: float
+    candidates: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "provider": self.provider,
+            "status": self.status,
+            "ms": round(self.seconds * 1000, 1),
+            "candidates": len(self.candidates),
+        }
+
+
+@dataclass
+class FanoutResult:
+    runs: list
+
+    @property
+    def candidates(self) -> list:
+        """Every candidate that arrived in time, in provider order."""
+        return [c for run in self.runs for c in run.candidates]
+
+    def by_provider(self) -> dict:
+        return {run.provider: run for run in self.runs}
+
+    @property
+    def timings(self) -> list[dict]:
+        return [run.as_dict() for run in self.runs]
+
+
+def provider_deadline(provider) -> float:
+    overrides = getattr(settings, "MEAL_PLAN_PROVIDER_DEADLINES", {}) or {}
+    return float(overrides.get(provider.provider_name, provider.deadline_seconds))
+
+
+def _run(provider, limit, started) -> ProviderRun:
+    if provider.max_results is not None:
+        limit = min(limit, provider.max_results)
+    try:
+        candidates = provider.find_recipes(limit=limit)
+        return ProviderRun(provider.provider_name, STATUS_OK, time.monotonic() - started, candidates)
+    except Exception as e:
+        logger.exception(f"{provider.provider_name} failed: {e}")
+        return ProviderRun(provider.provider_name, STATUS_ERROR, time.monotonic() - started)
+
+
+def _run_in_thread(provider, limit, started) -> ProviderRun:
+    try:
+        return _run(provider, limit, started)
+    finally:
+        # pool threads outlive the request; don't leak their connections
+        connections.close_all()
+
+
+def fan_out(providers, limit: int, on_run=None) -> FanoutResult:
+    """
+    find_recipes(limit) on every provider concurrently. Returns one
+    ProviderRun per provider, in the order given. on_run(run, pending) is
+    called on this thread as each run is collected, with the names of the
+    providers still outstanding.
+    """
+    started = time.monotonic()
+    in_atomic = connection.in_atomic_block
+    alone = len(providers) == 1
+
+    futures = {}
+    for provider in providers:
+        if not (provider.uses_db and (in_atomic or alone)):
+            futures[provider] = _pool().submit(_run_in_thread, provider, limit, started)
+
+    runs = {}
+
+    def collected(provider, run):
+        runs[provider] = run
+        if on_run is not None:
+            on_run(run, [p.provider_name for p in providers if p not in runs])
+
+    for provider in providers:
+        if provider not in futures:
+            collected(provider, _run(provider, limit, started))
+
+    for provider, future in futures.items():
+        remaining = started + provider_deadline(provider) - time.monotonic()
+        try:
+            run = future.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            logger.warning(
+                f"{provider.provider_name} missed its {provider_deadline(provider):.1f}s deadline; "
+                f"continuing without it"
+            )
+            run = ProviderRun(provider.provider_name, STATUS_TIMEOUT, time.monotonic() - started)
+        collected(provider, run)
+
+    result = FanoutResult([runs[p] for p in providers])
+    logger.info(f"Provider fan-out: {result.timings}")
+    return result
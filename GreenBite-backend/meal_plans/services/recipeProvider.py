@@ -5,12 +5,40 @@ from .ai_fallback import generate_ai_recipes as generate_ai_recipes_raw
 
 from typing import List, Dict, Any , Optional
 from recipes.models import MealDBRecipe
+from recipes.services.token_ids import token_ids, top_overlapping_recipes
+from .provider_fanout import fan_out
 import logging
-from django.db.models import Q
+import numpy as np
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+# columns needed to rank and list a MealDB candidate; ingredients/instructions load on demand
+CARD_FIELDS = ("id", "mealdb_id", "title", "ingredient_tokens", "thumbnail", "category", "cuisine")
+_DEFERRED = object()
+
+
+def load_recipe_details(candidates) -> None:
+    """Fill deferred ingredients/instructions of MealDB candidates with one query."""
+    pending = [c for c in candidates if c._ingredients is _DEFERRED or c._instructions is _DEFERRED]
+    if not pending:
+        return
+    ids = {c.metadata.get("recipe_id") for c in pending}
+    details = {
+        rid: (ingredients, instructions)
+        for rid, ingredients, instructions in MealDBRecipe.objects.filter(id__in=ids).values_list(
+            "id", "ingredients", "instructions"
+        )
+    }
+    for c in pending:
+        ingredients, instructions = details.get(c.metadata.get("recipe_id"), ([], ""))
+        if c._ingredients is _DEFERRED:
+            c._ingredients = ingredients or []
+        if c._instructions is _DEFERRED:
+            c._instructions = instructions or ""
+
+
 class RecipeCandidate:
     def __init__(
         self,
@@ -22,22 +50,73 @@ class RecipeCandidate:
         ingredient_tokens: Optional[List[str]] = None,
         cuisine: str = "",
         metadata: Optional[Dict[str, Any]] = None,
+        defer_details: bool = False,
     ):
         self.title = title
-        self.ingredients = ingredients
         self.source = source  # 'mealdb', 'ai', 'custom'
         self.thumbnail = thumbnail
-        self.instructions = instructions
         self.ingredient_tokens = ingredient_tokens or []
         self.cuisine = cuisine
         self.metadata = metadata or {}
         self.score = 0.0  # Will be set by scorer
-    
+        # defer_details: ingredients/instructions are fetched from MealDBRecipe
+        # (metadata["recipe_id"]) on first access, see load_recipe_details()
+        self._ingredients = _DEFERRED if defer_details else ingredients
+        self._instructions = _DEFERRED if defer_details else instructions
+
+    @property
+    def ingredients(self):
+        if self._ingredients is _DEFERRED:
+            load_recipe_details([self])
+        return self._ingredients
+
+    @ingredients.setter
+    def ingredients(self, value):
+        self._ingredients = value
+
+    @property
+    def instructions(self):
+        if self._instructions is _DEFERRED:
+            load_recipe_details([self])
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, value):
+        self._instructions = value
+
+    def to_dict(self) -> dict:
+        """Plain-data form (details loaded), for caching; see from_dict()."""
+        return {
+            "title": self.title,
+            "ingredients": self.ingredients,
+            "source": self.source,
+            "thumbnail": self.thumbnail,
+            "instructions": self.instructions,
+            "ingredient_tokens": self.ingredient_tokens,
+            "cuisine": self.cuisine,
+            "metadata": self.metadata,
+            "score": self.score,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RecipeCandidate":
+        data = dict(data)
+        score = data.pop("score", 0.0)
+        candidate = cls(**data)
+        candidate.score = score
+        return candidate
+
     def __repr__(self):
         return f"<RecipeCandidate: {self.title} (source={self.source}, score={self.score:.2f})>"
 
 
 class RecipeProvider(ABC):
+    # seconds a fan-out waits for this provider (see provider_fanout)
+    deadline_seconds = 10.0
+    # reads the database in find_recipes()
+    uses_db = True
+    # cap on the limit a fan-out asks this provider for (None = no cap)
+    max_results = None
 
     def __init__(self, inventory_service):
         self.inventory_service = inventory_service
@@ -64,14 +143,19 @@ class RecipeProvider(ABC):
         return self.__class__.__name__
     
 class AIRecipeProvider(RecipeProvider):
+    deadline_seconds = 20.0
+    # works from the inventory snapshot already loaded in __init__
+    uses_db = False
+    max_results = 50
+
     def find_recipes(self, limit: int = 30) -> List[RecipeCandidate]:
         # Placeholder for AI recipe generation logic
         logger.info(f"AIRecipeProvider: Generating up to {limit} recipes based on inventory.")
         if (not self.inventory_tokens):
             logger.warning("No inventory tokens available for AI recipe generation")
             return []
-        foodlog= self.inventory_service.get_available_logs()
-        if not foodlog.exists():
+        foodlog= self.inventory_service.food_logs
+        if not foodlog:
             logger.warning("No available food logs for AI recipe generation")
             return []
         try:
@@ -102,34 +186,56 @@ class AIRecipeProvider(RecipeProvider):
             return []
 
 class MealDBRecipeProvider(RecipeProvider):
-    def find_recipes(self, limit: int = 30) -> List[RecipeCandidate]:
+    deadline_seconds = 5.0
+
+    def __init__(self, inventory_service, ranking_engine=None):
+        """
+        ranking_engine: rank against this in-memory catalog matrix
+        (recipes.services.ranking) instead of in Postgres; batch jobs share
+        one across many users.
+        """
+        super().__init__(inventory_service)
+        self.ranking_engine = ranking_engine
+
+    def _top_recipes(self, limit: int, qs=None) -> list:
+        if self.ranking_engine is None:
+            ids = token_ids(self.inventory_tokens)
+            return list(top_overlapping_recipes(ids, limit, qs=qs).only(*CARD_FIELDS))
+
+        # same score as top_overlapping_recipes, over the whole catalog at once
+        ranked = self.ranking_engine.rank({t: None for t in self.inventory_tokens})
+        if not len(ranked):
+            return []
+        matched = ranked.match_counts
+        total = ranked.token_counts
+        scores = matched * 3 + (matched / total) * 10 - (total - matched)
+        order = np.lexsort((ranked.recipe_ids, -scores))
+        top_ids = [int(ranked.recipe_ids[i]) for i in order[:limit]]
+        qs = MealDBRecipe.objects.all() if qs is None else qs
+        recipe_map = qs.filter(id__in=top_ids).only(*CARD_FIELDS).in_bulk()
+        return [recipe_map[rid] for rid in top_ids if rid in recipe_map]
+
+    def find_recipes(self, limit: int = 30, qs=None) -> List[RecipeCandidate]:
+        """
+        Top `limit` recipes by ingredient overlap, ranked in Postgres on token
+        ids (or on the shared ranking engine); only card columns are read,
+        ingredients/instructions are deferred.
+        """
         logger.info(f"MealDBRecipeProvider: Fetching recipes with ingredient overlap.")
-        inventory_ings = list(self.inventory_tokens)
         if not self.inventory_tokens:
             logger.warning("No inventory tokens available for MealDB search")
             return []
-    
-        query = Q()
-        for ing in inventory_ings:
-            query |= Q(ingredient_tokens__contains=[ing])
-        #fetch
-                
-        candidate_recipes = MealDBRecipe.objects.filter(
-            query
-        ).only("id", "title", "ingredient_tokens", "instructions", "thumbnail", "ingredients","category","cuisine")
-        logger.info(f"MealDB: Found {candidate_recipes.count()} candidate recipes")
 
         recipes = []
-        for recipe in candidate_recipes:
+        for recipe in self._top_recipes(limit, qs=qs):
             rec_tokens = recipe.ingredient_tokens or []
             score_data = self.score_recipe(rec_tokens)
             if score_data.get("matched", 0) > 0:
                 candidate = RecipeCandidate(
                     title=recipe.title,
-                    ingredients=recipe.ingredients or [],
+                    ingredients=None,
                     source="mealdb",
                     thumbnail=recipe.thumbnail,
-                    instructions=recipe.instructions,
                     ingredient_tokens=rec_tokens,
                     cuisine=recipe.cuisine,
                     metadata={
@@ -137,7 +243,8 @@ class MealDBRecipeProvider(RecipeProvider):
                         'category': recipe.category,
                         'cuisine': recipe.cuisine,
                         'mealdb_id': recipe.mealdb_id,
-                    }
+                    },
+                    defer_details=True,
                 )
 
                 candidate.score = score_data.get("score", 0)
@@ -147,48 +254,42 @@ class MealDBRecipeProvider(RecipeProvider):
                     'match_ratio': score_data.get('match_ratio', 0.0),
                 })
                 recipes.append(candidate)
-            logger.info(f"MealDBRecipeProvider: Found {len(recipes)} suitable recipes.")
-            recipes.sort(key=lambda r: r.score, reverse=True)
-        recipes = recipes[:limit]
+        logger.info(f"MealDBRecipeProvider: Found {len(recipes)} suitable recipes.")
+        recipes.sort(key=lambda r: r.score, reverse=True)
         return recipes
     def find_by_category(self, category: str, limit: int = 10) -> List[RecipeCandidate]:
         logger.info(f"MealDBRecipeProvider: Fetching recipes in category '{category}'")
-        candidate_recipes = self.find_recipes(limit=100)
-        filtered_recipes = [
-            recipe for recipe in candidate_recipes
-            if recipe.metadata.get('category', '').lower() == category.lower()
-        ]
-        return filtered_recipes[:limit]
+        return self.find_recipes(limit=limit, qs=MealDBRecipe.objects.filter(category__iexact=category))
     def find_by_cuisine(self, cuisine: str, limit: int = 10) -> List[RecipeCandidate]:
         logger.info(f"MealDBRecipeProvider: Fetching recipes in cuisine '{cuisine}'")
-        candidate_recipes = self.find_recipes(limit=100)
-        filtered_recipes = [
-            recipe for recipe in candidate_recipes
-            if recipe.metadata.get('cuisine', '').lower() == cuisine.lower()
-        ]
-        return filtered_recipes[:limit]
+        return self.find_recipes(limit=limit, qs=MealDBRecipe.objects.filter(cuisine__iexact=cuisine))
 class CompositeRecipeProvider(RecipeProvider):
     def __init__(self, inventory_service, use_ai: bool = True):
         super().__init__(inventory_service)
         self.mealdb_provider = MealDBRecipeProvider(inventory_service)
         self.ai_provider = AIRecipeProvider(inventory_service) if use_ai else None
-
+        self.provider_timings = []
 
     def find_recipes(self, limit: int = 30) -> List[RecipeCandidate]:
         all_recipes = []
-        
+
+        # AI is only a top-up: it is asked (and paid for) only when MealDB
+        # comes up short; each call still runs under its provider's deadline
         logger.info(f"Composite: Fetching recipes from MealDB (limit={limit})")
-        mealdb_recipes = self.mealdb_provider.find_recipes(limit=limit)
+        runs = fan_out([self.mealdb_provider], limit=limit).runs
+        mealdb_recipes = runs[0].candidates
         all_recipes.extend(mealdb_recipes)
-        
         logger.info(f"Composite: Got {len(mealdb_recipes)} recipes from MealDB")
-        
+
         if len(all_recipes) < limit and self.ai_provider:
-            remaining = min(limit - len(all_recipes), 50)  
+            remaining = min(limit - len(all_recipes), 50)
             logger.info(f"Composite: Fetching recipes from AI (limit={remaining})")
-            ai_recipes = self.ai_provider.find_recipes(limit=remaining)
+            ai_runs = fan_out([self.ai_provider], limit=remaining).runs
+            runs += ai_runs
+            ai_recipes = ai_runs[0].candidates
             all_recipes.extend(ai_recipes)
             logger.info(f"Composite: Got {len(ai_recipes)} recipes from AI")
+        self.provider_timings = [run.as_dict() for run in runs]
 
         # Deduplicate
         unique_recipes = {}
@@ -208,6 +309,7 @@ class CompositeRecipeProvider(RecipeProvider):
             
             # Repeat recipes to fill the gap
             base_count = len(sorted_recipes)
+            load_recipe_details(sorted_recipes)
             while len(sorted_recipes) < limit:
                 # Copy recipes (with slightly lower score to indicate they're repeats)
                 for original in sorted_recipes[:base_count]:
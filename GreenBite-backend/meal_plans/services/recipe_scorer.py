@@ -1,12 +1,89 @@
 """
 RecipeScorer - Scores recipe candidates based on various criteria.
+
+score() and score_diversity() rate one recipe at a time; score_batch() and
+diversity_batch() rate a whole candidate list at once over a recipe x token
+incidence matrix (see incidence_matrix() / inventory_vectors()) and give the
+same numbers.
 """
 import logging
+from dataclasses import dataclass
 from typing import Set, Dict, Any, Optional
 from decimal import Decimal
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# (quantity above, bonus) per matched ingredient; the first tier that applies wins
+ABUNDANCE_TIERS = ((1000, 2.0), (500, 1.0), (200, 0.5))
+# matched ingredients expiring sooner than this earn an expiry bonus
+EXPIRY_HORIZON_DAYS = 30
+
+
+def incidence_matrix(token_lists) -> tuple[np.ndarray, dict]:
+    """
+    token_lists: one iterable of tokens per recipe. Returns a bool
+    (recipes x vocabulary) matrix and the {token: column} vocabulary.
+    """
+    vocab: dict[str, int] = {}
+    rows, cols = [], []
+    for i, tokens in enumerate(token_lists):
+        for t in set(tokens or ()):
+            col = vocab.get(t)
+            if col is None:
+                col = vocab[t] = len(vocab)
+            rows.append(i)
+            cols.append(col)
+    matrix = np.zeros((len(token_lists), len(vocab)), dtype=bool)
+    matrix[rows, cols] = True
+    return matrix, vocab
+
+
+def inventory_vectors(
+    vocab: dict,
+    inventory_tokens,
+    inventory_map: Optional[Dict[str, Decimal]] = None,
+    inventory_days: Optional[Dict[str, int]] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (present, quantities, days_left) over the vocabulary; tokens without a
+    quantity get 0, tokens without an expiry get NaN days.
+    """
+    present = np.zeros(len(vocab), dtype=bool)
+    quantities = np.zeros(len(vocab), dtype=np.float64)
+    days_left = np.full(len(vocab), np.nan)
+    for token, col in vocab.items():
+        present[col] = token in inventory_tokens
+        if inventory_map:
+            quantities[col] = float(inventory_map.get(token, 0))
+        if inventory_days and token in inventory_days:
+            days_left[col] = inventory_days[token]
+    return present, quantities, days_left
+
+
+@dataclass(frozen=True)
+class BatchScores:
+    """Parallel arrays, one entry per recipe row of the incidence matrix."""
+
+    base_scores: np.ndarray
+    abundance_bonuses: np.ndarray
+    expiry_bonuses: np.ndarray
+    match_ratios: np.ndarray
+    matched: np.ndarray
+    token_counts: np.ndarray
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Recipes without tokens can't be scored (score() returns None)."""
+        return self.token_counts > 0
+
+    @property
+    def scores(self) -> np.ndarray:
+        """What score() returns per recipe; NaN where it returns None."""
+        total = self.base_scores + self.abundance_bonuses + self.expiry_bonuses
+        return np.where(self.valid, total, np.nan)
+
 
 class RecipeScorer:
     """
@@ -17,7 +94,9 @@ class RecipeScorer:
         self,
         match_weight: float = 3.0,
         ratio_weight: float = 10.0,
-        missing_penalty: float = 0.5
+        missing_penalty: float = 0.5,
+        abundance_tiers=ABUNDANCE_TIERS,
+        expiry_weight: float = 0.0
     ):
         """
         Initialize scorer with configurable weights.
@@ -25,6 +104,8 @@ class RecipeScorer:
         self.match_weight = match_weight
         self.ratio_weight = ratio_weight
         self.missing_penalty = missing_penalty
+        self.abundance_tiers = tuple(sorted(abundance_tiers, reverse=True))
+        self.expiry_weight = expiry_weight
     
     def score(
         self,
@@ -96,14 +177,65 @@ class RecipeScorer:
             quantity = inventory_map.get(token, Decimal('0'))
             
             # Give small bonus for high quantities
-            if quantity > 1000:  # grams
-                bonus += 2.0
-            elif quantity > 500:
-                bonus += 1.0
-            elif quantity > 200:
-                bonus += 0.5
+            for threshold, tier_bonus in self.abundance_tiers:
+                if quantity > threshold:
+                    bonus += tier_bonus
+                    break
         
         return bonus
+
+    def score_batch(
+        self,
+        incidence: np.ndarray,
+        present: np.ndarray,
+        quantities: Optional[np.ndarray] = None,
+        days_left: Optional[np.ndarray] = None
+    ) -> BatchScores:
+        """
+        Score every recipe row of `incidence` (bool, recipes x tokens) at once.
+
+        present / quantities / days_left are vectors over the same tokens (see
+        inventory_vectors()). Abundance bonuses need quantities; expiry bonuses
+        need days_left and a non-zero expiry_weight.
+        """
+        incidence = np.asarray(incidence, dtype=bool)
+        n_recipes = incidence.shape[0]
+        hits = incidence & np.asarray(present, dtype=bool)
+
+        token_counts = incidence.sum(axis=1)
+        matched = hits.sum(axis=1)
+        missing = token_counts - matched
+        match_ratios = np.divide(
+            matched, token_counts, out=np.zeros(n_recipes), where=token_counts > 0
+        )
+        base_scores = (
+            matched * self.match_weight +
+            match_ratios * self.ratio_weight -
+            missing * self.missing_penalty
+        )
+
+        abundance_bonuses = np.zeros(n_recipes)
+        if quantities is not None and self.abundance_tiers:
+            per_token = np.zeros(incidence.shape[1])
+            # lowest tier first, so higher tiers overwrite it
+            for threshold, tier_bonus in reversed(self.abundance_tiers):
+                per_token[np.asarray(quantities, dtype=np.float64) > threshold] = tier_bonus
+            abundance_bonuses = hits @ per_token
+
+        expiry_bonuses = np.zeros(n_recipes)
+        if days_left is not None and self.expiry_weight:
+            days = np.asarray(days_left, dtype=np.float64)
+            urgency = np.clip(EXPIRY_HORIZON_DAYS - days, 0, None) / EXPIRY_HORIZON_DAYS
+            expiry_bonuses = self.expiry_weight * (hits @ np.nan_to_num(urgency))
+
+        return BatchScores(
+            base_scores=base_scores,
+            abundance_bonuses=abundance_bonuses,
+            expiry_bonuses=expiry_bonuses,
+            match_ratios=match_ratios,
+            matched=matched,
+            token_counts=token_counts,
+        )
     
     def score_diversity(
         self,
@@ -127,6 +259,26 @@ class RecipeScorer:
         diversity_score = 10.0 * (1 - overlap_ratio)
         
         return diversity_score
+
+    def diversity_batch(self, incidence: np.ndarray, order: np.ndarray) -> np.ndarray:
+        """
+        score_diversity() for every recipe when they are taken in `order`:
+        each one is compared with the tokens of all recipes taken before it.
+        Returned in row order.
+        """
+        incidence = np.asarray(incidence, dtype=bool)
+        ranked = incidence[order]
+        used_before = np.zeros_like(ranked)
+        if len(ranked) > 1:
+            used_before[1:] = np.logical_or.accumulate(ranked[:-1], axis=0)
+        overlap = (ranked & used_before).sum(axis=1)
+        counts = ranked.sum(axis=1)
+        ratio = np.divide(overlap, counts, out=np.zeros(len(ranked)), where=counts > 0)
+        diversity = np.where(counts > 0, 10.0 * (1 - ratio), 0.0)
+
+        out = np.empty(len(ranked))
+        out[order] = diversity
+        return out
     
     def score_with_diversity(
         self,
@@ -112,13 +112,16 @@ def async_generate_meal_plan(
     from .services.meal_planning_service import MealPlanningService
     from .services.inventory import InventoryService
     from .services.recipeProvider import MealDBRecipeProvider, AIRecipeProvider
-    
+    from .services.progress import ProgressReporter
+
+    progress = ProgressReporter(self.request.id, user_id)
     try:
         User = get_user_model()
         user = User.objects.get(pk=user_id)
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
         
-        # Initialize providers
+        # Initialize providers (this loads the inventory snapshot)
+        progress.stage("inventory")
         inventory = InventoryService(user)
         providers = [MealDBRecipeProvider(inventory)]
         
@@ -135,7 +138,8 @@ def async_generate_meal_plan(
             use_diversity=True
         )
         
-        meal_plan = service.generate()
+        meal_plan = service.generate(progress=progress)
+        progress.done(meal_plan_id=meal_plan.id)
         
         logger.info(f"✅ Task completed: Generated meal plan {meal_plan.id}")
         
@@ -147,6 +151,17 @@ def async_generate_meal_plan(
         
     except Exception as exc:
         logger.exception(f"Task failed for user {user_id}: {exc}")
+        if self.request.retries >= self.max_retries:
+            progress.fail(str(exc))
+        else:
+            progress.retrying(str(exc))
         
         # Retry with exponential backoff
-        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
\ No newline at end of file
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+
+@shared_task
+def pregenerate_meal_plans():
+    """Nightly: draft meal plans for users whose inventory changed recently."""
+    from .services.pregeneration import run_pregeneration
+
+    return run_pregeneration()
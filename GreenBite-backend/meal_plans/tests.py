@@ -1,13 +1,38 @@
+import time
+import uuid
 from decimal import Decimal
+from unittest import mock
+
+import numpy as np
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from food.models import FoodLogSys
 from meal_plans.models import MealPlan, MealPlanDay, MealPlanMeal, MealPlanFoodUsage
+from meal_plans.services.inventory import InventoryService, InventorySnapshot
+from meal_plans.services.confirmeal import confirm_meal_plan_day
+from meal_plans.services.meal_replacement import replace_meal
+from meal_plans.services.meal_plan_builder import MealPlanBuilder
+from meal_plans.services.meal_plan_optimizer import MealPlanOptimizer, parse_measure
+from meal_plans.services.pregeneration import draft_key, run_pregeneration, take_draft
+from meal_plans.services.recipe_scorer import RecipeScorer, incidence_matrix, inventory_vectors
+from meal_plans.services.progress import ProgressReporter, read_progress, wait_for_progress
+from meal_plans.services.provider_fanout import fan_out
+from meal_plans.services.recipeProvider import (
+    AIRecipeProvider,
+    CompositeRecipeProvider,
+    MealDBRecipeProvider,
+    RecipeCandidate,
+    RecipeProvider,
+    load_recipe_details,
+)
+from recipes.models import MealDBRecipe
+from recipes.services.ingredient_index import ingredient_index
 
 
 API_PREFIX = "/api/meal_plans/"
@@ -150,3 +175,472 @@ class MealPlanUnauthorizedTestCase(TestCase):
     def test_generate_requires_auth(self):
         resp = self.client.post(f"{API_PREFIX}generate/", {"days": 1, "meals_per_day": 1}, format="json")
         self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "meal-plans-test-cache",
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class InventorySnapshotTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="snapshot_user@test.com", password="123456"
+        )
+        today = timezone.now().date()
+        for name, qty, unit, days, category in [
+            ("Tomatoes", "2", "kg", 1, "vegetables"),
+            ("tomato", "1", "kg", 10, "vegetables"),
+            ("Chicken Breast", "500", "g", 3, "meat"),
+            ("Old Milk", "1", "l", -1, "dairy"),
+        ]:
+            FoodLogSys.objects.create(
+                user=self.user, name=name, quantity=Decimal(qty), unit=unit,
+                expiry_date=today + timezone.timedelta(days=days), category=category,
+            )
+
+    def test_every_view_comes_from_one_query(self):
+        inventory = InventoryService(self.user)
+        with self.assertNumQueries(1):
+            snap = inventory.snapshot
+            tokens = inventory.get_inventory_tokens(use_synonyms=True)
+            inv_map = inventory.get_inventory_map()
+            weighted = inventory.get_expiry_weighted_inventory()
+            summary = inventory.get_food_log_summary()
+            self.assertTrue(inventory.has_items())
+
+        self.assertEqual(len(snap), 3)
+        self.assertEqual(list(snap.days_left), [1, 3, 10])
+        self.assertIn("chicken", tokens)
+        self.assertEqual(inv_map["chicken breast"], Decimal("500"))
+        self.assertEqual(weighted["chicken breast"]["weighted_score"], Decimal("500") * 27)
+        self.assertEqual(summary["total_items"], 3)
+        self.assertEqual(summary["expiring_soon"], 2)
+        self.assertEqual(summary["soonest_expiring"]["name"], "Tomatoes")
+        self.assertEqual(summary["by_category"]["vegetables"]["count"], 2)
+        self.assertEqual(summary["quantity_by_unit"], {"kg": 3.0, "g": 500.0})
+
+    def test_bytes_round_trip(self):
+        snap = InventorySnapshot.load(self.user)
+        copy = InventorySnapshot.from_bytes(snap.to_bytes())
+        self.assertEqual(copy.items(), snap.items())
+        self.assertEqual(copy.as_of, snap.as_of)
+
+        empty = InventorySnapshot.from_rows([], snap.as_of)
+        self.assertEqual(len(InventorySnapshot.from_bytes(empty.to_bytes())), 0)
+
+    def test_snapshot_is_shared_until_a_food_log_changes(self):
+        first = InventoryService(self.user).snapshot
+        with self.assertNumQueries(0):
+            shared = InventoryService(self.user).snapshot
+        self.assertEqual(shared.items(), first.items())
+
+        FoodLogSys.objects.create(
+            user=self.user, name="Rice", quantity=Decimal("1"), unit="kg",
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30), category="grains",
+        )
+        with self.assertNumQueries(1):
+            fresh = InventoryService(self.user).snapshot
+        self.assertEqual(len(fresh), 4)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MealDBRecipeProviderTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="provider_user@test.com", password="123456"
+        )
+        for name in ("Rice", "Onion", "Tomato"):
+            FoodLogSys.objects.create(
+                user=self.user, name=name, quantity=Decimal("1"), unit="kg",
+                expiry_date=timezone.now().date() + timezone.timedelta(days=5), category="pantry",
+            )
+        for mealdb_id, title, category, names in [
+            ("p1", "Partial", "Side", ["Rice", "Salt"]),
+            ("p2", "Perfect", "Side", ["Rice", "Onion"]),
+            ("p3", "Big", "Main", ["Rice", "Onion", "Tomato", "Salt", "Cumin"]),
+            ("p4", "Unrelated", "Main", ["Salt"]),
+        ]:
+            MealDBRecipe.objects.create(
+                mealdb_id=mealdb_id, title=title, category=category,
+                instructions=f"Cook the {title.lower()} dish.",
+                ingredients=[{"name": n} for n in names],
+            )
+
+    def test_top_k_ranked_in_sql_with_deferred_details(self):
+        provider = MealDBRecipeProvider(InventoryService(self.user))
+        candidates = provider.find_recipes(limit=2)
+        self.assertEqual([c.title for c in candidates], ["Perfect", "Big"])
+        self.assertEqual(candidates[0].score, 16)
+
+        with self.assertNumQueries(1):
+            load_recipe_details(candidates)
+            self.assertEqual(candidates[1].instructions, "Cook the big dish.")
+            self.assertEqual(len(candidates[1].ingredients), 5)
+
+        sides = provider.find_by_category("side", limit=5)
+        self.assertEqual([c.title for c in sides], ["Perfect", "Partial"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MealPlanOptimizerTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="optimizer_user@test.com", password="123456"
+        )
+        self.today = timezone.now().date()
+        self.rice_soon = self._log("Rice", "500", "g", 1)
+        self.rice_late = self._log("Rice", "1", "kg", 10)
+        self.onion = self._log("Onion", "2", "pcs", 5)
+
+    def _log(self, name, qty, unit, days):
+        return FoodLogSys.objects.create(
+            user=self.user, name=name, quantity=Decimal(qty), unit=unit,
+            expiry_date=self.today + timezone.timedelta(days=days), category="pantry",
+        )
+
+    def _recipe(self, title, *ingredients):
+        return RecipeCandidate(
+            title=title,
+            ingredients=[{"name": n, "measure": m} for n, m in ingredients],
+            source="mealdb",
+        )
+
+    def test_parse_measure(self):
+        self.assertEqual(parse_measure("200g"), ("mass", Decimal("200")))
+        self.assertEqual(parse_measure("1/2 cup"), ("volume", Decimal("120")))
+        self.assertEqual(parse_measure("2"), ("count", Decimal("2")))
+        self.assertIsNone(parse_measure("a pinch"))
+
+    def test_allocates_soonest_expiry_within_available_quantity(self):
+        optimizer = MealPlanOptimizer(InventorySnapshot.load(self.user).items())
+        day = timezone.timedelta(days=1)
+        allocations = optimizer.allocate([
+            (self.today + 3 * day, self._recipe("Pilaf", ("Rice", "500g"), ("Onion", "2"))),
+            (self.today, self._recipe("Fried rice", ("Rice", "300g"), ("Onion", "1"))),
+            (self.today + day, self._recipe("Rice bowl", ("Rice", "300 g"))),
+        ])
+
+        self.assertEqual(allocations[1], [(self.rice_soon.id, Decimal("300")), (self.onion.id, Decimal("1"))])
+        self.assertEqual(allocations[2], [(self.rice_soon.id, Decimal("200")), (self.rice_late.id, Decimal("0.10"))])
+        # the soon-expiring rice is gone by day 3 and only one onion is left
+        self.assertEqual(allocations[0], [(self.rice_late.id, Decimal("0.50")), (self.onion.id, Decimal("1"))])
+
+    def test_build_is_a_fixed_number_of_inserts(self):
+        builder = MealPlanBuilder(self.user, self.today, days=30, meals_per_day=4)
+        recipes = [self._recipe(f"Recipe {i}", ("Salt", "1 tsp")) for i in range(118)]
+        # savepoint, plan, days, meals, release
+        with self.assertNumQueries(5):
+            plan = builder.build(recipes)
+        self.assertEqual(plan.days_plan.count(), 30)
+        self.assertEqual(MealPlanMeal.objects.filter(meal_plan_day__meal_plan=plan).count(), 118)
+
+    def test_built_plan_carries_usages_that_confirmation_applies(self):
+        inventory = InventoryService(self.user)
+        builder = MealPlanBuilder(self.user, self.today, days=1, meals_per_day=2)
+        plan = builder.build(
+            [self._recipe("Fried rice", ("Rice", "300g"), ("Onion", "1")), self._recipe("Plain rice", ("Rice", "200g"))],
+            optimizer=MealPlanOptimizer.for_inventory(inventory),
+        )
+        usages = MealPlanFoodUsage.objects.filter(meal_plan_meal__meal_plan_day__meal_plan=plan)
+        self.assertEqual(usages.count(), 3)
+
+        confirm_meal_plan_day(plan.days_plan.get(), self.user)
+        self.rice_soon.refresh_from_db()
+        self.onion.refresh_from_db()
+        self.assertEqual(self.rice_soon.quantity, Decimal("0"))
+        self.assertEqual(self.onion.quantity, Decimal("1"))
+
+    def test_meals_without_usages_fall_back_to_estimates_on_a_mixed_day(self):
+        plan = MealPlanBuilder(self.user, self.today, days=1, meals_per_day=1).build(
+            [self._recipe("Fried rice", ("Rice", "300g"))],
+            optimizer=MealPlanOptimizer.for_inventory(InventoryService(self.user)),
+        )
+        day = plan.days_plan.get()
+        # added by hand, nothing reserved for it
+        MealPlanMeal.objects.create(
+            meal_plan_day=day, meal_time="dinner", draft_title="Onion soup",
+            draft_ingredients=[{"name": "Onion", "measure": "2"}],
+        )
+
+        confirm_meal_plan_day(day, self.user)
+        self.rice_soon.refresh_from_db()
+        self.onion.refresh_from_db()
+        self.assertEqual(self.rice_soon.quantity, Decimal("200"))
+        # 100-unit estimate, capped at what is there
+        self.assertEqual(self.onion.quantity, Decimal("0"))
+
+    def test_replaced_meal_is_confirmed_with_its_own_usages(self):
+        MealDBRecipe.objects.create(
+            mealdb_id="r1", title="Onion Bhaji", category="Side",
+            instructions="Fry the onion.", ingredients=[{"name": "Onion", "measure": "1"}],
+        )
+        plan = MealPlanBuilder(self.user, self.today, days=1, meals_per_day=1).build(
+            [self._recipe("Plain rice", ("Rice", "500g"))],
+            optimizer=MealPlanOptimizer.for_inventory(InventoryService(self.user)),
+        )
+        plan_meal = MealPlanMeal.objects.get(meal_plan_day__meal_plan=plan)
+
+        replace_meal(plan_meal.id, self.user, use_ai=False)
+        self.assertEqual(
+            list(plan_meal.planned_usages.values_list("food_log_id", "planned_quantity")),
+            [(self.onion.id, Decimal("1.00"))],
+        )
+
+        confirm_meal_plan_day(plan.days_plan.get(), self.user)
+        self.rice_soon.refresh_from_db()
+        self.onion.refresh_from_db()
+        self.assertEqual(self.rice_soon.quantity, Decimal("500"))
+        self.assertEqual(self.onion.quantity, Decimal("1"))
+
+
+class _StubProvider(RecipeProvider):
+    uses_db = False
+
+    def __init__(self, title, delay=0.0, deadline=1.0, fail=False):
+        self.title = title
+        self.delay = delay
+        self.deadline_seconds = deadline
+        self.fail = fail
+        self.calls = 0
+
+    @property
+    def provider_name(self):
+        return self.title
+
+    def find_recipes(self, limit=30):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [RecipeCandidate(title=f"{self.title} {i}", ingredients=[]) for i in range(limit)]
+
+
+class ProviderFanoutTestCase(TestCase):
+    def test_providers_run_concurrently_under_deadlines(self):
+        providers = [
+            _StubProvider("fast", delay=0.2),
+            _StubProvider("also fast", delay=0.2),
+            _StubProvider("slow", delay=1.0, deadline=0.3),
+            _StubProvider("broken", fail=True),
+        ]
+        started = time.monotonic()
+        result = fan_out(providers, limit=2)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([r.status for r in result.runs], ["ok", "ok", "timeout", "error"])
+        self.assertEqual([c.title for c in result.candidates], ["fast 0", "fast 1", "also fast 0", "also fast 1"])
+        self.assertEqual(result.timings[0]["candidates"], 2)
+
+    def test_composite_asks_ai_only_when_mealdb_comes_up_short(self):
+        user = get_user_model().objects.create_user(email="composite_user@test.com", password="123456")
+        composite = CompositeRecipeProvider(InventoryService(user))
+        composite.mealdb_provider = _StubProvider("mealdb")
+        composite.ai_provider = _StubProvider("ai")
+
+        self.assertEqual(len(composite.find_recipes(limit=3)), 3)
+        self.assertEqual(composite.ai_provider.calls, 0)
+        self.assertEqual([t["provider"] for t in composite.provider_timings], ["mealdb"])
+
+        composite.mealdb_provider = _StubProvider("mealdb", fail=True)
+        titles = [c.title for c in composite.find_recipes(limit=2)]
+        self.assertEqual((composite.ai_provider.calls, titles), (1, ["ai 0", "ai 1"]))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MealPlanProgressTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="progress_user@test.com", password="123456"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task_id = str(uuid.uuid4())
+        self.reporter = ProgressReporter(self.task_id, self.user.id)
+        self.reporter.queued()
+        self.reporter.stage("inventory")
+        self.reporter.stage("candidates", inventory_items=4)
+
+    def test_long_poll_returns_only_newer_updates(self):
+        progress = wait_for_progress(self.task_id, since=-1)
+        self.assertEqual((progress["seq"], progress["stage"], progress["percent"]), (2, "candidates", 20))
+        self.assertEqual(progress["partial"], {"inventory_items": 4})
+
+        # nothing newer than seq 2 yet: times out with the same record
+        self.assertEqual(wait_for_progress(self.task_id, since=2, timeout=0)["seq"], 2)
+
+        resp = self.client.get(f"{API_PREFIX}tasks/{self.task_id}/", {"since": 1})
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data["stage"], "candidates")
+        self.assertNotIn("user_id", resp.data)
+
+        other = get_user_model().objects.create_user(email="other_progress@test.com", password="123456")
+        self.client.force_authenticate(user=other)
+        resp = self.client.get(f"{API_PREFIX}tasks/{self.task_id}/")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_waiting_backs_off_between_cache_reads(self):
+        with mock.patch("meal_plans.services.progress.read_progress", wraps=read_progress) as reads:
+            wait_for_progress(self.task_id, since=2, timeout=0.5)
+        # 50ms, 75ms, 112ms, 169ms... instead of a read every 50ms
+        self.assertLessEqual(reads.call_count, 6)
+
+    def test_event_stream_ends_with_the_result(self):
+        self.reporter.stage("build", top_recipes=[{"title": "Pilaf"}])
+        self.reporter.done(meal_plan_id=42)
+
+        resp = self.client.get(
+            f"{API_PREFIX}tasks/{self.task_id}/events/", HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID="2"
+        )
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        body = b"".join(resp.streaming_content).decode()
+
+        self.assertTrue(body.startswith("id: 4\nevent: progress\n"))
+        self.assertIn('"meal_plan_id": 42', body)
+        self.assertIn('"state": "SUCCESS"', body)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MealPlanPregenerationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email=f"pregen_{uuid.uuid4().hex[:8]}@test.com", password="123456"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.rice = FoodLogSys.objects.create(
+            user=self.user, name="Rice", quantity=Decimal("1"), unit="kg",
+            expiry_date=timezone.now().date() + timezone.timedelta(days=5), category="pantry",
+        )
+        FoodLogSys.objects.create(
+            user=self.user, name="Onion", quantity=Decimal("3"), unit="pcs",
+            expiry_date=timezone.now().date() + timezone.timedelta(days=3), category="produce",
+        )
+        for mealdb_id, title, names in [
+            ("g1", "Pilaf", ["Rice", "Onion"]),
+            ("g2", "Rice Bowl", ["Rice", "Salt"]),
+            ("g3", "Onion Soup", ["Onion", "Butter", "Salt"]),
+        ]:
+            MealDBRecipe.objects.create(
+                mealdb_id=mealdb_id, title=title, category="Main",
+                instructions=f"Cook the {title.lower()}.",
+                ingredients=[{"name": n, "measure": "100g"} for n in names],
+            )
+        # index changes land on commit; rebuild this worker's index from the test's rows
+        ingredient_index.reset()
+
+    def _take(self, days, meals_per_day, use_ai=False):
+        inventory = InventoryService(self.user)
+        providers = [MealDBRecipeProvider(inventory)] + ([AIRecipeProvider(inventory)] if use_ai else [])
+        return take_draft(self.user, inventory, days, meals_per_day, providers)
+
+    def test_draft_is_served_when_inventory_is_unchanged(self):
+        metrics = run_pregeneration()
+        self.assertEqual((metrics["users"], metrics["drafted"], metrics["failed"]), (1, 1, 0))
+        self.assertIn("users_per_sec", metrics)
+
+        resp = self.client.post(
+            f"{API_PREFIX}generate/", {"days": 1, "meals_per_day": 2, "use_ai_fallback": False}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(resp.data["from_draft"])
+        plan = MealPlan.objects.get(id=resp.data["meal_plan_id"])
+        meals = MealPlanMeal.objects.filter(meal_plan_day__meal_plan=plan).order_by("id")
+        self.assertEqual(len(meals), 2)
+        self.assertEqual(meals[0].draft_title, "Pilaf")
+        # a draft is used once
+        self.assertIsNone(self._take(1, 2))
+
+    def test_inventory_change_retires_the_draft(self):
+        run_pregeneration()
+        self.assertIsNotNone(cache.get(draft_key(self.user.id)))
+        # too many meals for the draft: left in place for a smaller request
+        self.assertIsNone(self._take(7, 4))
+
+        self.rice.quantity = Decimal("0.5")
+        self.rice.save()
+        self.assertIsNone(self._take(1, 2))
+        self.assertIsNone(cache.get(draft_key(self.user.id)))
+
+    def test_default_request_with_ai_fallback_takes_a_covering_draft(self):
+        run_pregeneration()
+        # more meals than the MealDB draft holds: left for the live path, AI included
+        self.assertIsNone(self._take(2, 2, use_ai=True))
+
+        resp = self.client.post(f"{API_PREFIX}generate/", {"days": 1, "meals_per_day": 2}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(resp.data["from_draft"])
+
+
+class RecipeScorerBatchTestCase(TestCase):
+    def setUp(self):
+        self.recipes = [
+            ["rice", "onion", "salt"],
+            ["rice", "onion"],
+            [],
+            ["butter", "milk"],
+            ["onion", "tomato", "cumin", "rice"],
+        ]
+        self.inventory_tokens = {"rice", "onion", "tomato"}
+        self.inventory_map = {"rice": Decimal("1200"), "onion": Decimal("300"), "tomato": Decimal("50")}
+
+    def test_batch_matches_per_recipe_scores(self):
+        scorer = RecipeScorer()
+        incidence, vocab = incidence_matrix(self.recipes)
+        present, quantities, _ = inventory_vectors(vocab, self.inventory_tokens, self.inventory_map)
+        batch = scorer.score_batch(incidence, present, quantities)
+
+        for i, tokens in enumerate(self.recipes):
+            expected = scorer.score(set(tokens), self.inventory_tokens, self.inventory_map)
+            if expected is None:
+                self.assertFalse(batch.valid[i])
+                self.assertTrue(batch.scores[i] != batch.scores[i])  # NaN
+            else:
+                self.assertAlmostEqual(batch.scores[i], expected)
+        self.assertEqual(batch.abundance_bonuses.tolist(), [2.5, 2.5, 0.0, 0.0, 2.5])
+        self.assertEqual(batch.match_ratios[1], 1.0)
+
+        # weights stay configurable
+        heavy = RecipeScorer(match_weight=5.0, abundance_tiers=((100, 4.0),))
+        self.assertAlmostEqual(
+            heavy.score_batch(incidence, present, quantities).scores[4],
+            heavy.score({"onion", "tomato", "cumin", "rice"}, self.inventory_tokens, self.inventory_map),
+        )
+
+    def test_diversity_ranking_matches_sequential_rescoring(self):
+        scorer = RecipeScorer()
+        incidence, vocab = incidence_matrix(self.recipes)
+        present, quantities, _ = inventory_vectors(vocab, self.inventory_tokens, self.inventory_map)
+        base = scorer.score_batch(incidence, present, quantities).scores
+        order = np.argsort(-np.nan_to_num(base, nan=-1), kind="stable")
+        diversity = scorer.diversity_batch(incidence, order)
+
+        used = set()
+        for i in order:
+            tokens = set(self.recipes[i])
+            self.assertAlmostEqual(diversity[i], scorer.score_diversity(tokens, used))
+            used |= tokens
+
+
+class AIFallbackPromptTestCase(TestCase):
+    def test_prompt_metric_reports_the_trimmed_ingredients(self):
+        from meal_plans.services import ai_fallback
+
+        # Mock(name=...) names the mock itself, so set the attribute afterwards
+        logs = [mock.Mock() for _ in range(30)]
+        for i, log in enumerate(logs):
+            log.name = f"ingredient {i}"
+        reply = mock.Mock()
+        reply.choices = [mock.Mock(message=mock.Mock(content="[]"))]
+        with mock.patch.object(ai_fallback, "client") as client, \
+                mock.patch.object(ai_fallback, "report_prompt") as report:
+            client.chat.completions.create.return_value = reply
+            ai_fallback.generate_ai_recipes(logs, 3)
+
+        self.assertEqual(report.call_args.kwargs["items_in"], 30)
+        self.assertEqual(report.call_args.kwargs["items_kept"], 20)
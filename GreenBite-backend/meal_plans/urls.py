@@ -9,6 +9,7 @@ from .views import (
     MealPlanMealSkipAPIView,
     MealPlanListAPIView, 
     MealPlanTaskStatusAPIView,
+    MealPlanTaskEventsAPIView,
 )
 
 app_name = 'meal_plans'
@@ -29,5 +30,6 @@ urlpatterns = [
     
     path('<int:pk>/delete/', MealPlanDeleteAPIView.as_view(), name='delete_meal_plan'), 
     path("tasks/<str:task_id>/", MealPlanTaskStatusAPIView.as_view(), name="mealplan-task-status"),
+    path("tasks/<str:task_id>/events/", MealPlanTaskEventsAPIView.as_view(), name="mealplan-task-events"),
 
 ]
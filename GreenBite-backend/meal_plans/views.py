@@ -13,10 +13,26 @@ from .models import MealPlanMeal, MealPlanDay, MealPlan
 from .services.meal_planning_service import MealPlanningService
 from .services.inventory import InventoryService
 from .services.recipeProvider import MealDBRecipeProvider, AIRecipeProvider
+from .services.pregeneration import take_draft
 from .tasks import async_generate_meal_plan, generate_and_store_waste_logs_for_day
 from .serializers import MealPlanDetailSerializer
+import json
 import logging
+import time
+import uuid
 from celery.result import AsyncResult
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .services.progress import (
+    STATE_FAILURE,
+    STATE_SUCCESS,
+    TERMINAL_STATES,
+    ProgressReporter,
+    read_progress,
+    wait_for_progress,
+)
 from food.serializers import WasteLogSerializer
 from food.utils.recipes_ai import generate_waste_profile_with_cache
 
@@ -52,17 +68,24 @@ class MealPlanGeneratorView(APIView):
 
         try:
             if async_mode:
-                task = async_generate_meal_plan.delay(
-                    request.user.id,
-                    start_date.strftime("%Y-%m-%d"),
-                    days,
-                    meals_per_day,
-                    use_ai
+                # progress exists before the worker can pick the task up
+                task_id = str(uuid.uuid4())
+                ProgressReporter(task_id, request.user.id).queued()
+                task = async_generate_meal_plan.apply_async(
+                    args=(
+                        request.user.id,
+                        start_date.strftime("%Y-%m-%d"),
+                        days,
+                        meals_per_day,
+                        use_ai,
+                    ),
+                    task_id=task_id,
                 )
                 return Response({
                     "status": "queued",
                     "task_id": task.id,
-                    "message": "Meal plan generation started in background"
+                    "message": "Meal plan generation started in background",
+                    "events_url": reverse("meal_plans:mealplan-task-events", args=[task.id]),
                 }, status=202)
             
             inventory = InventoryService(request.user)
@@ -79,12 +102,18 @@ class MealPlanGeneratorView(APIView):
                 providers=providers
             )
             
-            meal_plan = service.generate()
+            # a nightly draft for this exact inventory only needs building
+            draft = take_draft(request.user, service.inventory, days, meals_per_day, providers)
+            if draft is not None:
+                meal_plan = service.build(draft)
+            else:
+                meal_plan = service.generate()
             
             return Response({
                 "meal_plan_id": meal_plan.id,
                 "days": days,
                 "start_date": start_date,
+                "from_draft": draft is not None,
                 "message": "Meal plan generated successfully"
             }, status=201)
             
@@ -377,9 +406,33 @@ class MealPlanListAPIView(APIView):
         return Response(data)
 
 class MealPlanTaskStatusAPIView(APIView):
+    """
+    GET /meal_plans/tasks/<task_id>/?since=<seq>&wait=<seconds>
+
+    Progress published by the task (stage, percent, partial results). With
+    `wait`, blocks up to MAX_WAIT_SECONDS until there is an update newer
+    than `since` (long-poll). Tasks without a progress record fall back to
+    the Celery result.
+
+    A waiting request holds a worker thread, hence the short cap; clients
+    simply ask again with the last `seq` they saw.
+    """
     permission_classes = [IsAuthenticated]
+    MAX_WAIT_SECONDS = 5
 
     def get(self, request, task_id):
+        try:
+            since = int(request.query_params.get("since", -1))
+            wait = min(float(request.query_params.get("wait", 0)), self.MAX_WAIT_SECONDS)
+        except ValueError:
+            return Response({"error": "since and wait must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        progress = wait_for_progress(task_id, since=since, timeout=wait)
+        if progress is not None:
+            if progress["user_id"] != request.user.id:
+                return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(_progress_payload(progress), status=_progress_status(progress))
+
         res = AsyncResult(task_id)
 
         payload = {
@@ -403,3 +456,79 @@ class MealPlanTaskStatusAPIView(APIView):
             return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource clients (Accept: text/event-stream) through content negotiation."""
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # only error bodies are rendered; the stream itself bypasses renderers
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class MealPlanTaskEventsAPIView(APIView):
+    """
+    GET /meal_plans/tasks/<task_id>/events/
+
+    Server-Sent Events: one `progress` event per update, ending with the
+    SUCCESS/FAILURE event (or after MAX_STREAM_SECONDS; EventSource
+    reconnects by itself with Last-Event-ID). The stream holds a worker
+    thread while open, so it is kept short.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    MAX_STREAM_SECONDS = 20
+    HEARTBEAT_SECONDS = 5
+
+    def get(self, request, task_id):
+        progress = read_progress(task_id)
+        if progress is None or progress["user_id"] != request.user.id:
+            return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            since = int(request.headers.get("Last-Event-ID", -1))
+        except ValueError:
+            since = -1
+
+        response = StreamingHttpResponse(
+            _progress_events(task_id, since, self.MAX_STREAM_SECONDS, self.HEARTBEAT_SECONDS),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+def _progress_payload(progress):
+    payload = {key: value for key, value in progress.items() if key != "user_id"}
+    result = progress.get("result") or {}
+    if "meal_plan_id" in result:
+        payload["meal_plan_id"] = result["meal_plan_id"]
+    return payload
+
+
+def _progress_status(progress):
+    if progress["state"] == STATE_SUCCESS:
+        return status.HTTP_200_OK
+    if progress["state"] == STATE_FAILURE:
+        return status.HTTP_400_BAD_REQUEST
+    return status.HTTP_202_ACCEPTED
+
+
+def _progress_events(task_id, since, max_seconds, heartbeat_seconds):
+    deadline = time.monotonic() + max_seconds
+    while time.monotonic() < deadline:
+        wait = min(heartbeat_seconds, deadline - time.monotonic())
+        progress = wait_for_progress(task_id, since=since, timeout=wait)
+        if progress is None or progress["seq"] <= since:
+            if progress is not None and progress["state"] in TERMINAL_STATES:
+                return
+            yield ": keep-alive\n\n"
+            continue
+        since = progress["seq"]
+        data = json.dumps(_progress_payload(progress), cls=DjangoJSONEncoder)
+        yield f"id: {since}\nevent: progress\ndata: {data}\n\n"
+        if progress["state"] in TERMINAL_STATES:
+            return
@@ -15,5 +15,10 @@ app.conf.beat_schedule = {
         "task": "community.tasks.daily_status_update",
         "schedule": crontab(hour=0, minute=0),  # every day at midnight
     },
+    # meal plan drafts, off-peak
+    "nightly_meal_plan_pregeneration": {
+        "task": "meal_plans.tasks.pregenerate_meal_plans",
+        "schedule": crontab(hour=3, minute=30),
+    },
 }
 
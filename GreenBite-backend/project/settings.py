@@ -99,6 +99,12 @@ REST_FRAMEWORK = {
     }
 }
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# /recipes/recommend LLM selection: "async" (refine in Celery), "sync" or "off"
+RECOMMEND_LLM_MODE = os.getenv("RECOMMEND_LLM_MODE", "async")
+# estimated input-token budget for the recommendation selector prompt
+RECOMMEND_PROMPT_TOKEN_BUDGET = int(os.getenv("RECOMMEND_PROMPT_TOKEN_BUDGET", "3000"))
+# /recipes/mealdb/random: "ids" (cached id array) or "tablesample" (Postgres TABLESAMPLE)
+RECIPE_RANDOM_SAMPLER = os.getenv("RECIPE_RANDOM_SAMPLER", "ids")
 
 S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://minio:9000")
 S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL", S3_ENDPOINT_URL)
@@ -0,0 +1,158 @@
+"""
+Multi-pattern text matching (Aho-Corasick).
+
+MultiPatternMatcher compiles any number of patterns into one automaton and
+reports every occurrence in a single pass over the text, so the cost is
+O(len(text) + matches) instead of O(patterns * len(text)) for a loop of
+`p in text` / per-pattern regexes.
+
+Uses the C automaton from `pyahocorasick` when it is installed, otherwise a
+pure-Python one with the same results. Matching is case-insensitive; offsets
+refer to the lowercased text.
+"""
+from collections import deque
+from typing import Iterable, Iterator, Mapping, NamedTuple
+
+try:
+    import ahocorasick
+except ImportError:  # optional dependency
+    ahocorasick = None
+
+
+class Match(NamedTuple):
+    start: int
+    end: int  # exclusive
+    pattern: str
+    value: object
+
+
+class _PyAutomaton:
+    """goto/fail/output tables; output lists already include the fail chain."""
+
+    def __init__(self, patterns: list[str]):
+        goto = [{}]
+        fail = [0]
+        out = [()]
+        for idx, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (idx,)
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def iter(self, text: str) -> Iterator[tuple[int, int]]:
+        """(end index inclusive, pattern index) for every occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in out[state]:
+                yield i, idx
+
+
+class _NativeAutomaton:
+    def __init__(self, patterns: list[str]):
+        self._automaton = ahocorasick.Automaton()
+        for idx, pattern in enumerate(patterns):
+            self._automaton.add_word(pattern, idx)
+        self._automaton.make_automaton()
+
+    def iter(self, text: str) -> Iterator[tuple[int, int]]:
+        return self._automaton.iter(text)
+
+
+def _clean(pattern: str) -> str:
+    return " ".join(str(pattern).lower().split())
+
+
+class MultiPatternMatcher:
+    """
+    patterns: iterable of strings, or a mapping pattern -> value (the value is
+    reported with each match; defaults to the pattern itself).
+    whole_words: only report matches not glued to letters/digits on either side,
+    so "rice" doesn't match inside "price".
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str] | Mapping[str, object],
+        *,
+        whole_words: bool = True,
+        native: bool | None = None,
+    ):
+        items = patterns.items() if isinstance(patterns, Mapping) else ((p, p) for p in patterns)
+        values = {}
+        for pattern, value in items:
+            key = _clean(pattern)
+            if key:
+                values.setdefault(key, value)
+
+        self.whole_words = whole_words
+        self._patterns = list(values)
+        self._values = [values[p] for p in self._patterns]
+
+        if native is None:
+            native = ahocorasick is not None
+        if not self._patterns:
+            self._automaton = None
+        elif native:
+            if ahocorasick is None:
+                raise ImportError("pyahocorasick is not installed")
+            self._automaton = _NativeAutomaton(self._patterns)
+        else:
+            self._automaton = _PyAutomaton(self._patterns)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def finditer(self, text: str) -> Iterator[Match]:
+        """Every occurrence, ordered by end offset; overlapping matches included."""
+        if self._automaton is None or not text:
+            return
+        text = text.lower()
+        n = len(text)
+        for last, idx in self._automaton.iter(text):
+            pattern = self._patterns[idx]
+            start = last - len(pattern) + 1
+            end = last + 1
+            if self.whole_words and (
+                (start > 0 and text[start - 1].isalnum()) or (end < n and text[end].isalnum())
+            ):
+                continue
+            yield Match(start, end, pattern, self._values[idx])
+
+    def findall(self, text: str) -> list[Match]:
+        return list(self.finditer(text))
+
+    def find_values(self, text: str) -> set:
+        """Distinct values of everything that occurs in `text`."""
+        return {m.value for m in self.finditer(text)}
+
+    def contains_any(self, text: str) -> bool:
+        for _ in self.finditer(text):
+            return True
+        return False
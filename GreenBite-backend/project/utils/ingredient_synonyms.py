@@ -2,6 +2,9 @@
 Ingredient synonym mappings for semantic matching.
 Base ingredient → list of common synonyms/variants.
 """
+from types import MappingProxyType
+
+from project.utils.normalize import normalize_ingredient_name
 
 INGREDIENT_SYNONYMS = {
     # Proteins
@@ -62,22 +65,35 @@ INGREDIENT_SYNONYMS = {
 }
 
 
+def _compile_synonym_index():
+    """
+    Normalized variant -> normalized base, and base -> frozen expansion set.
+    Built once at import; the first base that claims a variant wins, same as
+    the old first-match loop over INGREDIENT_SYNONYMS.
+    """
+    base_of = {}
+    expansions = {}
+    for base, synonyms in INGREDIENT_SYNONYMS.items():
+        normalized_base = normalize_ingredient_name(base)
+        normalized_synonyms = [normalize_ingredient_name(s) for s in synonyms]
+        expansions.setdefault(normalized_base, frozenset([normalized_base, *normalized_synonyms]))
+        for variant in (normalized_base, *normalized_synonyms):
+            base_of.setdefault(variant, (normalized_base, expansions[normalized_base]))
+    return MappingProxyType(base_of)
+
+
+# normalized variant -> (normalized base, frozenset of base + all its synonyms)
+SYNONYM_INDEX = _compile_synonym_index()
+
+
 def get_base_ingredient(ingredient: str) -> str:
     """
     Given an ingredient name, return its base form if it's a known synonym.
     Otherwise return the ingredient unchanged (normalized).
     """
-    from project.utils.normalize import normalize_ingredient_name
-    
     normalized = normalize_ingredient_name(ingredient)
-    
-    # Check if this is a synonym of any base ingredient
-    for base, synonyms in INGREDIENT_SYNONYMS.items():
-        normalized_synonyms = [normalize_ingredient_name(s) for s in synonyms]
-        if normalized in normalized_synonyms or normalized == normalize_ingredient_name(base):
-            return normalize_ingredient_name(base)
-    
-    return normalized
+    hit = SYNONYM_INDEX.get(normalized)
+    return hit[0] if hit else normalized
 
 
 def expand_ingredient_tokens(ingredient: str) -> set:
@@ -87,19 +103,12 @@ def expand_ingredient_tokens(ingredient: str) -> set:
     - the base form (if it's a synonym)
     - all synonyms of the base form
     """
-    from project.utils.normalize import normalize_ingredient_name
-    
-    normalized = normalize_ingredient_name(ingredient)
-    tokens = {normalized}
-    
-    # Find base and add all related tokens
-    for base, synonyms in INGREDIENT_SYNONYMS.items():
-        normalized_base = normalize_ingredient_name(base)
-        normalized_synonyms = [normalize_ingredient_name(s) for s in synonyms]
-        
-        if normalized == normalized_base or normalized in normalized_synonyms:
-            tokens.add(normalized_base)
-            tokens.update(normalized_synonyms)
-            break
-    
-    return tokens
\ No newline at end of file
+    return expand_normalized(normalize_ingredient_name(ingredient))
+
+
+def expand_normalized(normalized: str) -> set:
+    """expand_ingredient_tokens for a name that is already normalized."""
+    hit = SYNONYM_INDEX.get(normalized)
+    if hit is None:
+        return {normalized}
+    return {normalized, *hit[1]}
@@ -1,9 +1,26 @@
 """
 Token extraction and expansion for ingredient matching.
 """
-from typing import List, Set
-from project.utils.normalize import normalize_ingredient_name
-from project.utils.ingredient_synonyms import expand_ingredient_tokens, get_base_ingredient
+from typing import Iterable, List, Set
+from project.utils.aho_corasick import MultiPatternMatcher
+from project.utils.normalize import DESCRIPTOR_WORDS, UNIT_WORDS, normalize_many
+from project.utils.ingredient_synonyms import INGREDIENT_SYNONYMS, SYNONYM_INDEX, expand_normalized, get_base_ingredient
+
+MENTION_INGREDIENT = "ingredient"
+MENTION_DESCRIPTOR = "descriptor"
+MENTION_UNIT = "unit"
+
+
+def _ingredient_names(ingredients: list) -> List[str]:
+    names = []
+    for ing in ingredients:
+        if isinstance(ing, dict):
+            name = ing.get("name") or ing.get("ingredient") or ""
+        else:
+            name = str(ing)
+        if name:
+            names.append(name)
+    return names
 
 
 def extract_tokens_from_recipe(ingredients: list) -> List[str]:
@@ -17,20 +34,9 @@ def extract_tokens_from_recipe(ingredients: list) -> List[str]:
     Returns:
         List of normalized unique tokens
     """
-    tokens = set()
-    
-    for ing in ingredients:
-        if isinstance(ing, dict):
-            name = ing.get("name") or ing.get("ingredient") or ""
-        else:
-            name = str(ing)
-        
-        if name:
-            normalized = normalize_ingredient_name(name)
-            if normalized:
-                tokens.add(normalized)
-    
-    return sorted(list(tokens))
+    tokens = set(normalize_many(_ingredient_names(ingredients)))
+    tokens.discard("")
+    return sorted(tokens)
 
 
 def extract_tokens_with_synonyms(ingredients: list) -> List[str]:
@@ -45,19 +51,11 @@ def extract_tokens_with_synonyms(ingredients: list) -> List[str]:
         List of normalized tokens including synonyms
     """
     all_tokens = set()
+    for normalized in normalize_many(_ingredient_names(ingredients)):
+        # Get all token variations (base + synonyms)
+        all_tokens.update(expand_normalized(normalized))
     
-    for ing in ingredients:
-        if isinstance(ing, dict):
-            name = ing.get("name") or ing.get("ingredient") or ""
-        else:
-            name = str(ing)
-        
-        if name:
-            # Get all token variations (base + synonyms)
-            tokens = expand_ingredient_tokens(name)
-            all_tokens.update(tokens)
-    
-    return sorted(list(all_tokens))
+    return sorted(all_tokens)
 
 
 def compute_ingredient_match_score(recipe_tokens: Set[str], inventory_tokens: Set[str]) -> float:
@@ -72,4 +70,56 @@ def compute_ingredient_match_score(recipe_tokens: Set[str], inventory_tokens: Se
         return 0.0
     
     matched = len(recipe_tokens & inventory_tokens)
-    return matched / len(recipe_tokens)
\ No newline at end of file
+    return matched / len(recipe_tokens)
+
+# Chunk workers for `manage.py backfill_tokens --workers N`. They take and return
+# plain tuples and never touch the DB, so they can run in spawned processes.
+
+def tokenize_rows(rows: list, with_synonyms: bool = False) -> list:
+    """[(pk, ingredients), ...] -> [(pk, tokens), ...]"""
+    # warm the local cache for the whole chunk with one shared-cache round trip
+    normalize_many(name for _pk, ingredients in rows for name in _ingredient_names(ingredients or []))
+    extract = extract_tokens_with_synonyms if with_synonyms else extract_tokens_from_recipe
+    return [(pk, extract(ingredients or [])) for pk, ingredients in rows]
+
+
+def normalize_rows(rows: list) -> list:
+    """[(pk, name), ...] -> [(pk, normalized name), ...]"""
+    norms = normalize_many(name or "" for _pk, name in rows)
+    return [(pk, norm) for (pk, _name), norm in zip(rows, norms)]
+
+
+def _surface_forms(name: str) -> list:
+    # normalized names are singular; free text usually isn't
+    forms = [name, name + "s", name + "es"]
+    if name.endswith("y"):
+        forms.append(name[:-1] + "ies")
+    return forms
+
+
+def build_mention_matcher(ingredients: Iterable[str] = ()) -> MultiPatternMatcher:
+    """
+    One automaton over the unit, descriptor and ingredient vocabularies.
+    Ingredients are every synonym entry, raw and normalized, plus `ingredients`
+    (e.g. the catalog's distinct ingredient_tokens); each match's value is
+    (kind, canonical name), with ingredients reported by their synonym base.
+    """
+    patterns = {}
+    for word in UNIT_WORDS:
+        patterns[word] = (MENTION_UNIT, word)
+    for word in DESCRIPTOR_WORDS:
+        patterns[word] = (MENTION_DESCRIPTOR, word)
+    for base, synonyms in INGREDIENT_SYNONYMS.items():
+        for raw in (base, *synonyms):
+            for form in _surface_forms(raw.lower()):
+                patterns.setdefault(form, (MENTION_INGREDIENT, get_base_ingredient(raw)))
+    for variant, (base, _expansion) in SYNONYM_INDEX.items():
+        for form in _surface_forms(variant):
+            patterns.setdefault(form, (MENTION_INGREDIENT, base))
+    for name in normalize_many(ingredients):
+        if not name:
+            continue
+        hit = SYNONYM_INDEX.get(name)
+        for form in _surface_forms(name):
+            patterns.setdefault(form, (MENTION_INGREDIENT, hit[0] if hit else name))
+    return MultiPatternMatcher(patterns)
@@ -1,5 +1,28 @@
+"""
+The one ingredient-name normalizer (recipes, food logs, meal plans).
+
+Rules are applied in a single pass of one compiled regex: parenthesised
+text and multi-word descriptors are skipped as whole matches, every other
+word is dropped if it is a unit/descriptor, else singularized; the joined
+result goes through the synonym map.
+
+Bump NORMALIZER_VERSION whenever the output of normalize_ingredient_name can
+change. Rows store the version they were tokenized with, and
+`manage.py backfill_tokens` re-tokenizes only the stale ones.
+
+Results are cached at two levels: a per-process LRU, and (for normalize_many)
+a Redis hash of raw -> normalized shared by every web/Celery worker, read and
+filled with one pipelined round trip per batch. The hash key carries
+NORMALIZER_VERSION, so a rule change starts from an empty hash.
+"""
+import logging
 import re
-from functools import lru_cache
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+NORMALIZER_VERSION = 2
 
 _UNITS = {
     "g", "kg", "mg", "ml", "l", "oz", "lb", "lbs",
@@ -16,9 +39,15 @@ _DESCRIPTORS = {
     "fresh", "chopped", "diced", "minced", "sliced", "grated", "ground",
     "large", "small", "medium", "extra", "lean",
     "boneless", "skinless", "seedless", "peeled",
-    "optional", "to", "taste", "and", "or"
+    "optional", "to", "taste", "and", "or",
+    # v2: merged from the old food/utils/normalize.py
+    "dried", "frozen", "canned", "raw", "cooked", "whole", "crushed",
+    "powdered", "virgin", "organic", "natural", "ripe", "unripe",
 }
 
+# dropped only as a phrase ("fat" alone is kept)
+_PHRASES = ("low fat", "full fat", "fat free", "reduced fat")
+
 _SYNONYMS = {
     "scallion": "green onion",
     "scallions": "green onion",
@@ -31,7 +60,25 @@ _SYNONYMS = {
     "cilantro": "coriander",
 }
 
-_word_re = re.compile(r"[a-zA-Z]+")
+LOCAL_CACHE_SIZE = 50000
+SHARED_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# raw strings longer than this are normalized but not shared
+SHARED_MAX_RAW_CHARS = 200
+_SHARED_CHUNK = 500
+
+_SKIP = frozenset(_UNITS | _DESCRIPTORS)
+
+# read-only vocabularies for text scanning (project.utils.ingredient_tokens)
+UNIT_WORDS = frozenset(_UNITS)
+DESCRIPTOR_WORDS = frozenset(_DESCRIPTORS) | frozenset(_PHRASES)
+
+# alternation order matters: parentheses and phrases win over plain words
+_scan_re = re.compile(
+    r"\([^)]*\)"
+    r"|\b(?:" + "|".join(re.escape(p) for p in _PHRASES) + r")\b"
+    r"|(?P<word>[a-z]+)"
+)
+
 
 def _singularize(token: str) -> str:
     # بسيط جدًا (مش perfect) لكنه كفاية للـ matching
@@ -45,31 +92,128 @@ def _singularize(token: str) -> str:
         return token[:-1]
     return token
 
-@lru_cache(maxsize=50000)
-def normalize_ingredient_name(text: str) -> str:
-    if not text:
-        return ""
 
-    s = str(text).strip().lower()
+class _LRU:
+    """Thread-safe bounded LRU that, unlike functools.lru_cache, can be probed."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
 
-    # remove anything in parentheses: "tomato (chopped)" -> "tomato"
-    s = re.sub(r"\([^)]*\)", " ", s)
 
-    tokens = _word_re.findall(s)
+_local = _LRU(LOCAL_CACHE_SIZE)
 
+
+def _normalize(text: str) -> str:
     cleaned = []
-    for t in tokens:
-        if t in _UNITS or t in _DESCRIPTORS:
+    for m in _scan_re.finditer(text.lower()):
+        t = m.group("word")
+        if t is None or t in _SKIP:
             continue
-        t = _singularize(t)
-        cleaned.append(t)
+        cleaned.append(_singularize(t))
 
-    norm = " ".join(cleaned).strip()
-    if not norm:
+    if not cleaned:
         return ""
 
+    norm = " ".join(cleaned)
     norm = _SYNONYMS.get(norm, norm)
-
-   
-    norm = re.sub(r"\s+", " ", norm).strip()
     return norm[:120]
+
+
+def normalize_ingredient_name(text: str) -> str:
+    if not text:
+        return ""
+    text = str(text)
+    norm = _local.get(text)
+    if norm is None:
+        norm = _normalize(text)
+        _local.put(text, norm)
+    return norm
+
+
+def _shared_hash():
+    """(redis client, hash key), or (None, None) when the cache isn't django-redis."""
+    try:
+        from django.core.cache import cache
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default"), cache.make_key(f"normalize:v{NORMALIZER_VERSION}")
+    except Exception:
+        return None, None
+
+
+def normalize_many(texts) -> list[str]:
+    """
+    normalize_ingredient_name over an iterable, in order. Strings missing from
+    the local LRU are looked up in the shared hash in one pipeline; whatever is
+    still missing is computed here and written back in one more.
+    """
+    texts = [str(t) if t else "" for t in texts]
+    out = {"": ""}
+    missing = []
+    for t in dict.fromkeys(texts):
+        if not t:
+            continue
+        norm = _local.get(t)
+        if norm is None:
+            missing.append(t)
+        else:
+            out[t] = norm
+    if not missing:
+        return [out[t] for t in texts]
+
+    shared = [t for t in missing if len(t) <= SHARED_MAX_RAW_CHARS]
+    client, key = _shared_hash() if shared else (None, None)
+    found = {}
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for i in range(0, len(shared), _SHARED_CHUNK):
+                pipe.hmget(key, shared[i:i + _SHARED_CHUNK])
+            values = [v for chunk in pipe.execute() for v in chunk]
+            found = {t: v.decode("utf-8") for t, v in zip(shared, values) if v is not None}
+        except Exception:
+            logger.warning("Shared normalization cache unavailable", exc_info=True)
+            client = None
+
+    computed = {}
+    for t in missing:
+        norm = found.get(t)
+        if norm is None:
+            norm = _normalize(t)
+            if len(t) <= SHARED_MAX_RAW_CHARS:
+                computed[t] = norm
+        _local.put(t, norm)
+        out[t] = norm
+
+    if client is not None and computed:
+        try:
+            pipe = client.pipeline(transaction=False)
+            items = list(computed.items())
+            for i in range(0, len(items), _SHARED_CHUNK):
+                pipe.hset(key, mapping=dict(items[i:i + _SHARED_CHUNK]))
+            pipe.expire(key, SHARED_CACHE_TTL_SECONDS)
+            pipe.execute()
+        except Exception:
+            logger.warning("Could not fill shared normalization cache", exc_info=True)
+
+    return [out[t] for t in texts]
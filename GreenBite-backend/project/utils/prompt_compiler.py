@@ -0,0 +1,215 @@
+"""
+Compact, token-budgeted payloads for the OpenAI prompts.
+
+- estimate_tokens: tiktoken when it is installed, otherwise ~4 chars per token
+- dedupe_names / fit_names: ingredient lists without repeats, cut to a budget
+- compile_selection_prompt: dictionary-encodes ingredient tokens into small
+  integer ids and packs as many candidates as fit the token budget
+- report_prompt: logs the size of every prompt we send
+"""
+import json
+import logging
+import math
+from dataclasses import dataclass
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# chat framing per message (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                logger.warning("tiktoken encoding unavailable; using chars/%s estimate", CHARS_PER_TOKEN)
+    return _encoding or None
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(str(m.get("content") or "")) + _MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def compact_json(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _name_key(name: str) -> str:
+    return " ".join(str(name or "").lower().split())
+
+
+def dedupe_names(names) -> list[str]:
+    """Drop empty and case/space-insensitive duplicate names, keeping first-seen order."""
+    seen = set()
+    out = []
+    for n in names:
+        key = _name_key(n)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        out.append(str(n).strip())
+    return out
+
+
+def fit_names(names, budget_tokens: int, sep: str = ", ") -> list[str]:
+    """Deduped names, cut so that `sep.join(names)` stays within `budget_tokens`."""
+    out = []
+    used = 0
+    for n in dedupe_names(names):
+        cost = estimate_tokens(n) + (estimate_tokens(sep) if out else 0)
+        if used + cost > budget_tokens:
+            break
+        out.append(n)
+        used += cost
+    return out
+
+
+@dataclass
+class PromptStats:
+    name: str
+    tokens: int
+    chars: int
+    items_in: int = 0
+    items_kept: int = 0
+    budget: int | None = None
+
+
+def report_prompt(name: str, messages: list[dict], items_in: int = 0, items_kept: int = 0,
+                  budget: int | None = None) -> PromptStats:
+    stats = PromptStats(
+        name=name,
+        tokens=estimate_message_tokens(messages),
+        chars=sum(len(str(m.get("content") or "")) for m in messages),
+        items_in=items_in,
+        items_kept=items_kept,
+        budget=budget,
+    )
+    logger.info(
+        "prompt %s: ~%s tokens, %s chars, items %s/%s, budget %s",
+        stats.name, stats.tokens, stats.chars, stats.items_kept, stats.items_in, stats.budget,
+    )
+    return stats
+
+
+class TokenDictionary:
+    """Ingredient token -> small int id; serialized as a list (id = position)."""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.words: list[str] = []
+
+    def missing(self, tokens) -> list[str]:
+        seen = set()
+        out = []
+        for t in tokens:
+            if t not in self.ids and t not in seen:
+                seen.add(t)
+                out.append(t)
+        return out
+
+    def encode(self, tokens) -> list[int]:
+        out = []
+        for t in tokens:
+            i = self.ids.get(t)
+            if i is None:
+                i = self.ids[t] = len(self.words)
+                self.words.append(t)
+            out.append(i)
+        return out
+
+
+SELECTION_FORMAT_NOTE = (
+    "Input encoding: `vocab` is a list of ingredient names, referenced by index. "
+    "`inv` is [[vocab index, days_left], ...] for the user's inventory. "
+    "`rows` are candidates with fields named in `cols`; `ings` holds vocab indexes."
+)
+
+
+@dataclass
+class CompiledPrompt:
+    messages: list[dict]
+    kept: list[dict]
+    stats: PromptStats
+
+
+def compile_selection_prompt(
+    name: str,
+    system: str,
+    inventory: dict,
+    candidates: list[dict],
+    limit: int,
+    budget_tokens: int,
+    columns: tuple = (
+        ("id", "recipe_id"),
+        ("title", "title"),
+        ("match", "match_count"),
+        ("days", "min_days_left"),
+        ("meal", "meal_time"),
+        ("diff", "difficulty"),
+    ),
+    tokens_key: str = "ingredient_tokens",
+    max_tokens_per_candidate: int = 30,
+    title_chars: int = 60,
+) -> CompiledPrompt:
+    """
+    inventory: {name_normalized: days_left}; candidates are kept in order
+    until the estimated prompt reaches `budget_tokens` (always at least `limit`).
+    """
+    vocab = TokenDictionary()
+    inv = [[vocab.encode([n])[0], d] for n, d in sorted(inventory.items(), key=lambda x: (x[1], x[0]))]
+
+    system_content = f"{system}\n{SELECTION_FORMAT_NOTE}"
+    cols = [c for c, _ in columns] + ["ings"]
+    header = {"limit": limit, "cols": cols, "inv": inv, "vocab": vocab.words, "rows": []}
+    used = estimate_tokens(system_content) + estimate_tokens(compact_json(header)) + 2 * _MESSAGE_OVERHEAD_TOKENS
+
+    rows = []
+    kept = []
+    min_keep = min(limit, len(candidates))
+    for c in candidates:
+        toks = list(c.get(tokens_key) or [])[:max_tokens_per_candidate]
+        new_words = vocab.missing(toks)
+        row = []
+        for _, key in columns:
+            v = c.get(key)
+            if key == "title" and isinstance(v, str):
+                v = v[:title_chars]
+            row.append(v)
+        # ids are still unknown for new words; len(words) is a close-enough stand-in
+        row_cost = estimate_tokens(compact_json(row + [[len(vocab.words)] * len(toks)]))
+        cost = row_cost + (estimate_tokens(compact_json(new_words)) if new_words else 0) + 1
+        if len(kept) >= min_keep and used + cost > budget_tokens:
+            break
+        row.append(vocab.encode(toks))
+        rows.append(row)
+        kept.append(c)
+        used += cost
+
+    payload = {"limit": limit, "cols": cols, "inv": inv, "vocab": vocab.words, "rows": rows}
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": compact_json(payload)},
+    ]
+    stats = report_prompt(name, messages, items_in=len(candidates), items_kept=len(kept), budget=budget_tokens)
+    return CompiledPrompt(messages=messages, kept=kept, stats=stats)
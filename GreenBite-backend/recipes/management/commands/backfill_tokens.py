@@ -1,14 +1,37 @@
 """
-Backfill normalized ingredient tokens for all recipes in the database.
-Run this after importing MealDB recipes or when updating normalization logic.
+Re-tokenize recipes and food logs whose stored normalizer_version is stale.
+
+Rows are read in id-ordered chunks (keyset pagination) and tokenized in a
+process pool with --workers > 1; only rows whose tokens actually changed are
+rewritten, the rest just get their version stamped. Tokens are interned into
+IngredientToken in the parent, one lookup per chunk, to fill
+MealDBRecipe.ingredient_token_ids and FoodLogSys.name_token. Run it after importing
+MealDB recipes or after bumping project.utils.normalize.NORMALIZER_VERSION.
+
+    python manage.py backfill_tokens --with-synonyms --workers 4
+    python manage.py backfill_tokens --all   # ignore stored versions
 """
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
 from django.core.management.base import BaseCommand
-from recipes.models import MealDBRecipe
-from project.utils.ingredient_tokens import extract_tokens_from_recipe, extract_tokens_with_synonyms
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from food.models import FoodLogSys
+from food.utils.caching import bump_list_version
+from project.utils.ingredient_tokens import normalize_rows, tokenize_rows
+from project.utils.normalize import NORMALIZER_VERSION
+from recipes.models import IngredientToken, MealDBRecipe
+from recipes.services.ingredient_index import bump_catalog_version
 
 
 class Command(BaseCommand):
-    help = "Backfill normalized ingredient tokens for all MealDB recipes"
+    help = "Re-tokenize MealDB recipes and food logs normalized with an older normalizer version"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -26,56 +49,171 @@ class Command(BaseCommand):
             "--batch-size",
             type=int,
             default=100,
-            help="Batch size for bulk updates",
+            help="Rows per chunk (one worker task and one bulk update each)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Tokenizer processes (1 = tokenize in this process)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-tokenize every row, not only stale ones",
+        )
+        parser.add_argument(
+            "--skip-foodlogs",
+            action="store_true",
+            help="Only process MealDB recipes",
         )
 
     def handle(self, *args, **options):
-        use_synonyms = options["with_synonyms"]
-        limit = options["limit"]
-        batch_size = options["batch_size"]
+        self.batch_size = max(1, options["batch_size"])
+        self.workers = max(1, options["workers"])
+        self.force = options["all"]
+
+        self._recipes(options["with_synonyms"], options["limit"])
+        if not options["skip_foodlogs"]:
+            self._foodlogs()
 
-        # Get recipes that need token processing
+    def _chunks(self, qs, fields, limit=0):
+        last_id, seen = 0, 0
+        while True:
+            size = self.batch_size if not limit else min(self.batch_size, limit - seen)
+            if size <= 0:
+                return
+            rows = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", *fields)[:size])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            seen += len(rows)
+            yield rows
+
+    def _run(self, fn, chunks):
+        """Yield (rows, fn(work items)) per chunk, in order; fn gets (id, input) pairs."""
+        if self.workers == 1:
+            for rows in chunks:
+                yield rows, fn([r[:2] for r in rows])
+            return
+
+        # spawned workers start without the parent's DB sockets; django.setup()
+        # only gives them settings, for the shared normalization cache
+        connections.close_all()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=django.setup) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append((rows, pool.submit(fn, [r[:2] for r in rows])))
+                if len(pending) >= self.workers * 2:
+                    rows, fut = pending.popleft()
+                    yield rows, fut.result()
+            while pending:
+                rows, fut = pending.popleft()
+                yield rows, fut.result()
+
+    def _recipes(self, use_synonyms: bool, limit: int):
         qs = MealDBRecipe.objects.all()
-        
-        if limit > 0:
-            qs = qs[:limit]
+        if not self.force:
+            qs = qs.filter(
+                ~Q(normalizer_version=NORMALIZER_VERSION)
+                | ~Q(tokens_with_synonyms=use_synonyms)
+                | (Q(ingredient_token_ids=[]) & ~Q(ingredient_tokens=[]))
+            )
 
         total = qs.count()
-        self.stdout.write(f"Processing {total} recipes...")
+        if limit > 0:
+            total = min(total, limit)
+        self.stdout.write(f"Processing {total} recipes (normalizer v{NORMALIZER_VERSION})...")
 
         processed = 0
         updated = 0
-        to_update = []
-
-        for recipe in qs.iterator(chunk_size=200):
-            # Extract tokens based on mode
-            if use_synonyms:
-                tokens = extract_tokens_with_synonyms(recipe.ingredients or [])
-            else:
-                tokens = extract_tokens_from_recipe(recipe.ingredients or [])
-
-            # ✅ FIXED: Use the correct field name from your model
-            if tokens != recipe.ingredient_tokens:
-                recipe.ingredient_tokens = tokens  # Changed from ingredients_norm
-                to_update.append(recipe)
-                updated += 1
-
-            processed += 1
-
-            # Bulk update in batches
-            if len(to_update) >= batch_size:
-                MealDBRecipe.objects.bulk_update(to_update, ["ingredient_tokens"], batch_size=batch_size)  # Changed field name
-                self.stdout.write(
-                    self.style.SUCCESS(f"[{processed}/{total}] Updated {updated} recipes")
-                )
-                to_update.clear()
-
-        # Final batch
-        if to_update:
-            MealDBRecipe.objects.bulk_update(to_update, ["ingredient_tokens"], batch_size=batch_size)  # Changed field name
+        chunks = self._chunks(qs, ("ingredients", "ingredient_tokens", "ingredient_token_ids"), limit)
+        for rows, results in self._run(partial(tokenize_rows, with_synonyms=use_synonyms), chunks):
+            # bulk_update skips auto_now; the ingredient index refreshes from updated_at
+            now = timezone.now()
+            ids = IngredientToken.objects.ids_for(t for _pk, tokens in results for t in tokens)
+            changed, unchanged = [], []
+            for (pk, _ingredients, old_tokens, old_ids), (_pk, tokens) in zip(rows, results):
+                token_ids = sorted(ids[t] for t in tokens if t)
+                if tokens != old_tokens or token_ids != old_ids:
+                    changed.append(MealDBRecipe(
+                        id=pk,
+                        ingredient_tokens=tokens,
+                        ingredient_token_ids=token_ids,
+                        normalizer_version=NORMALIZER_VERSION,
+                        tokens_with_synonyms=use_synonyms,
+                        updated_at=now,
+                    ))
+                else:
+                    unchanged.append(pk)
+
+            with transaction.atomic():
+                if changed:
+                    MealDBRecipe.objects.bulk_update(
+                        changed,
+                        ["ingredient_tokens", "ingredient_token_ids", "normalizer_version", "tokens_with_synonyms", "updated_at"],
+                    )
+                if unchanged:
+                    MealDBRecipe.objects.filter(id__in=unchanged).update(
+                        normalizer_version=NORMALIZER_VERSION,
+                        tokens_with_synonyms=use_synonyms,
+                    )
+
+            processed += len(rows)
+            updated += len(changed)
+            self.stdout.write(self.style.SUCCESS(f"[{processed}/{total}] Updated {updated} recipes"))
+
+        if updated:
+            bump_catalog_version()
 
         self.stdout.write(
             self.style.SUCCESS(
                 f"✅ Done. Processed {processed} recipes, updated {updated} with {'synonym-expanded' if use_synonyms else 'basic'} tokens."
             )
-        )
\ No newline at end of file
+        )
+
+    def _foodlogs(self):
+        qs = FoodLogSys.objects.all()
+        if not self.force:
+            qs = qs.filter(
+                ~Q(normalizer_version=NORMALIZER_VERSION)
+                | (Q(name_token__isnull=True) & ~Q(name_normalized=""))
+            )
+
+        total = qs.count()
+        self.stdout.write(f"Processing {total} food logs...")
+
+        processed = 0
+        updated = 0
+        users = set()
+        chunks = self._chunks(qs, ("name", "name_normalized", "name_token_id", "user_id"))
+        for rows, results in self._run(normalize_rows, chunks):
+            ids = IngredientToken.objects.ids_for(norm for _pk, norm in results)
+            changed, unchanged = [], []
+            for (pk, _name, old_norm, old_token_id, user_id), (_pk, norm) in zip(rows, results):
+                token_id = ids.get(norm)
+                if norm != old_norm or token_id != old_token_id:
+                    changed.append(FoodLogSys(
+                        id=pk,
+                        name_normalized=norm,
+                        name_token_id=token_id,
+                        normalizer_version=NORMALIZER_VERSION,
+                    ))
+                    users.add(user_id)
+                else:
+                    unchanged.append(pk)
+
+            with transaction.atomic():
+                if changed:
+                    FoodLogSys.objects.bulk_update(changed, ["name_normalized", "name_token", "normalizer_version"])
+                if unchanged:
+                    FoodLogSys.objects.filter(id__in=unchanged).update(normalizer_version=NORMALIZER_VERSION)
+
+            processed += len(rows)
+            updated += len(changed)
+
+        for user_id in users:
+            bump_list_version("foodlog", user_id)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Processed {processed} food logs, updated {updated}."))
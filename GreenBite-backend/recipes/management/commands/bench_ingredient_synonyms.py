@@ -0,0 +1,71 @@
+"""
+Benchmark synonym expansion: precompiled reverse index vs the old per-call scan.
+
+    python manage.py bench_ingredient_synonyms
+    python manage.py bench_ingredient_synonyms --pantry 80 --repeat 2000
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from project.utils.ingredient_synonyms import INGREDIENT_SYNONYMS, expand_ingredient_tokens
+from project.utils.normalize import normalize_ingredient_name
+
+# what a real pantry looks like: synonyms, bases, plurals, sizes and unknowns
+_EXTRA_NAMES = [
+    "Chicken Breast", "2 eggs", "Greek Yogurt 500g", "Olive Oil 1L", "frozen peas",
+    "Basmati Rice", "Cherry Tomatoes", "Red Onion", "Feta", "zucchini", "Tahini",
+    "Baby Spinach", "Whole Milk", "Ground Beef", "Kidney Beans", "sourdough",
+]
+
+
+def _legacy_expand(ingredient: str) -> set:
+    # the loop expand_ingredient_tokens ran before the reverse index
+    normalized = normalize_ingredient_name(ingredient)
+    tokens = {normalized}
+    for base, synonyms in INGREDIENT_SYNONYMS.items():
+        normalized_base = normalize_ingredient_name(base)
+        normalized_synonyms = [normalize_ingredient_name(s) for s in synonyms]
+        if normalized == normalized_base or normalized in normalized_synonyms:
+            tokens.add(normalized_base)
+            tokens.update(normalized_synonyms)
+            break
+    return tokens
+
+
+def _time(fn, pantry, repeat) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for name in pantry:
+            fn(name)
+    return (time.perf_counter() - t0) / repeat
+
+
+class Command(BaseCommand):
+    help = "Compare precompiled synonym lookups with the old per-call dictionary scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pantry", type=int, default=40, help="Food logs per inventory")
+        parser.add_argument("--repeat", type=int, default=500, help="Inventories expanded per timing")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        names = list(_EXTRA_NAMES)
+        for base, synonyms in INGREDIENT_SYNONYMS.items():
+            names.append(base.title())
+            names.extend(synonyms)
+        pantry = [rnd.choice(names) for _ in range(options["pantry"])]
+
+        same = all(_legacy_expand(n) == expand_ingredient_tokens(n) for n in names)
+
+        # warm the normalizer's lru_cache for both so only the lookup is measured
+        _time(_legacy_expand, pantry, 1)
+        legacy_s = _time(_legacy_expand, pantry, options["repeat"])
+        fast_s = _time(expand_ingredient_tokens, pantry, options["repeat"])
+
+        self.stdout.write(f"pantry={len(pantry)} synonym bases={len(INGREDIENT_SYNONYMS)}")
+        self.stdout.write(f"legacy scan:   {legacy_s * 1e6:.1f} us/inventory")
+        self.stdout.write(f"reverse index: {fast_s * 1e6:.1f} us/inventory")
+        self.stdout.write(self.style.SUCCESS(f"speedup x{legacy_s / fast_s:.1f}, identical output: {same}"))
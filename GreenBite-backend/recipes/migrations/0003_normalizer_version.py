@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealdbrecipe',
+            name='normalizer_version',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='mealdbrecipe',
+            name='tokens_with_synonyms',
+            field=models.BooleanField(default=False),
+        ),
+    ]
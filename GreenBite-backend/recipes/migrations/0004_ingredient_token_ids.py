@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models, transaction
+
+TOKEN_IDS_INDEX = "mealdb_ing_token_ids_gin"
+
+
+def use_intarray_opclass(apps, schema_editor):
+    # intarray is optional: with it the GIN index uses the compact gin__int_ops
+    # opclass, otherwise it stays on the built-in array_ops
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'intarray'")
+        if cur.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=conn.alias):
+                cur.execute("CREATE EXTENSION IF NOT EXISTS intarray")
+        except Exception:
+            return
+        table = schema_editor.quote_name(apps.get_model("recipes", "MealDBRecipe")._meta.db_table)
+        cur.execute(f"DROP INDEX IF EXISTS {TOKEN_IDS_INDEX}")
+        cur.execute(f"CREATE INDEX {TOKEN_IDS_INDEX} ON {table} USING gin (ingredient_token_ids gin__int_ops)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_normalizer_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientToken',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=120, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mealdbrecipe',
+            name='ingredient_token_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='mealdbrecipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_token_ids'], name='mealdb_ing_token_ids_gin'),
+        ),
+        migrations.RunPython(use_intarray_opclass, migrations.RunPython.noop),
+    ]
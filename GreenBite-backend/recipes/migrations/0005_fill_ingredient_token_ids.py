@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def fill_ingredient_token_ids(apps, schema_editor):
+    # MealDB retrieval ranks on ingredient_token_ids only; intern the tokens
+    # recipes already carry so existing catalogs keep matching without a
+    # manual backfill_tokens run
+    MealDBRecipe = apps.get_model("recipes", "MealDBRecipe")
+    IngredientToken = apps.get_model("recipes", "IngredientToken")
+
+    qs = MealDBRecipe.objects.filter(ingredient_token_ids=[]).exclude(ingredient_tokens=[])
+    last_id = 0
+    while True:
+        rows = list(
+            qs.filter(id__gt=last_id).order_by("id").values_list("id", "ingredient_tokens")[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        names = {t for _pk, tokens in rows for t in tokens or () if t}
+        IngredientToken.objects.bulk_create([IngredientToken(name=n) for n in names], ignore_conflicts=True)
+        ids = dict(IngredientToken.objects.filter(name__in=names).values_list("name", "id"))
+
+        # bulk_update skips auto_now; the ingredient index refreshes from updated_at
+        now = timezone.now()
+        MealDBRecipe.objects.bulk_update(
+            [
+                MealDBRecipe(id=pk, ingredient_token_ids=sorted({ids[t] for t in tokens or () if t}), updated_at=now)
+                for pk, tokens in rows
+            ],
+            ["ingredient_token_ids", "updated_at"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_token_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_ingredient_token_ids, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models.functions import Cast
 from django.conf import settings
-from project.utils.normalize import normalize_ingredient_name
+from project.utils.normalize import NORMALIZER_VERSION, normalize_many
 
 
 class MealTimeChoices(models.TextChoices):
@@ -22,6 +24,46 @@ class DifficultyChoices(models.TextChoices):
     HARD = "hard", "Hard"
 
 
+class IngredientTokenManager(models.Manager):
+    # name -> id of committed rows; ids are never reused, so entries never go stale
+    _committed_ids: dict[str, int] = {}
+
+    def ids_for(self, names, create: bool = True) -> dict[str, int]:
+        """Intern normalized names: {name: id}. Unknown names are inserted unless create=False."""
+        wanted = {n for n in names if n}
+        found = {n: self._committed_ids[n] for n in wanted if n in self._committed_ids}
+        missing = wanted - found.keys()
+        if not missing:
+            return found
+
+        if create:
+            self.bulk_create([self.model(name=n) for n in missing], ignore_conflicts=True)
+        fetched = dict(self.filter(name__in=missing).values_list("name", "id"))
+        found.update(fetched)
+        # only remember ids once they can't be rolled back
+        transaction.on_commit(lambda: self._committed_ids.update(fetched), using=self.db)
+        return found
+
+
+class IngredientToken(models.Model):
+    """Integer id for a normalized ingredient name (recipe tokens and food log names)."""
+
+    # int4 to match the int[] ingredient_token_ids column
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=120, unique=True)
+
+    objects = IngredientTokenManager()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class MealDBRecipeManager(models.Manager):
+    def get_queryset(self):
+        # search_vector is only read by the search query itself
+        return super().get_queryset().defer("search_vector")
+
+
 class MealDBRecipe(models.Model):
     """
     TheMealDB-backed recipe model (your single source of truth).
@@ -50,6 +92,11 @@ class MealDBRecipe(models.Model):
         blank=True,
         null=True
     )
+    # IngredientToken ids of ingredient_tokens; overlap/match counts run on these
+    ingredient_token_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    # NORMALIZER_VERSION the tokens were built with; backfill_tokens only redoes stale rows
+    normalizer_version = models.PositiveSmallIntegerField(default=0, db_index=True)
+    tokens_with_synonyms = models.BooleanField(default=False)
 
     meal_time = models.CharField(
         max_length=20, choices=MealTimeChoices.choices, null=True, blank=True, db_index=True
@@ -62,10 +109,26 @@ class MealDBRecipe(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     embedding = models.JSONField(null=True, blank=True)
 
+    # Stored tsvector for /recipes/search; Postgres keeps it current on every write
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="english")
+            + SearchVector("category", "cuisine", weight="B", config="english")
+            + SearchVector(Cast("ingredient_tokens", models.TextField()), weight="B", config="english")
+            + SearchVector("instructions", weight="D", config="english")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = MealDBRecipeManager()
+
     class Meta:
         ordering = ["title"]
         indexes = [
+            GinIndex(fields=["search_vector"], name="mealdb_search_gin"),
             GinIndex(fields=["ingredient_tokens"], name="mealdb_ing_tokens_gin"),  # ✅ Updated index name
+            GinIndex(fields=["ingredient_token_ids"], name="mealdb_ing_token_ids_gin"),
             GinIndex(fields=["tags"], name="mealdb_tags_gin"),
             models.Index(fields=["cuisine"]),
             models.Index(fields=["category"]),
@@ -76,16 +139,18 @@ class MealDBRecipe(models.Model):
 
     def rebuild_ingredients_norm(self) -> None:
         """Rebuild normalized ingredient tokens from raw ingredients."""
-        norms = []
+        raws = []
         for it in (self.ingredients or []):
             raw = (it.get("name") or it.get("ingredient") or "").strip()
-            if not raw:
-                continue
-            n = normalize_ingredient_name(raw)
-            if n:
-                norms.append(n)
-
-        self.ingredient_tokens = sorted(set(norms))  # ✅ Updated field name
+            if raw:
+                raws.append(raw)
+
+        norms = set(normalize_many(raws))
+        norms.discard("")
+        self.ingredient_tokens = sorted(norms)  # ✅ Updated field name
+        self.ingredient_token_ids = sorted(IngredientToken.objects.ids_for(norms).values())
+        self.normalizer_version = NORMALIZER_VERSION
+        self.tokens_with_synonyms = False
 
     def save(self, *args, **kwargs):
         self.rebuild_ingredients_norm()
@@ -0,0 +1,240 @@
+"""
+Per-worker inverted index over MealDBRecipe.ingredient_tokens.
+
+Every token maps to a sorted int32 array of recipe ids (a posting list), so
+candidate retrieval for an inventory is a union/count over a handful of arrays
+instead of a `?|` scan over the whole recipes table (see
+recipes.services.ranking, which ranks straight off postings()).
+
+Each gunicorn/celery worker keeps its own copy. Writers bump a shared catalog
+version in the cache; readers compare it on every lookup and pull only the rows
+whose `updated_at` moved since their last refresh. Deletes bump the epoch,
+which forces a full rebuild.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+
+from recipes.models import MealDBRecipe
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = "recipes:catalog:v"
+CATALOG_EPOCH_KEY = "recipes:catalog:epoch"
+# bumped only when recipes are added or removed (id set changes)
+CATALOG_MEMBERS_KEY = "recipes:catalog:members"
+
+# rows committed late by a long transaction can carry an updated_at slightly
+# older than the newest row we already saw
+_WATERMARK_SLACK = timedelta(minutes=5)
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def _read_counter(key: str) -> int:
+    v = cache.get(key)
+    if v is None:
+        v = 1
+        cache.set(key, v, timeout=None)
+    return int(v)
+
+
+def _bump_counter(key: str) -> None:
+    try:
+        cache.incr(key)
+    except Exception:
+        current = cache.get(key) or 1
+        cache.set(key, int(current) + 1, timeout=None)
+
+
+def get_catalog_version() -> int:
+    return _read_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> None:
+    _bump_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_epoch() -> None:
+    _bump_counter(CATALOG_EPOCH_KEY)
+    _bump_counter(CATALOG_VERSION_KEY)
+
+
+def get_catalog_members_version() -> int:
+    return _read_counter(CATALOG_MEMBERS_KEY)
+
+
+def bump_catalog_members() -> None:
+    _bump_counter(CATALOG_MEMBERS_KEY)
+
+
+def _clean_tokens(tokens) -> tuple:
+    return tuple(sorted({t for t in (tokens or []) if isinstance(t, str) and t}))
+
+
+class IngredientIndex:
+    """token -> sorted recipe ids, plus recipe id -> tokens for the reverse lookup."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, np.ndarray] = {}
+        self._tokens_by_recipe: dict[int, tuple] = {}
+        # recipe id -> number of tokens (ids are dense serials)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._version = None
+        self._epoch = None
+        self._watermark = None
+
+    # ---- maintenance ----
+    def reset(self) -> None:
+        with self._lock:
+            self._postings = {}
+            self._tokens_by_recipe = {}
+            self._lengths = np.zeros(0, dtype=np.int32)
+            self._version = None
+            self._epoch = None
+            self._watermark = None
+
+    @property
+    def is_built(self) -> bool:
+        return self._version is not None
+
+    def _full_build(self, version: int, epoch: int) -> None:
+        rows = MealDBRecipe.objects.values_list("id", "ingredient_tokens", "updated_at")
+        self._load(rows.iterator(chunk_size=2000))
+        self._version = version
+        self._epoch = epoch
+        logger.info(
+            "IngredientIndex: built %s recipes / %s tokens (catalog v%s)",
+            len(self._tokens_by_recipe), len(self._postings), version,
+        )
+
+    def _load(self, rows) -> None:
+        """Replace the postings with (id, tokens, updated_at) rows."""
+        buckets: dict[str, list] = {}
+        tokens_by_recipe = {}
+        watermark = None
+        for rid, tokens, updated_at in rows:
+            toks = _clean_tokens(tokens)
+            tokens_by_recipe[rid] = toks
+            for t in toks:
+                buckets.setdefault(t, []).append(rid)
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+
+        self._postings = {
+            t: np.unique(np.asarray(ids, dtype=np.int32)) for t, ids in buckets.items()
+        }
+        self._tokens_by_recipe = tokens_by_recipe
+        lengths = np.zeros(max(tokens_by_recipe, default=0) + 1, dtype=np.int32)
+        if tokens_by_recipe:
+            lengths[np.fromiter(tokens_by_recipe, dtype=np.int64)] = [len(t) for t in tokens_by_recipe.values()]
+        self._lengths = lengths
+        self._watermark = watermark
+
+    def _incremental(self, version: int) -> None:
+        qs = MealDBRecipe.objects.values_list("id", "ingredient_tokens", "updated_at")
+        if self._watermark is not None:
+            qs = qs.filter(updated_at__gte=self._watermark - _WATERMARK_SLACK)
+
+        changed = 0
+        for rid, tokens, updated_at in qs.iterator(chunk_size=2000):
+            if self._apply(rid, tokens):
+                changed += 1
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        self._version = version
+        logger.debug("IngredientIndex: refreshed %s recipes (catalog v%s)", changed, version)
+
+    def ensure_fresh(self) -> "IngredientIndex":
+        version = get_catalog_version()
+        epoch = _read_counter(CATALOG_EPOCH_KEY)
+        if self._version == version and self._epoch == epoch:
+            return self
+
+        with self._lock:
+            if self._version is None or self._epoch != epoch:
+                self._full_build(version, epoch)
+            elif self._version != version:
+                self._incremental(version)
+        return self
+
+    def _apply(self, recipe_id: int, tokens) -> bool:
+        new = _clean_tokens(tokens)
+        old = self._tokens_by_recipe.get(recipe_id, ())
+        if new == old and recipe_id in self._tokens_by_recipe:
+            return False
+
+        rid = np.int32(recipe_id)
+        for t in set(old) - set(new):
+            arr = self._postings.get(t)
+            if arr is None:
+                continue
+            arr = arr[arr != rid]
+            if arr.size:
+                self._postings[t] = arr
+            else:
+                del self._postings[t]
+
+        for t in set(new) - set(old):
+            arr = self._postings.get(t, _EMPTY)
+            pos = int(np.searchsorted(arr, rid))
+            if pos < arr.size and arr[pos] == rid:
+                continue
+            self._postings[t] = np.insert(arr, pos, rid)
+
+        self._tokens_by_recipe[recipe_id] = new
+        if recipe_id >= self._lengths.size:
+            grown = np.zeros(max(recipe_id + 1, 2 * self._lengths.size), dtype=np.int32)
+            grown[:self._lengths.size] = self._lengths
+            self._lengths = grown
+        self._lengths[recipe_id] = len(new)
+        return True
+
+    def update_recipe(self, recipe_id: int, tokens) -> None:
+        """Apply a local write right away (the version bump tells other workers)."""
+        if not self.is_built:
+            return
+        with self._lock:
+            self._apply(recipe_id, tokens)
+
+    def remove_recipe(self, recipe_id: int) -> None:
+        if not self.is_built:
+            return
+        with self._lock:
+            self._apply(recipe_id, ())
+            self._tokens_by_recipe.pop(recipe_id, None)
+
+    # ---- lookups ----
+    def tokens_for(self, recipe_id: int) -> tuple:
+        return self._tokens_by_recipe.get(recipe_id, ())
+
+    def items(self) -> list:
+        """(recipe_id, tokens) pairs for every indexed recipe."""
+        with self._lock:
+            return list(self._tokens_by_recipe.items())
+
+    def postings(self, tokens) -> dict[str, np.ndarray]:
+        """Posting lists of the indexed `tokens`, read together (unknown tokens are left out)."""
+        with self._lock:
+            return {t: self._postings[t] for t in set(tokens or []) if t in self._postings}
+
+    def token_counts(self, recipe_ids) -> np.ndarray:
+        """Number of distinct tokens of each recipe in `recipe_ids` (0 if not indexed)."""
+        ids = np.asarray(recipe_ids, dtype=np.int64)
+        lengths = self._lengths
+        out = np.zeros(ids.size, dtype=np.int64)
+        known = ids < lengths.size
+        out[known] = lengths[ids[known]]
+        return out
+
+
+ingredient_index = IngredientIndex()
+
+
+def get_ingredient_index() -> IngredientIndex:
+    return ingredient_index.ensure_fresh()
@@ -0,0 +1,122 @@
+"""
+Vectorized recipe ranking over the whole MealDB catalog.
+
+Ranking reads the per-worker IngredientIndex directly: the posting lists of
+the inventory's tokens are unioned into the candidate recipes, and each
+token's list is then folded into per-candidate arrays with one vectorized
+step, producing for every matching recipe at once:
+
+- match_count:   how many of its tokens are in the inventory
+- min_days_left: the soonest expiry among the matched tokens
+- urgency:       sum of expiry weights of the matched tokens
+
+There is no derived catalog matrix to rebuild: catalog writes reach the
+posting lists incrementally (IngredientIndex._apply), and a ranking costs
+the length of the inventory's posting lists, not the size of the catalog.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from recipes.services.ingredient_index import ingredient_index
+
+NO_EXPIRY = 999999
+# same shape as InventoryService.get_expiry_weighted_inventory: sooner = heavier
+URGENCY_HORIZON_DAYS = 30
+
+
+def expiry_weight(days_left) -> float:
+    if days_left is None:
+        return 1.0
+    return float(max(1, URGENCY_HORIZON_DAYS - int(days_left)))
+
+
+@dataclass(frozen=True)
+class RankedRecipes:
+    """Parallel arrays for the recipes that matched at least one token."""
+
+    recipe_ids: np.ndarray
+    match_counts: np.ndarray
+    token_counts: np.ndarray
+    min_days_left: np.ndarray
+    urgency: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.recipe_ids.size)
+
+    def order(self, limit: int | None = None) -> np.ndarray:
+        """Row order for the deterministic ranking: most matches, then soonest expiry."""
+        idx = np.lexsort((self.recipe_ids, self.min_days_left, -self.match_counts))
+        return idx[:limit] if limit is not None else idx
+
+    def top(self, limit: int | None = None) -> list[dict]:
+        return [
+            {
+                "recipe_id": int(self.recipe_ids[i]),
+                "match_count": int(self.match_counts[i]),
+                "token_count": int(self.token_counts[i]),
+                "min_days_left": int(self.min_days_left[i]),
+                "urgency": float(self.urgency[i]),
+            }
+            for i in self.order(limit)
+        ]
+
+
+_EMPTY_RESULT = RankedRecipes(
+    recipe_ids=np.empty(0, dtype=np.int64),
+    match_counts=np.empty(0, dtype=np.int64),
+    token_counts=np.empty(0, dtype=np.int64),
+    min_days_left=np.empty(0, dtype=np.int64),
+    urgency=np.empty(0, dtype=np.float64),
+)
+
+
+class RecipeRankingEngine:
+    def __init__(self, index=None):
+        self._index = index
+
+    @property
+    def index(self):
+        return (self._index or ingredient_index).ensure_fresh()
+
+    def rank(self, inventory_days: dict, min_matches: int = 1) -> RankedRecipes:
+        """
+        inventory_days: {token: days_left or None}
+        Recipes sharing at least `min_matches` tokens with the inventory.
+        """
+        index = self.index
+        postings = index.postings(inventory_days) if inventory_days else {}
+        if not postings:
+            return _EMPTY_RESULT
+
+        # posting lists are sorted and duplicate-free, so each token touches a
+        # candidate at most once and can be applied with plain fancy indexing
+        recipe_ids, match_counts = np.unique(np.concatenate(list(postings.values())), return_counts=True)
+        min_days = np.full(recipe_ids.size, NO_EXPIRY, dtype=np.int64)
+        urgency = np.zeros(recipe_ids.size, dtype=np.float64)
+        for token, ids in postings.items():
+            rows = np.searchsorted(recipe_ids, ids)
+            d = inventory_days[token]
+            if d is not None:
+                min_days[rows] = np.minimum(min_days[rows], int(d))
+            urgency[rows] += expiry_weight(d)
+
+        keep = match_counts >= max(1, min_matches)
+        recipe_ids = recipe_ids[keep].astype(np.int64)
+        match_counts = match_counts[keep].astype(np.int64)
+        # a recipe removed since the postings were read counts only its matches
+        token_counts = np.maximum(index.token_counts(recipe_ids), match_counts)
+        return RankedRecipes(
+            recipe_ids=recipe_ids,
+            match_counts=match_counts,
+            token_counts=token_counts,
+            min_days_left=min_days[keep],
+            urgency=urgency[keep],
+        )
+
+
+ranking_engine = RecipeRankingEngine()
+
+
+def get_ranking_engine() -> RecipeRankingEngine:
+    return ranking_engine
@@ -0,0 +1,104 @@
+"""
+Recipe-card cache keyed on mealdb_id.
+
+A card is the full MealDBRecipe payload served by /mealdb/<mealdb_id>/.
+get_many() hydrates N cards with one cache round trip plus, for the misses,
+one `mealdb_id__in` query; signals drop a card whenever its recipe changes.
+"""
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.utils.http import http_date, quote_etag
+
+from recipes.models import MealDBRecipe
+
+CARD_PREFIX = "recipes:card"
+CARD_TTL_SECONDS = 24 * 60 * 60
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+
+CARD_FIELDS = (
+    "id",
+    "mealdb_id",
+    "title",
+    "category",
+    "cuisine",
+    "instructions",
+    "thumbnail",
+    "tags",
+    "ingredients",
+    "meal_time",
+    "difficulty",
+    "created_at",
+    "updated_at",
+)
+
+
+def card_key(mealdb_id: str) -> str:
+    mealdb_id = str(mealdb_id)
+    if not _SAFE_ID.match(mealdb_id):
+        # keep odd ids (spaces, unicode, very long) valid as cache keys
+        mealdb_id = "h" + hashlib.sha256(mealdb_id.encode("utf-8")).hexdigest()
+    return f"{CARD_PREFIX}:{mealdb_id}"
+
+
+def recipe_card(meal: MealDBRecipe) -> dict:
+    return {
+        "recipe_id": meal.id,
+        "mealdb_id": meal.mealdb_id,
+        "title": meal.title,
+        "category": meal.category,
+        "cuisine": meal.cuisine,
+        "instructions": meal.instructions,
+        "thumbnail": meal.thumbnail,
+        "tags": meal.tags,
+        "ingredients": meal.ingredients,
+        "mealTime": meal.meal_time,
+        "difficulty": meal.difficulty,
+        "created_at": meal.created_at,
+        "updated_at": meal.updated_at,
+    }
+
+
+def set_many(recipes) -> dict:
+    """Cache cards for `recipes`; returns {mealdb_id: card}."""
+    cards = {r.mealdb_id: recipe_card(r) for r in recipes}
+    if cards:
+        cache.set_many({card_key(mid): c for mid, c in cards.items()}, timeout=CARD_TTL_SECONDS)
+    return cards
+
+
+def get_many(mealdb_ids) -> dict:
+    """{mealdb_id: card} for the ids that exist; unknown ids are simply absent."""
+    ids = list(dict.fromkeys(str(m) for m in mealdb_ids if m))
+    if not ids:
+        return {}
+
+    keys = {card_key(mid): mid for mid in ids}
+    found = cache.get_many(list(keys))
+    cards = {keys[k]: v for k, v in found.items()}
+
+    missing = [mid for mid in ids if mid not in cards]
+    if missing:
+        cards.update(set_many(MealDBRecipe.objects.filter(mealdb_id__in=missing).only(*CARD_FIELDS)))
+    return cards
+
+
+def get(mealdb_id: str) -> dict | None:
+    return get_many([mealdb_id]).get(str(mealdb_id))
+
+
+def invalidate(mealdb_id: str) -> None:
+    cache.delete(card_key(mealdb_id))
+
+
+def card_etag(card: dict) -> str:
+    updated = card.get("updated_at")
+    stamp = int(updated.timestamp() * 1_000_000) if updated else 0
+    return quote_etag(f"{card['recipe_id']}-{stamp}")
+
+
+def card_last_modified(card: dict) -> str | None:
+    updated = card.get("updated_at")
+    return http_date(updated.timestamp()) if updated else None
@@ -0,0 +1,312 @@
+"""
+Deterministic candidate layer for /recipes/recommend.
+
+Candidates depend only on the catalog and on the inventory's normalized names
+plus a coarse days-left bucket, so they are cached under a fingerprint of the
+sorted (name_normalized, bucket) pairs and shared by every user whose pantry
+looks the same. Per-user work (exact expiry ordering, LLM selection, response
+shaping) happens on top of these cached candidates in the view.
+
+LLM selection can run inline ("sync") or in a Celery task ("async"): the view
+answers with the deterministic top-N and the task swaps the LLM-refined list
+into the same cache key, so the next request gets it.
+"""
+import hashlib
+import json
+import logging
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+from meal_plans.services.inventory import InventorySnapshot
+from project.utils.prompt_compiler import compile_selection_prompt
+from recipes.models import MealDBRecipe
+from recipes.services import recipe_cache
+from recipes.services.ingredient_index import get_catalog_version, get_ingredient_index
+from recipes.services.ranking import NO_EXPIRY, get_ranking_engine
+
+logger = logging.getLogger(__name__)
+
+# OpenAI is optional
+try:
+    from openai import OpenAI
+except Exception:
+    OpenAI = None
+
+llm_client = None
+if OpenAI and getattr(settings, "OPENAI_API_KEY", None):
+    llm_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+LLM_MODE_ASYNC = "async"
+LLM_MODE_SYNC = "sync"
+LLM_MODE_OFF = "off"
+
+RANKED_DETERMINISTIC = "deterministic"
+RANKED_LLM = "llm"
+
+RESPONSE_TTL_SECONDS = 60 * 60
+# one refine task per response key at a time; also the retry delay after a failed refine
+REFINE_LOCK_SECONDS = 5 * 60
+
+CANDIDATE_NAMESPACE = "recipes:candidates"
+CANDIDATE_TTL_SECONDS = 60 * 60
+CANDIDATE_LIMIT = 150
+
+# (upper bound in days, bucket label); the lower bound is what gets ranked on
+_DAY_BUCKETS = (
+    (0, 0),
+    (1, 1),
+    (2, 2),
+    (3, 3),
+    (7, 4),
+    (14, 8),
+    (30, 15),
+)
+_FAR_BUCKET = 31
+
+
+def days_bucket(days_left: int | None) -> int:
+    """Collapse days-to-expiry into a small set of lower bounds (0,1,2,3,4,8,15,31)."""
+    if days_left is None:
+        return NO_EXPIRY
+    for upper, label in _DAY_BUCKETS:
+        if days_left <= upper:
+            return label
+    return _FAR_BUCKET
+
+
+def load_inventory_days(user, today: date | None = None) -> dict[str, int]:
+    """name_normalized -> soonest days left, from the user's shared inventory snapshot."""
+    snap = InventorySnapshot.for_user(user, today)
+    inv_days: dict[str, int] = {}
+    # the snapshot is ordered by expiry, so the first row per name is the soonest
+    for norm, days in zip(snap.norms, snap.days_left.tolist()):
+        if norm:
+            inv_days.setdefault(norm, days)
+    return inv_days
+
+
+def _digest(pairs) -> str:
+    joined = "|".join(f"{n}:{d}" for n, d in sorted(pairs))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+def inventory_fingerprint(inv_days: dict) -> str:
+    """Stable across users: sorted (name_normalized, days bucket) pairs."""
+    return _digest((n, days_bucket(d)) for n, d in inv_days.items())
+
+
+def inventory_digest(inv_days: dict) -> str:
+    """Exact (name_normalized, days_left) pairs; keys the per-user layer."""
+    return _digest(inv_days.items())
+
+
+def candidate_cache_key(fingerprint: str, limit: int = CANDIDATE_LIMIT) -> str:
+    return f"{CANDIDATE_NAMESPACE}:c{get_catalog_version()}:n{limit}:{fingerprint}"
+
+
+def _build_candidates(inv_days: dict, limit: int) -> list[dict]:
+    bucketed = {n: days_bucket(d) for n, d in inv_days.items()}
+    ranked = get_ranking_engine().rank(bucketed).top(limit)
+    if not ranked:
+        return []
+
+    index = get_ingredient_index()
+    cards = MealDBRecipe.objects.filter(id__in=[c["recipe_id"] for c in ranked]).only(
+        "id",
+        "mealdb_id",
+        "title",
+        "thumbnail",
+        "category",
+        "cuisine",
+        "meal_time",
+        "difficulty",
+    )
+    card_map = {r.id: r for r in cards}
+
+    out = []
+    for c in ranked:
+        r = card_map.get(c["recipe_id"])
+        if r is None:
+            continue
+        out.append(
+            {
+                "recipe_id": r.id,
+                "mealdb_id": r.mealdb_id,
+                "title": r.title,
+                "thumbnail": r.thumbnail,
+                "category": r.category,
+                "cuisine": r.cuisine,
+                "meal_time": r.meal_time,
+                "difficulty": r.difficulty,
+                "ingredient_tokens": list(index.tokens_for(r.id))[:30],
+                "match_count": c["match_count"],
+            }
+        )
+    return out
+
+
+def get_candidates(inv_days: dict, limit: int = CANDIDATE_LIMIT) -> list[dict]:
+    """
+    Shared, fingerprint-keyed candidate list (most matches first, then the
+    soonest expiry bucket). Callers must not mutate the returned dicts.
+    """
+    if not inv_days:
+        return []
+
+    key = candidate_cache_key(inventory_fingerprint(inv_days), limit)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    candidates = _build_candidates(inv_days, limit)
+    cache.set(key, candidates, timeout=CANDIDATE_TTL_SECONDS)
+    return candidates
+
+
+def personalize(candidates: list[dict], inv_days: dict) -> list[dict]:
+    """
+    Attach the user's exact min_days_left to shared candidates and re-sort
+    within the shared cut (match count, then exact soonest expiry).
+    """
+    index = get_ingredient_index()
+    out = []
+    for c in candidates:
+        tokens = index.tokens_for(c["recipe_id"]) or c["ingredient_tokens"]
+        days = [inv_days[t] for t in tokens if t in inv_days]
+        out.append({**c, "min_days_left": min(days, default=NO_EXPIRY)})
+    out.sort(key=lambda c: (-c["match_count"], c["min_days_left"], c["recipe_id"]))
+    return out
+
+
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000
+
+SELECTOR_SYSTEM_PROMPT = (
+    "You are a recipe recommendation assistant.\n"
+    "RULES:\n"
+    "- You MUST select recipe_id values ONLY from the `id` column of the provided candidates.\n"
+    "- Do NOT invent recipes, ingredients, steps, or ids.\n"
+    "- Output JSON only in this format:\n"
+    "{\"selected\":[{\"recipe_id\":123,\"why\":\"...\"}]}\n"
+    "- If none fit, output: {\"selected\":[]}"
+)
+
+
+def llm_mode() -> str:
+    mode = getattr(settings, "RECOMMEND_LLM_MODE", LLM_MODE_ASYNC)
+    return mode if mode in (LLM_MODE_ASYNC, LLM_MODE_SYNC, LLM_MODE_OFF) else LLM_MODE_ASYNC
+
+
+def select_with_llm(client, candidates: list[dict], inv_days: dict, limit: int) -> tuple[list[int], dict]:
+    """
+    Ask the LLM to pick recipe_ids ONLY from `candidates`.
+    Returns (selected_ids, why_map); ([], {}) if the call fails or picks nothing valid.
+    """
+    if not client or not candidates:
+        return [], {}
+
+    compiled = compile_selection_prompt(
+        "recipes.recommend.select",
+        SELECTOR_SYSTEM_PROMPT,
+        inv_days,
+        candidates,
+        limit,
+        budget_tokens=getattr(settings, "RECOMMEND_PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET),
+    )
+    messages = compiled.messages
+    candidates = compiled.kept
+
+    selected_ids = []
+    why_map = {}
+    try:
+        resp = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(resp.choices[0].message.content)
+        picked = data.get("selected", []) or []
+
+        allowed = {c["recipe_id"] for c in candidates}
+        for item in picked:
+            rid = item.get("recipe_id")
+            if isinstance(rid, int) and rid in allowed and rid not in why_map:
+                selected_ids.append(rid)
+                why_map[rid] = (item.get("why") or "").strip()[:220]
+    except Exception:
+        logger.exception("LLM recipe selection failed")
+        return [], {}
+
+    selected_ids = selected_ids[:limit]
+    return selected_ids, {rid: why_map[rid] for rid in selected_ids}
+
+
+def build_response(
+    candidates: list[dict], selected_ids: list[int], why_map: dict, inv_days: dict, ranked_by: str
+) -> list[dict]:
+    """Full recipes from the card cache / DB (never from the LLM), in `selected_ids` order."""
+    mealdb_by_id = {c["recipe_id"]: c["mealdb_id"] for c in candidates}
+    cards = recipe_cache.get_many(mealdb_by_id[rid] for rid in selected_ids if rid in mealdb_by_id)
+    index = get_ingredient_index()
+
+    out = []
+    for rid in selected_ids:
+        card = cards.get(mealdb_by_id.get(rid))
+        if card is None:
+            continue
+        matched = [n for n in index.tokens_for(rid) if n in inv_days]
+        expiring_soon = sorted(
+            [{"name_norm": n, "days_left": inv_days[n]} for n in matched],
+            key=lambda d: d["days_left"],
+        )[:5]
+
+        out.append(
+            {
+                "recipe_id": card["recipe_id"],
+                "mealdb_id": card["mealdb_id"],
+                "title": card["title"],
+                "thumbnail": card["thumbnail"],
+                "category": card["category"],
+                "cuisine": card["cuisine"],
+                "instructions": card["instructions"],
+                "tags": card["tags"],
+                "ingredients": card["ingredients"],  # list of {"name","measure"}
+                "mealTime": card["mealTime"],
+                "difficulty": card["difficulty"],
+                "why": why_map.get(rid, ""),
+                "ranked_by": ranked_by,
+                "match": {
+                    "matched_ingredients_norm": matched,
+                    "expiring_soon": expiring_soon,
+                },
+            }
+        )
+    return out
+
+
+def deterministic_response(candidates: list[dict], inv_days: dict, limit: int) -> list[dict]:
+    return build_response(
+        candidates, [c["recipe_id"] for c in candidates[:limit]], {}, inv_days, RANKED_DETERMINISTIC
+    )
+
+
+def refine_lock_key(cache_key: str) -> str:
+    return f"{cache_key}:refine"
+
+
+def refine_cached_response(cache_key: str, inv_days: dict, limit: int, client=None) -> bool:
+    """
+    Run the LLM selector for an already-answered request and overwrite the
+    cached deterministic response. Returns True if the cache was upgraded.
+    """
+    candidates = personalize(get_candidates(inv_days), inv_days)
+    selected_ids, why_map = select_with_llm(client or llm_client, candidates, inv_days, limit)
+    if not selected_ids:
+        # keep the deterministic answer; the lock expiring allows a later retry
+        return False
+
+    out = build_response(candidates, selected_ids, why_map, inv_days, RANKED_LLM)
+    cache.set(cache_key, out, timeout=RESPONSE_TTL_SECONDS)
+    return True
@@ -0,0 +1,147 @@
+"""
+Random MealDBRecipe sampling without touching the whole table per request.
+
+Default ("ids"): every worker keeps the catalog's ids as an int32 array, shared
+through the cache as a packed blob keyed by the catalog membership version, so
+only one worker hits the DB after recipes are imported or deleted. Picking N
+ids is then random.sample over index positions: O(N), independent of the
+catalog size.
+
+"tablesample": Postgres `TABLESAMPLE SYSTEM` sized from pg_class.reltuples,
+used when configured (RECIPE_RANDOM_SAMPLER) or when the id array can't be
+loaded.
+"""
+import logging
+import random
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from recipes.models import MealDBRecipe
+from recipes.services.ingredient_index import get_catalog_members_version
+
+logger = logging.getLogger(__name__)
+
+SAMPLER_IDS = "ids"
+SAMPLER_TABLESAMPLE = "tablesample"
+
+IDS_CACHE_PREFIX = "recipes:catalog:ids"
+IDS_CACHE_TTL_SECONDS = 24 * 60 * 60
+# TABLESAMPLE SYSTEM picks whole pages; oversample so LIMIT n usually fills
+_TABLESAMPLE_OVERSAMPLE = 4
+
+
+def _ids_cache_key(version: int) -> str:
+    return f"{IDS_CACHE_PREFIX}:m{version}"
+
+
+class RecipeSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int32)
+        self._version = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ids = np.empty(0, dtype=np.int32)
+            self._version = None
+
+    def invalidate(self) -> None:
+        """Drop the shared blob for the current version too, so the next call reloads from the DB."""
+        cache.delete(_ids_cache_key(get_catalog_members_version()))
+        self.reset()
+
+    def _load(self, version: int) -> np.ndarray:
+        key = _ids_cache_key(version)
+        blob = cache.get(key)
+        if blob is not None:
+            return np.frombuffer(blob, dtype=np.int32)
+
+        ids = np.fromiter(
+            MealDBRecipe.objects.order_by().values_list("id", flat=True).iterator(chunk_size=5000),
+            dtype=np.int32,
+        )
+        cache.set(key, ids.tobytes(), timeout=IDS_CACHE_TTL_SECONDS)
+        return ids
+
+    def ids(self) -> np.ndarray:
+        version = get_catalog_members_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._ids = self._load(version)
+                    self._version = version
+        return self._ids
+
+    def sample_ids(self, n: int) -> list[int]:
+        ids = self.ids()
+        if not ids.size:
+            return []
+        picks = random.sample(range(ids.size), min(n, ids.size))
+        return [int(ids[i]) for i in picks]
+
+
+def sample_ids_tablesample(n: int) -> list[int]:
+    if connection.vendor != "postgresql":
+        return list(MealDBRecipe.objects.order_by("?").values_list("id", flat=True)[:n])
+
+    table = connection.ops.quote_name(MealDBRecipe._meta.db_table)
+    with connection.cursor() as cur:
+        cur.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [MealDBRecipe._meta.db_table])
+        row = cur.fetchone()
+        estimate = float(row[0]) if row else -1.0
+
+        # never analyzed (-1) or tiny: just read it all
+        percent = 100.0 if estimate <= 0 else min(100.0, 100.0 * n * _TABLESAMPLE_OVERSAMPLE / estimate)
+        sql = f"SELECT id FROM {table} TABLESAMPLE SYSTEM (%s) ORDER BY random() LIMIT %s"
+        cur.execute(sql, [percent, n])
+        ids = [r[0] for r in cur.fetchall()]
+
+        if len(ids) < n and percent < 100.0:
+            cur.execute(sql, [100.0, n])
+            ids = [r[0] for r in cur.fetchall()]
+    return ids
+
+
+recipe_sampler = RecipeSampler()
+
+
+def sample_recipe_ids(n: int) -> list[int]:
+    """Up to `n` distinct random MealDBRecipe ids."""
+    if n <= 0:
+        return []
+    if getattr(settings, "RECIPE_RANDOM_SAMPLER", SAMPLER_IDS) == SAMPLER_TABLESAMPLE:
+        return sample_ids_tablesample(n)
+    try:
+        return recipe_sampler.sample_ids(n)
+    except Exception:
+        logger.exception("Recipe id sampler failed; falling back to TABLESAMPLE")
+        return sample_ids_tablesample(n)
+
+
+def sample_recipe_values(n: int, *fields) -> list[dict]:
+    """
+    `.values(*fields)` rows for up to `n` random recipes, in sampled order.
+    If none of the sampled ids exist anymore (id array older than the table,
+    e.g. after a DB restore without a cache flush), resample via TABLESAMPLE.
+    """
+    ids = sample_recipe_ids(n)
+    rows = {r["id"]: r for r in MealDBRecipe.objects.filter(id__in=ids).values("id", *fields)}
+    if ids and not rows:
+        logger.warning("Sampled recipe ids are stale; falling back to TABLESAMPLE")
+        recipe_sampler.invalidate()
+        ids = sample_ids_tablesample(n)
+        rows = {r["id"]: r for r in MealDBRecipe.objects.filter(id__in=ids).values("id", *fields)}
+
+    out = []
+    for i in ids:
+        row = rows.get(i)
+        if row is None:
+            continue
+        if "id" not in fields:
+            row = {k: v for k, v in row.items() if k != "id"}
+        out.append(row)
+    return out
@@ -0,0 +1,59 @@
+"""
+Catalog search over MealDBRecipe.
+
+Full-text matches come from the stored `search_vector` (GIN, ts_rank with
+title > category/cuisine/ingredients > instructions). When pg_trgm is
+installed, titles within trigram distance of the query are OR-ed in through
+the `mealdb_title_trgm` index, so "spagheti" still finds "Spaghetti".
+Filters are plain equality on the indexed meal_time / difficulty / cuisine /
+category columns.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+
+from recipes.models import MealDBRecipe
+
+SEARCH_CONFIG = "english"
+FILTER_FIELDS = ("meal_time", "difficulty", "cuisine", "category")
+MAX_QUERY_CHARS = 200
+
+_trigram_available = None
+
+
+def trigram_available() -> bool:
+    """pg_trgm is optional; checked once per process."""
+    global _trigram_available
+    if _trigram_available is None:
+        _trigram_available = False
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigram_available = cur.fetchone() is not None
+    return _trigram_available
+
+
+def search_recipes(q: str = "", filters: dict | None = None):
+    """
+    Ranked MealDBRecipe queryset. Without `q` it is just the filtered catalog
+    in default (title) order.
+    """
+    qs = MealDBRecipe.objects.all()
+    for field in FILTER_FIELDS:
+        value = (filters or {}).get(field)
+        if value:
+            qs = qs.filter(**{field: value})
+
+    q = " ".join((q or "").split())[:MAX_QUERY_CHARS]
+    if not q:
+        return qs
+
+    query = SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+    match = Q(search_vector=query)
+    score = SearchRank(F("search_vector"), query)
+
+    if trigram_available():
+        match |= Q(title__trigram_similar=q)
+        score = score + TrigramSimilarity("title", q)
+
+    return qs.filter(match).annotate(rank=score).order_by("-rank", "id")
@@ -0,0 +1,75 @@
+"""
+Server-side ingredient matching on interned token ids.
+
+Recipes carry `ingredient_token_ids` (int[] with a GIN index) and food logs
+carry `name_token_id`, both IngredientToken ids. Overlap filters (`&&`) and
+per-recipe match counts run in Postgres on those integers instead of on
+JSONB string arrays.
+"""
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import ExpressionWrapper, F, FloatField, Func, IntegerField, Value
+
+from recipes.models import IngredientToken, MealDBRecipe
+
+
+class ArrayMatchCount(Func):
+    """cardinality(array_column ∩ ids), evaluated by Postgres."""
+
+    output_field = IntegerField()
+
+    def __init__(self, field, ids):
+        super().__init__(F(field), Value(list(ids), output_field=ArrayField(IntegerField())))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        lhs, lhs_params = compiler.compile(self.source_expressions[0])
+        rhs, rhs_params = compiler.compile(self.source_expressions[1])
+        sql = f"cardinality(ARRAY(SELECT unnest({lhs}) INTERSECT SELECT unnest({rhs})))"
+        return sql, (*lhs_params, *rhs_params)
+
+
+class Cardinality(Func):
+    function = "cardinality"
+    output_field = IntegerField()
+
+
+def token_ids(names) -> list[int]:
+    """Ids of already-interned normalized names; unknown names are ignored."""
+    return sorted(IngredientToken.objects.ids_for(names, create=False).values())
+
+
+def overlapping_recipes(ids, min_matches: int = 1, qs=None):
+    """
+    Recipes sharing at least `min_matches` token ids with `ids`, annotated with
+    `match_count` and ordered best match first.
+    """
+    ids = sorted(set(ids))
+    qs = MealDBRecipe.objects.all() if qs is None else qs
+    if not ids:
+        return qs.none()
+    qs = qs.filter(ingredient_token_ids__overlap=ids).annotate(
+        match_count=ArrayMatchCount("ingredient_token_ids", ids)
+    )
+    if min_matches > 1:
+        qs = qs.filter(match_count__gte=min_matches)
+    return qs.order_by("-match_count", "id")
+
+
+def top_overlapping_recipes(ids, k: int, qs=None):
+    """
+    The `k` best recipes for inventory `ids`, scored, ordered and limited in
+    Postgres: 3 * matched + 10 * matched / total - missing (total = the
+    recipe's distinct tokens). Annotated with `match_count`, `token_count`
+    and `overlap_score`.
+    """
+    matched = F("match_count")
+    total = F("token_count")
+    score = ExpressionWrapper(
+        matched * 3.0 + matched * 10.0 / total - (total - matched),
+        output_field=FloatField(),
+    )
+    return (
+        overlapping_recipes(ids, qs=qs)
+        .annotate(token_count=Cardinality("ingredient_token_ids"))
+        .annotate(overlap_score=score)
+        .order_by("-overlap_score", "id")[:k]
+    )
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from recipes.models import MealDBRecipe
+from recipes.services import recipe_cache
+from recipes.services.ingredient_index import (
+    ingredient_index,
+    bump_catalog_version,
+    bump_catalog_epoch,
+    bump_catalog_members,
+)
+
+
+@receiver(post_save, sender=MealDBRecipe)
+def refresh_ingredient_index(sender, instance, created=False, **kwargs):
+    """
+    Keep this worker's index current; other workers pick it up via the catalog
+    version. Applied on commit, so a rolled-back save never reaches the index.
+    """
+    recipe_id, tokens = instance.id, instance.ingredient_tokens
+
+    def apply():
+        ingredient_index.update_recipe(recipe_id, tokens)
+        bump_catalog_version()
+
+    transaction.on_commit(apply)
+    if created:
+        transaction.on_commit(bump_catalog_members)
+    mealdb_id = instance.mealdb_id
+    transaction.on_commit(lambda: recipe_cache.invalidate(mealdb_id))
+
+
+@receiver(post_delete, sender=MealDBRecipe)
+def drop_from_ingredient_index(sender, instance, **kwargs):
+    recipe_id = instance.id
+
+    def apply():
+        ingredient_index.remove_recipe(recipe_id)
+        bump_catalog_epoch()
+
+    transaction.on_commit(apply)
+    transaction.on_commit(bump_catalog_members)
+    mealdb_id = instance.mealdb_id
+    transaction.on_commit(lambda: recipe_cache.invalidate(mealdb_id))
@@ -1,7 +1,15 @@
 from celery import shared_task
 import time
 
+from recipes.services.recommendation import refine_cached_response
+
 @shared_task(bind=True)
 def test_task(self):
     time.sleep(3)
     return "Celery is working 🚀"
+
+
+@shared_task(ignore_result=True)
+def refine_recommendations(cache_key: str, inv_days: dict, limit: int):
+    """Swap the LLM-refined ranking into a cached deterministic recommendation."""
+    return refine_cached_response(cache_key, inv_days, limit)
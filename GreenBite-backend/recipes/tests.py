@@ -1,11 +1,41 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from decimal import Decimal
 
-from recipes.models import MealDBRecipe, RecipeFavorite
-from food.models import FoodLogSys
+from recipes.models import IngredientToken, IngredientTokenManager, MealDBRecipe, RecipeFavorite
+from recipes.services.ingredient_index import IngredientIndex, ingredient_index
+from recipes.services.ranking import RecipeRankingEngine
+from recipes.services import recipe_cache, recommendation
+from recipes.services.sampler import recipe_sampler, sample_recipe_ids, sample_recipe_values
+from recipes.services.token_ids import overlapping_recipes, token_ids
+from project.utils import aho_corasick, normalize as normalizer
+from project.utils.aho_corasick import MultiPatternMatcher
+from project.utils.ingredient_tokens import MENTION_DESCRIPTOR, MENTION_INGREDIENT, MENTION_UNIT, build_mention_matcher
+from project.utils.normalize import NORMALIZER_VERSION, normalize_ingredient_name, normalize_many
+from project.utils.ingredient_synonyms import expand_ingredient_tokens, get_base_ingredient
+from project.utils.prompt_compiler import compile_selection_prompt, dedupe_names, fit_names
+from food.models import FoodLogSys, FoodLogUsage
+from food.utils.caching import get_list_version
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recipes-test-cache",
+    }
+}
 #model check 
 class MealDBRecipeModelTest(TestCase):
     def test_ingredient_tokens_are_built_on_save(self):
@@ -105,6 +135,90 @@ class RecipeAPITest(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("matches", response.data)
+@override_settings(CACHES=TEST_CACHES)
+class ConsumeConfirmAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email="eat@test.com", password="123456")
+        self.client.force_authenticate(self.user)
+        self.recipe = MealDBRecipe.objects.create(
+            mealdb_id="c1",
+            title="Egg Fried Rice",
+            ingredients=[{"name": "Egg"}, {"name": "Rice"}],
+        )
+        future = timezone.now().date() + timedelta(days=3)
+        self.egg = FoodLogSys.objects.create(
+            user=self.user, name="Egg", quantity=Decimal("3"), unit="pcs", expiry_date=future
+        )
+        self.rice = FoodLogSys.objects.create(
+            user=self.user, name="Rice", quantity=Decimal("1"), unit="kg", expiry_date=future
+        )
+        self.beef = FoodLogSys.objects.create(
+            user=self.user, name="Beef", quantity=Decimal("1"), unit="kg", expiry_date=future
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _confirm(self, items):
+        return self.client.post(
+            "/api/recipes/consume/confirm/",
+            {"recipe_id": self.recipe.id, "items": items},
+            format="json",
+        )
+
+    def test_confirm_applies_all_items_and_bumps_inventory_version(self):
+        before = get_list_version("foodlog", self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._confirm([
+                {"foodlog_id": self.egg.id, "used_quantity": "1"},
+                {"foodlog_id": self.egg.id, "used_quantity": "1"},
+                {"foodlog_id": self.rice.id, "used_quantity": "1"},
+            ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.egg.refresh_from_db()
+        self.rice.refresh_from_db()
+        self.assertEqual(self.egg.quantity, Decimal("1"))
+        self.assertTrue(self.rice.is_consumed)
+        self.assertEqual(FoodLogUsage.objects.filter(recipe=self.recipe).count(), 2)
+        self.assertEqual(get_list_version("foodlog", self.user.id), before + 1)
+
+    def test_invalid_item_rejects_whole_request(self):
+        for items in (
+            [{"foodlog_id": self.egg.id, "used_quantity": "1"}, {"foodlog_id": self.beef.id, "used_quantity": "1"}],
+            [{"foodlog_id": self.egg.id, "used_quantity": "1"}, {"foodlog_id": self.rice.id, "used_quantity": "5"}],
+        ):
+            response = self._confirm(items)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.egg.refresh_from_db()
+        self.assertEqual(self.egg.quantity, Decimal("3"))
+        self.assertFalse(FoodLogUsage.objects.exists())
+
+    def test_log_that_does_not_match_the_recipe_is_rejected(self):
+        eggplant = FoodLogSys.objects.create(
+            user=self.user, name="Eggplant", quantity=Decimal("2"), unit="pcs",
+            expiry_date=self.egg.expiry_date,
+        )
+        for log in (self.beef, eggplant):
+            response = self._confirm([{"foodlog_id": log.id, "used_quantity": "1"}])
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            log.refresh_from_db()
+            self.assertFalse(log.is_consumed)
+        self.assertFalse(FoodLogUsage.objects.exists())
+
+    def test_preview_is_keyed_by_recipe_ingredient(self):
+        response = self.client.post(
+            "/api/recipes/consume/preview/", {"recipe_id": self.recipe.id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        matches = response.data["matches"]
+        self.assertEqual(sorted(matches), ["egg", "rice"])
+        self.assertEqual(matches["egg"][0]["foodlog_id"], self.egg.id)
+        self.assertEqual(matches["egg"][0]["matched_name"], "egg")
+
+
 class UnauthorizedAccessTest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -113,3 +227,584 @@ class UnauthorizedAccessTest(TestCase):
         response = self.client.get("/api/recipes/recommend/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+
+@override_settings(CACHES=TEST_CACHES)
+class IngredientIndexTest(TestCase):
+    def setUp(self):
+        ingredient_index.reset()
+        self.chicken_rice = MealDBRecipe.objects.create(
+            mealdb_id="i1",
+            title="Chicken Rice",
+            ingredients=[{"name": "Chicken"}, {"name": "Rice"}],
+        )
+        self.rice_pudding = MealDBRecipe.objects.create(
+            mealdb_id="i2",
+            title="Rice Pudding",
+            ingredients=[{"name": "Rice"}, {"name": "Milk"}],
+        )
+
+    def tearDown(self):
+        # token ids remembered by executed commit hooks are rolled back with the test
+        IngredientTokenManager._committed_ids.clear()
+
+    def test_postings_cover_whole_catalog(self):
+        postings = ingredient_index.ensure_fresh().postings(["chicken", "rice", "saffron"])
+        got = {t: ids.tolist() for t, ids in postings.items()}
+        self.assertEqual(
+            got,
+            {"chicken": [self.chicken_rice.id], "rice": sorted([self.chicken_rice.id, self.rice_pudding.id])},
+        )
+
+    def test_save_updates_postings_incrementally(self):
+        ingredient_index.ensure_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rice_pudding.ingredients = [{"name": "Chicken"}]
+            self.rice_pudding.save()
+
+        postings = ingredient_index.ensure_fresh().postings(["milk", "chicken"])
+        self.assertNotIn("milk", postings)
+        self.assertEqual(postings["chicken"].tolist(), sorted([self.chicken_rice.id, self.rice_pudding.id]))
+
+    def test_delete_drops_recipe(self):
+        ingredient_index.ensure_fresh()
+        rid = self.chicken_rice.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chicken_rice.delete()
+        self.assertNotIn("chicken", ingredient_index.ensure_fresh().postings(["chicken"]))
+        self.assertEqual(ingredient_index.token_counts([rid]).tolist(), [0])
+
+    def test_rolled_back_save_leaves_index_alone(self):
+        ingredient_index.ensure_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    MealDBRecipe.objects.create(
+                        mealdb_id="i3", title="Ghost Curry", ingredients=[{"name": "Saffron"}],
+                    )
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+        self.assertEqual(ingredient_index.ensure_fresh().postings(["saffron"]), {})
+
+
+class _FixedIndex(IngredientIndex):
+    def __init__(self, rows):
+        super().__init__()
+        self._load((rid, tokens, None) for rid, tokens in rows)
+        self._version = self._epoch = 1
+
+    def ensure_fresh(self):
+        return self
+
+
+class InventoryFingerprintTest(TestCase):
+    def test_days_in_same_bucket_share_fingerprint(self):
+        fp = recommendation.inventory_fingerprint
+        self.assertEqual(fp({"egg": 5, "rice": 1}), fp({"rice": 1, "egg": 6}))
+        self.assertNotEqual(fp({"egg": 5}), fp({"egg": 2}))
+        self.assertNotEqual(fp({"egg": 5}), fp({"egg": 5, "rice": 5}))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeSamplerTest(TestCase):
+    def setUp(self):
+        recipe_sampler.reset()
+        self.ids = [
+            MealDBRecipe.objects.create(mealdb_id=f"s{i}", title=f"Sample {i}").id
+            for i in range(6)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_samples_distinct_existing_ids(self):
+        picked = sample_recipe_ids(4)
+        self.assertEqual(len(picked), 4)
+        self.assertEqual(len(set(picked)), 4)
+        self.assertTrue(set(picked) <= set(self.ids))
+        self.assertEqual(sorted(sample_recipe_ids(50)), sorted(self.ids))
+
+    def test_import_refreshes_id_array(self):
+        sample_recipe_ids(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            new = MealDBRecipe.objects.create(mealdb_id="s-new", title="New")
+        self.assertIn(new.id, sample_recipe_ids(50))
+
+    def test_stale_id_array_falls_back_to_tablesample(self):
+        sample_recipe_ids(1)
+        # e.g. a DB restore without a cache flush: none of the cached ids exist
+        recipe_sampler._ids = np.array([999991, 999992, 999993], dtype=np.int32)
+
+        rows = sample_recipe_values(2, "title")
+        self.assertEqual(len(rows), 2)
+        self.assertTrue({r["title"] for r in rows} <= {f"Sample {i}" for i in range(6)})
+        # the stale array is dropped; the next call reloads it
+        self.assertTrue(set(sample_recipe_ids(50)) <= set(self.ids))
+
+    @override_settings(RECIPE_RANDOM_SAMPLER="tablesample")
+    def test_tablesample_fallback(self):
+        picked = sample_recipe_ids(3)
+        self.assertEqual(len(set(picked)), 3)
+        self.assertTrue(set(picked) <= set(self.ids))
+
+    def test_random_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(email="rnd@test.com", password="123456"))
+        response = client.get("/api/mealdb/random/?n=3")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(set(response.data[0]), {"mealdb_id", "title", "thumbnail", "category", "cuisine"})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeCardCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(email="card@test.com", password="123456")
+        )
+        self.a = MealDBRecipe.objects.create(mealdb_id="52771", title="Arrabiata")
+        self.b = MealDBRecipe.objects.create(mealdb_id="52772", title="Teriyaki")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_many_hits_cache_after_first_load(self):
+        cards = recipe_cache.get_many(["52771", "52772", "missing"])
+        self.assertEqual(set(cards), {"52771", "52772"})
+        with self.assertNumQueries(0):
+            again = recipe_cache.get_many(["52772", "52771"])
+        self.assertEqual(again["52771"]["title"], "Arrabiata")
+
+    def test_save_invalidates_card(self):
+        recipe_cache.get("52771")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.title = "Penne Arrabiata"
+            self.a.save()
+        self.assertEqual(recipe_cache.get("52771")["title"], "Penne Arrabiata")
+
+    def test_detail_conditional_get(self):
+        first = self.client.get("/api/mealdb/52771/")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["title"], "Arrabiata")
+        self.assertTrue(first["ETag"])
+        self.assertTrue(first["Last-Modified"])
+
+        cached = self.client.get("/api/mealdb/52771/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        since = self.client.get("/api/mealdb/52771/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertEqual(self.client.get("/api/mealdb/nope/").status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeSearchAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(email="find@test.com", password="123456")
+        )
+        self.curry = MealDBRecipe.objects.create(
+            mealdb_id="f1",
+            title="Chicken Curry",
+            cuisine="Indian",
+            category="Chicken",
+            meal_time="dinner",
+            ingredients=[{"name": "Chicken"}, {"name": "Coconut Milk"}],
+            instructions="Simmer slowly.",
+        )
+        self.salad = MealDBRecipe.objects.create(
+            mealdb_id="f2",
+            title="Summer Salad",
+            cuisine="Greek",
+            category="Vegetarian",
+            meal_time="lunch",
+            ingredients=[{"name": "Tomato"}],
+            instructions="Serve with grilled chicken if you like.",
+        )
+
+    def test_title_match_outranks_instructions_match(self):
+        response = self.client.get("/api/recipes/search/", {"q": "chicken"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [r["recipe_id"] for r in response.data["results"]]
+        self.assertEqual(ids, [self.curry.id, self.salad.id])
+        self.assertIsNone(response.data["next_offset"])
+
+    def test_ingredient_search_and_filters(self):
+        response = self.client.get("/api/recipes/search/", {"q": "coconut"})
+        self.assertEqual([r["recipe_id"] for r in response.data["results"]], [self.curry.id])
+
+        response = self.client.get("/api/recipes/search/", {"q": "chicken", "meal_time": "lunch"})
+        self.assertEqual([r["recipe_id"] for r in response.data["results"]], [self.salad.id])
+
+    def test_paging_uses_next_offset(self):
+        response = self.client.get("/api/recipes/search/", {"q": "chicken", "limit": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["next_offset"], 1)
+
+
+class IngredientSynonymIndexTest(TestCase):
+    def test_lookups(self):
+        self.assertEqual(get_base_ingredient("Chicken Breast"), "chicken")
+        self.assertEqual(get_base_ingredient("zucchini"), "zucchini")
+        self.assertEqual(expand_ingredient_tokens("tahini"), {"tahini"})
+        expanded = expand_ingredient_tokens("Brown Rice")
+        self.assertIn("rice", expanded)
+        self.assertIn("jasmine rice", expanded)
+
+    def test_returns_fresh_sets(self):
+        expand_ingredient_tokens("rice").add("not rice")
+        self.assertNotIn("not rice", expand_ingredient_tokens("rice"))
+
+    def test_duplicate_base_keeps_last_definition(self):
+        # "pepper" is declared twice; the dict literal keeps the spice list
+        self.assertIn("black pepper", expand_ingredient_tokens("pepper"))
+
+
+class NormalizerBackfillTest(TestCase):
+    def test_single_rule_set(self):
+        self.assertEqual(normalize_ingredient_name("2 tbsp Extra Virgin Olive Oil"), "olive oil")
+        self.assertEqual(normalize_ingredient_name("Low Fat Milk (1L)"), "milk")
+        self.assertEqual(normalize_ingredient_name("Frozen Peas"), "pea")
+        self.assertEqual(normalize_ingredient_name("fat"), "fat")
+        self.assertEqual(normalize_ingredient_name("Spring Onions"), "green onion")
+
+    def test_save_stamps_version(self):
+        recipe = MealDBRecipe.objects.create(mealdb_id="v1", title="Peas", ingredients=[{"name": "Peas"}])
+        self.assertEqual(recipe.normalizer_version, NORMALIZER_VERSION)
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_backfill_only_touches_stale_rows(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username="norm", email="norm@test.com", password="x")
+        fresh = MealDBRecipe.objects.create(mealdb_id="f1", title="Fresh", ingredients=[{"name": "Rice"}])
+        stale = MealDBRecipe.objects.create(mealdb_id="s1", title="Stale", ingredients=[{"name": "Frozen Peas"}])
+        MealDBRecipe.objects.filter(id=stale.id).update(ingredient_tokens=["frozen pea"], normalizer_version=1)
+        MealDBRecipe.objects.filter(id=fresh.id).update(ingredient_tokens=["untouched"])
+        log = FoodLogSys.objects.create(
+            user=user, name="Frozen Peas", quantity=Decimal("1"), unit="kg",
+            expiry_date=timezone.now().date(), storage_type="freezer",
+        )
+        FoodLogSys.objects.filter(id=log.id).update(name_normalized="frozen pea", normalizer_version=1)
+        foodlog_v = get_list_version("foodlog", user.id)
+
+        call_command("backfill_tokens", batch_size=1, stdout=StringIO())
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        log.refresh_from_db()
+        self.assertEqual(stale.ingredient_tokens, ["pea"])
+        self.assertEqual(stale.normalizer_version, NORMALIZER_VERSION)
+        self.assertEqual(fresh.ingredient_tokens, ["untouched"])
+        self.assertEqual(log.name_normalized, "pea")
+        self.assertEqual(log.normalizer_version, NORMALIZER_VERSION)
+        self.assertNotEqual(get_list_version("foodlog", user.id), foodlog_v)
+
+    def test_synonym_mode_retokenizes_basic_rows(self):
+        recipe = MealDBRecipe.objects.create(mealdb_id="r1", title="Rice", ingredients=[{"name": "Rice"}])
+        call_command("backfill_tokens", with_synonyms=True, skip_foodlogs=True, stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.tokens_with_synonyms)
+        self.assertIn("jasmine rice", recipe.ingredient_tokens)
+
+
+class NormalizeManyTest(TestCase):
+    def setUp(self):
+        normalizer._local.clear()
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_order_and_duplicates_without_shared_cache(self):
+        self.assertEqual(
+            normalize_many(["Frozen Peas", "", None, "2 cups Rice", "Frozen Peas"]),
+            ["pea", "", "", "rice", "pea"],
+        )
+
+    def test_shared_hash_is_filled_and_read(self):
+        client, key = normalizer._shared_hash()
+        try:
+            client.delete(key)
+        except Exception:
+            self.skipTest("redis not reachable")
+
+        self.assertEqual(normalize_many(["Chopped Onions", "Rice"]), ["onion", "rice"])
+        self.assertEqual(client.hget(key, "Chopped Onions"), b"onion")
+
+        # a fresh process (empty LRU) gets it from redis without normalizing
+        normalizer._local.clear()
+        with mock.patch.object(normalizer, "_normalize", side_effect=AssertionError):
+            self.assertEqual(normalize_many(["Rice", "Chopped Onions"]), ["rice", "onion"])
+        client.delete(key)
+
+
+class MultiPatternMatcherTest(TestCase):
+    PATTERNS = ["he", "she", "his", "hers", "olive oil", "oil", "rice"]
+    TEXT = "Ushers fry rice in Olive Oil; his price"
+
+    def _backends(self):
+        yield False
+        if aho_corasick.ahocorasick is not None:
+            yield True
+
+    def test_finds_overlapping_matches_in_one_pass(self):
+        for native in self._backends():
+            m = MultiPatternMatcher(self.PATTERNS, whole_words=False, native=native)
+            hits = {(h.start, h.pattern) for h in m.finditer(self.TEXT)}
+            self.assertTrue({(1, "she"), (2, "he"), (2, "hers"), (11, "rice"), (19, "olive oil"), (25, "oil"), (30, "his"), (35, "rice")} <= hits)
+
+    def test_whole_words_and_values(self):
+        for native in self._backends():
+            m = MultiPatternMatcher({"rice": "grain", "oil": "fat", "he": "pronoun"}, native=native)
+            self.assertEqual(m.find_values(self.TEXT), {"grain", "fat"})
+            self.assertFalse(m.contains_any("price of the shelf"))
+            self.assertFalse(MultiPatternMatcher([]).contains_any("anything"))
+
+    def test_mention_matcher_vocabularies(self):
+        matcher = build_mention_matcher(["Tomato"])
+        found = {m.value for m in matcher.finditer("Add 2 cups of chopped cilantro, tomatoes and the chicken breasts")}
+        self.assertIn((MENTION_INGREDIENT, "coriander"), found)
+        self.assertIn((MENTION_INGREDIENT, "chicken"), found)
+        self.assertIn((MENTION_INGREDIENT, "tomato"), found)
+        self.assertIn((MENTION_DESCRIPTOR, "chopped"), found)
+        self.assertIn((MENTION_UNIT, "cups"), found)
+
+
+class IngredientTokenIdsTest(TestCase):
+    def test_ids_interned_on_save_and_matched_in_sql(self):
+        user = get_user_model().objects.create_user(username="ids", email="ids@test.com", password="x")
+        both = MealDBRecipe.objects.create(
+            mealdb_id="i1", title="Both", ingredients=[{"name": "Rice"}, {"name": "Chopped Onions"}]
+        )
+        one = MealDBRecipe.objects.create(mealdb_id="i2", title="One", ingredients=[{"name": "rice"}, {"name": "Salt"}])
+        MealDBRecipe.objects.create(mealdb_id="i3", title="None", ingredients=[{"name": "Salt"}])
+
+        rice, onion = IngredientToken.objects.get(name="rice"), IngredientToken.objects.get(name="onion")
+        self.assertEqual(both.ingredient_token_ids, sorted([rice.id, onion.id]))
+
+        logs = [
+            FoodLogSys.objects.create(
+                user=user, name=name, quantity=Decimal("1"), unit="kg",
+                expiry_date=timezone.now().date() + timedelta(days=2), storage_type="fridge",
+            )
+            for name in ("Rice", "Onion")
+        ]
+        self.assertEqual([log.name_token_id for log in logs], [rice.id, onion.id])
+        inv = token_ids(["onion", "rice", "unknown"])
+        self.assertEqual(inv, sorted([rice.id, onion.id]))
+
+        ranked = [(r.id, r.match_count) for r in overlapping_recipes(inv)]
+        self.assertEqual(ranked, [(both.id, 2), (one.id, 1)])
+        self.assertEqual([r.id for r in overlapping_recipes(inv, min_matches=2)], [both.id])
+        self.assertFalse(overlapping_recipes([]).exists())
+
+
+class PromptCompilerTest(TestCase):
+    def _candidates(self, n):
+        return [
+            {
+                "recipe_id": i,
+                "title": f"Recipe number {i} with a fairly long descriptive title",
+                "ingredient_tokens": ["egg", "rice", f"spice {i}"],
+                "match_count": 2,
+                "min_days_left": 1,
+                "meal_time": "dinner",
+                "difficulty": "easy",
+            }
+            for i in range(n)
+        ]
+
+    def test_tokens_are_dictionary_encoded(self):
+        compiled = compile_selection_prompt(
+            "test", "sys", {"egg": 1, "rice": 3}, self._candidates(3), limit=2, budget_tokens=10_000
+        )
+        payload = json.loads(compiled.messages[1]["content"])
+        self.assertEqual(payload["vocab"][:2], ["egg", "rice"])
+        self.assertEqual(payload["inv"], [[0, 1], [1, 3]])
+        self.assertEqual(payload["rows"][0][-1], [0, 1, 2])
+        self.assertEqual(payload["rows"][1][-1], [0, 1, 3])
+        self.assertEqual(compiled.stats.items_kept, 3)
+
+    def test_budget_limits_candidates_but_keeps_limit(self):
+        small = compile_selection_prompt("test", "sys", {"egg": 1}, self._candidates(150), 5, budget_tokens=400)
+        self.assertGreaterEqual(len(small.kept), 5)
+        self.assertLess(len(small.kept), 150)
+        self.assertLessEqual(small.stats.tokens, 400)
+
+        tiny = compile_selection_prompt("test", "sys", {"egg": 1}, self._candidates(150), 5, budget_tokens=1)
+        self.assertEqual(len(tiny.kept), 5)
+
+    def test_names_are_deduped_and_fitted(self):
+        self.assertEqual(dedupe_names(["Egg", " egg ", "", "Rice"]), ["Egg", "Rice"])
+        self.assertEqual(fit_names(["Egg", "egg", "Rice"], budget_tokens=1000), ["Egg", "Rice"])
+        self.assertEqual(fit_names(["Egg", "Rice"], budget_tokens=0), [])
+
+
+class RecipeRankingEngineTest(TestCase):
+    def setUp(self):
+        self.engine = RecipeRankingEngine(index=_FixedIndex([
+            (1, ("egg", "rice")),
+            (2, ("egg",)),
+            (3, ("milk", "rice", "sugar")),
+            (4, ()),
+        ]))
+
+    def test_rank_counts_matches_and_soonest_expiry(self):
+        ranked = self.engine.rank({"egg": 5, "rice": 1, "flour": 0})
+        top = ranked.top()
+        self.assertEqual([c["recipe_id"] for c in top], [1, 3, 2])
+        by_id = {c["recipe_id"]: c for c in top}
+        self.assertEqual(by_id[1]["match_count"], 2)
+        self.assertEqual(by_id[1]["min_days_left"], 1)
+        self.assertEqual(by_id[3]["token_count"], 3)
+        self.assertEqual(by_id[2]["min_days_left"], 5)
+        self.assertEqual(by_id[1]["urgency"], 25.0 + 29.0)
+
+    def test_min_matches_and_empty_inventory(self):
+        self.assertEqual(len(self.engine.rank({})), 0)
+        ranked = self.engine.rank({"egg": None, "rice": None}, min_matches=2)
+        self.assertEqual(ranked.recipe_ids.tolist(), [1])
+        self.assertEqual(int(ranked.min_days_left[0]), 999999)
+
+    def test_rank_follows_index_writes(self):
+        index = self.engine.index
+        index.update_recipe(2, ("egg", "rice"))
+        index.remove_recipe(3)
+        ranked = self.engine.rank({"egg": None, "rice": None}, min_matches=2)
+        self.assertEqual(ranked.recipe_ids.tolist(), [1, 2])
+        self.assertEqual(ranked.token_counts.tolist(), [2, 2])
+        self.assertEqual(len(self.engine.rank({"milk": 1})), 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+@mock.patch("recipes.views.client", None)
+class RecommendRecipesAPITest(TestCase):
+    def setUp(self):
+        ingredient_index.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="rec@test.com", password="123456"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.best = MealDBRecipe.objects.create(
+            mealdb_id="r1",
+            title="Egg Fried Rice",
+            ingredients=[{"name": "Egg"}, {"name": "Rice"}],
+        )
+        self.partial = MealDBRecipe.objects.create(
+            mealdb_id="r2",
+            title="Boiled Egg",
+            ingredients=[{"name": "Egg"}, {"name": "Salt"}],
+        )
+        MealDBRecipe.objects.create(
+            mealdb_id="r3",
+            title="Beef Stew",
+            ingredients=[{"name": "Beef"}],
+        )
+        today = timezone.now().date()
+        for name in ("Egg", "Rice"):
+            FoodLogSys.objects.create(
+                user=self.user,
+                name=name,
+                quantity=Decimal("2"),
+                unit="pcs",
+                category="other",
+                storage_type="fridge",
+                expiry_date=today + timedelta(days=3),
+            )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_recommend_ranks_by_match_count(self):
+        response = self.client.get("/api/recipes/recommend/?limit=5")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [r["recipe_id"] for r in response.data]
+        self.assertEqual(ids, [self.best.id, self.partial.id])
+        self.assertEqual(
+            sorted(response.data[0]["match"]["matched_ingredients_norm"]), ["egg", "rice"]
+        )
+
+    def test_candidates_shared_across_users_with_same_pantry(self):
+        self.client.get("/api/recipes/recommend/?limit=5")
+
+        other = get_user_model().objects.create_user(email="rec2@test.com", password="123456")
+        today = timezone.now().date()
+        for name in ("Egg", "Rice"):
+            FoodLogSys.objects.create(
+                user=other,
+                name=name,
+                quantity=Decimal("1"),
+                unit="pcs",
+                category="other",
+                storage_type="fridge",
+                expiry_date=today + timedelta(days=3),
+            )
+
+        self.client.force_authenticate(other)
+        with mock.patch.object(
+            recommendation, "_build_candidates", wraps=recommendation._build_candidates
+        ) as build:
+            response = self.client.get("/api/recipes/recommend/?limit=5")
+        build.assert_not_called()
+        self.assertEqual([r["recipe_id"] for r in response.data], [self.best.id, self.partial.id])
+
+    def test_quantity_edit_keeps_user_cache(self):
+        self.client.get("/api/recipes/recommend/?limit=5")
+        log = FoodLogSys.objects.filter(user=self.user, name="Egg").first()
+        log.quantity = Decimal("5")
+        log.save()
+
+        with mock.patch("recipes.views.get_candidates") as get_candidates:
+            response = self.client.get("/api/recipes/recommend/?limit=5")
+        get_candidates.assert_not_called()
+        self.assertEqual(len(response.data), 2)
+
+    def test_empty_inventory_still_sends_ranking_header(self):
+        FoodLogSys.objects.filter(user=self.user).delete()
+        for _ in range(2):  # computed, then from cache
+            response = self.client.get("/api/recipes/recommend/?limit=5")
+            self.assertEqual(response.data, [])
+            self.assertEqual(response["X-Recommendation-Ranking"], "deterministic")
+
+    def _fake_llm(self, picks):
+        content = json.dumps({"selected": [{"recipe_id": rid, "why": "uses eggs"} for rid in picks]})
+        llm = mock.Mock()
+        llm.chat.completions.create.return_value = mock.Mock(
+            choices=[mock.Mock(message=mock.Mock(content=content))]
+        )
+        return llm
+
+    @override_settings(RECOMMEND_LLM_MODE="async")
+    def test_async_mode_answers_deterministic_then_serves_refined(self):
+        llm = self._fake_llm([self.partial.id])
+        with mock.patch("recipes.views.client", llm), \
+                mock.patch("recipes.views.refine_recommendations") as task:
+            first = self.client.get("/api/recipes/recommend/?limit=5")
+            again = self.client.get("/api/recipes/recommend/?limit=5")
+
+            llm.chat.completions.create.assert_not_called()
+            self.assertEqual(task.delay.call_count, 1)  # second hit sees the lock
+            self.assertEqual(first["X-Recommendation-Ranking"], "deterministic")
+            self.assertEqual({r["ranked_by"] for r in first.data}, {"deterministic"})
+            self.assertEqual(again.data, first.data)
+
+            ck, inv_days, limit = task.delay.call_args.args
+            self.assertTrue(recommendation.refine_cached_response(ck, inv_days, limit, client=llm))
+
+            refined = self.client.get("/api/recipes/recommend/?limit=5")
+
+        self.assertEqual(refined["X-Recommendation-Ranking"], "llm")
+        self.assertEqual([r["recipe_id"] for r in refined.data], [self.partial.id])
+        self.assertEqual(refined.data[0]["why"], "uses eggs")
+        self.assertEqual(task.delay.call_count, 1)
+
+    @override_settings(RECOMMEND_LLM_MODE="sync")
+    def test_sync_mode_calls_llm_inline(self):
+        llm = self._fake_llm([self.partial.id, 999999])
+        with mock.patch("recipes.views.client", llm):
+            response = self.client.get("/api/recipes/recommend/?limit=5")
+
+        self.assertEqual([r["recipe_id"] for r in response.data], [self.partial.id])
+        self.assertEqual(response.data[0]["ranked_by"], "llm")
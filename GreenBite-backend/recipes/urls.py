@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RecommendRecipesAPIView, ConsumePreviewAPIView, ConsumeConfirmAPIView,mealdb_random, mealdb_detail , add_to_favorites
+from .views import RecommendRecipesAPIView, ConsumePreviewAPIView, ConsumeConfirmAPIView,mealdb_random, mealdb_detail , add_to_favorites, recipe_search
 
 urlpatterns = [
     path("recipes/recommend/", RecommendRecipesAPIView.as_view()),
@@ -8,5 +8,6 @@ urlpatterns = [
     path("mealdb/random/", mealdb_random, name="mealdb-random"),
     path("mealdb/<str:mealdb_id>/", mealdb_detail, name="mealdb-detail"),
     path("recipes/favorites/add/", add_to_favorites, name="mealdb-favorite"),
+    path("recipes/search/", recipe_search, name="recipe-search"),
 ]
 
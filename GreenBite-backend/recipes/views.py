@@ -1,10 +1,8 @@
-import json
-import random
-from decimal import Decimal
-from django.conf import settings
-from django.db import transaction
+import logging
 from django.db.models import Q, Func, Value
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django.utils import timezone
 from django.core.cache import cache
 from rest_framework import status
@@ -14,62 +12,89 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import permission_classes
 
-from food.models import FoodLogSys, FoodLogUsage
-from food.utils.caching import list_key, detail_key, get_list_version
+from food.models import FoodLogSys
+from food.services.consumption import ConsumptionError, consume_food_logs
+from food.services.ingredient_matching import InventoryMatcher
+from food.utils.caching import list_key
 from recipes.models import MealDBRecipe, RecipeFavorite
+from recipes.services.ingredient_index import get_catalog_version
+from recipes.services.recommendation import (
+    LLM_MODE_ASYNC,
+    LLM_MODE_OFF,
+    LLM_MODE_SYNC,
+    RANKED_DETERMINISTIC,
+    RANKED_LLM,
+    REFINE_LOCK_SECONDS,
+    build_response,
+    deterministic_response,
+    get_candidates,
+    inventory_digest,
+    llm_client,
+    llm_mode,
+    load_inventory_days,
+    personalize,
+    refine_lock_key,
+    select_with_llm,
+)
+from recipes.services import recipe_cache
+from recipes.services.sampler import sample_recipe_values
+from recipes.services.search import FILTER_FIELDS as SEARCH_FILTER_FIELDS, search_recipes
+from recipes.tasks import refine_recommendations
 from recipes.serializers import ConsumePreviewSerializer, ConsumeConfirmSerializer
 
-# OpenAI is optional fallback
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+logger = logging.getLogger(__name__)
 
-client = None
-if OpenAI and getattr(settings, "OPENAI_API_KEY", None):
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# OpenAI is optional fallback
+client = llm_client
 
 #Cache 
 CACHE_TTL_SECONDS = 60 * 60
 REC_NAMESPACE = "recipes:recommend"
-MEALDB_DETAIL_NAMESPACE = "mealdb:detail"
-INVENTORY_NAMESPACE = "foodlog"
 
-def _recommend_cache_key(request) -> str:
-    user_id = request.user.id
-    inv_v = get_list_version(INVENTORY_NAMESPACE, user_id)
-    # include inventory version in the hashed input
-    full_path = f"{request.get_full_path()}|inv_v={inv_v}"
-    return list_key(REC_NAMESPACE, user_id, full_path)
+def _recommend_cache_key(user_id: int, inv_days: dict, limit: int) -> str:
+    # keyed by what the answer depends on (exact name/days pairs + catalog),
+    # so edits that don't touch the normalized inventory keep the entry alive
+    path = f"limit={limit}|inv={inventory_digest(inv_days)}|catalog={get_catalog_version()}"
+    return list_key(REC_NAMESPACE, user_id, path)
+
+
+def _ranked_by(out: list) -> str:
+    return out[0].get("ranked_by", RANKED_DETERMINISTIC) if out else RANKED_DETERMINISTIC
 
 
-def _mealdb_detail_cache_key(mealdb_id: str) -> str:
-    # Use user_id=0 for a global-ish key (still namespaced)
-    return detail_key(MEALDB_DETAIL_NAMESPACE, 0, int(_safe_int_hash(mealdb_id)))
+def _recommend_response(out: list) -> Response:
+    resp = Response(out, status=status.HTTP_200_OK)
+    resp["X-Recommendation-Ranking"] = _ranked_by(out)
+    return resp
+
+
+def _schedule_refine(ck: str, inv_days: dict, limit: int) -> None:
+    # at most one refine in flight per response key
+    if not cache.add(refine_lock_key(ck), 1, timeout=REFINE_LOCK_SECONDS):
+        return
+    try:
+        refine_recommendations.delay(ck, inv_days, limit)
+    except Exception:
+        logger.exception("Could not enqueue recommendation refine")
+        cache.delete(refine_lock_key(ck))
 
 
-def _safe_int_hash(s: str) -> int:
-    # stable int derived from a string for detail_key(pk:int)
-    # (pk only needs to be consistent, not meaningful)
-    acc = 0
-    for ch in (s or "")[:120]:
-        acc = (acc * 131 + ord(ch)) % 2_000_000_000
-    return acc or 1
 class RecommendRecipesAPIView(APIView):
     """
     GET /recipes/recommend?limit=5
     Recommends recipes from MealDBRecipe based on user's non-expired inventory.
     Uses LLM ONLY as a selector among DB candidates (never generates recipes).
+
+    RECOMMEND_LLM_MODE:
+      - "async" (default): answer with the deterministic top-N, refine via Celery
+      - "sync": call the LLM inline before answering
+      - "off": deterministic only
+    Each item carries "ranked_by" ("deterministic" | "llm"), mirrored in the
+    X-Recommendation-Ranking header.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # ---- cache check (per-user + tied to inventory version) ----
-        ck = _recommend_cache_key(request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached, status=status.HTTP_200_OK)
-
         # ---- input parsing ----
         try:
             limit = int(request.query_params.get("limit", 5))
@@ -79,206 +104,46 @@ class RecommendRecipesAPIView(APIView):
 
         today = timezone.now().date()
 
-        # 1) User inventory (not consumed, not expired) ordered by expiry
-        inventory_qs = FoodLogSys.objects.filter(
-            user=request.user,
-            is_consumed=False,
-            expiry_date__gte=today,
-        ).order_by("expiry_date")
+        # 1) User inventory (not consumed, not expired): ingredient -> min days left
+        inv_days = load_inventory_days(request.user, today)
 
-        inv_rows = list(
-            inventory_qs.values("name_normalized", "expiry_date", "quantity", "unit")
-        )
-        inv_norms = sorted({x["name_normalized"] for x in inv_rows if x["name_normalized"]})
+        # ---- cache check (per-user, keyed by the normalized inventory) ----
+        ck = _recommend_cache_key(request.user.id, inv_days, limit)
+        cached = cache.get(ck)
+        if cached is not None:
+            if client and llm_mode() == LLM_MODE_ASYNC and _ranked_by(cached) == RANKED_DETERMINISTIC:
+                _schedule_refine(ck, inv_days, limit)
+            return _recommend_response(cached)
 
-        if not inv_norms:
+        if not inv_days:
             out = []
             cache.set(ck, out, timeout=CACHE_TTL_SECONDS)
-            return Response(out, status=status.HTTP_200_OK)
+            return _recommend_response(out)
 
-        inv_set = set(inv_norms)
-
-        # map ingredient -> min days left
-        inv_days = {}
-        for x in inv_rows:
-            norm = x["name_normalized"]
-            if not norm:
-                continue
-            days = (x["expiry_date"] - today).days
-            inv_days[norm] = min(inv_days.get(norm, 10**9), days)
-
-        candidates_qs = MealDBRecipe.objects.all().only(
-            "id",
-            "mealdb_id",
-            "title",
-            "thumbnail",
-            "category",
-            "cuisine",
-            "ingredient_tokens",
-            "meal_time",
-            "difficulty",
-            "instructions",
-            "tags",
-            "ingredients",
-        )
-
-        # Prefer DB overlap filter if supported; else fallback
-        try:
-            candidates_qs = candidates_qs.extra(
-                where=["ingredient_tokens::jsonb ?| %s"],
-                params=[inv_norms],
-            )[:400]
-        except Exception:
-            candidates_qs = candidates_qs[:1200]
-
-        candidates_scored = []
-        for r in candidates_qs:
-            ing_norms = r.ingredient_tokens or []
-            ing_set = set(ing_norms)
-
-            matched = list(ing_set & inv_set)
-            match_count = len(matched)
-            if match_count < 1:
-                continue
-
-            min_days = min([inv_days[m] for m in matched], default=999999)
-
-            candidates_scored.append(
-                {
-                    "recipe_id": r.id,
-                    "mealdb_id": r.mealdb_id,
-                    "title": r.title,
-                    "thumbnail": r.thumbnail,
-                    "category": r.category,
-                    "cuisine": r.cuisine,
-                    "meal_time": r.meal_time,
-                    "difficulty": r.difficulty,
-                    "ingredient_tokens": list(ing_set)[:30],
-                    "match_count": match_count,
-                    "min_days_left": min_days,
-                }
-            )
+        # 2) Candidates: shared across users with the same inventory fingerprint
+        candidates_scored = personalize(get_candidates(inv_days), inv_days)
 
         if not candidates_scored:
             out = []
             cache.set(ck, out, timeout=CACHE_TTL_SECONDS)
-            return Response(out, status=status.HTTP_200_OK)
-
-        # deterministic ranking as base
-        candidates_scored.sort(key=lambda x: (-x["match_count"], x["min_days_left"]))
-        top_for_llm = candidates_scored[:150]
-
-        # 3) LLM selector (optional): choose ONLY recipe_id from candidates
-        selected_ids = []
-        why_map = {}
-
-        if client:
-            try:
-                payload = {
-                    "limit": limit,
-                    "inventory": [
-                        {
-                            "name_norm": x["name_normalized"],
-                            "days_left": (x["expiry_date"] - today).days,
-                        }
-                        for x in inv_rows
-                        if x["name_normalized"]
-                    ],
-                    "candidates": [
-                        {
-                            "recipe_id": c["recipe_id"],
-                            "title": c["title"],
-                            "ingredient_tokens": c["ingredient_tokens"],
-                            "match_count": c["match_count"],
-                            "min_days_left": c["min_days_left"],
-                            "meal_time": c["meal_time"],
-                            "difficulty": c["difficulty"],
-                        }
-                        for c in top_for_llm
-                    ],
-                }
+            return _recommend_response(out)
 
-                messages = [
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a recipe recommendation assistant.\n"
-                            "RULES:\n"
-                            "- You MUST select recipe_id values ONLY from the provided candidates.\n"
-                            "- Do NOT invent recipes, ingredients, steps, or ids.\n"
-                            "- Output JSON only in this format:\n"
-                            "{\"selected\":[{\"recipe_id\":123,\"why\":\"...\"}]}\n"
-                            "- If none fit, output: {\"selected\":[]}\n"
-                        ),
-                    },
-                    {"role": "user", "content": json.dumps(payload)},
-                ]
-
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    temperature=0.2,
-                    response_format={"type": "json_object"},
-                )
-
-                data = json.loads(resp.choices[0].message.content)
-                picked = data.get("selected", []) or []
-
-                allowed = {c["recipe_id"] for c in top_for_llm}
-                for item in picked:
-                    rid = item.get("recipe_id")
-                    if isinstance(rid, int) and rid in allowed:
-                        selected_ids.append(rid)
-                        why_map[rid] = (item.get("why") or "").strip()[:220]
-
-                selected_ids = selected_ids[:limit]
-
-            except Exception:
-                selected_ids = []
-
-        # 4) Fallback: deterministic top matches
-        if not selected_ids:
-            selected_ids = [c["recipe_id"] for c in top_for_llm[:limit]]
-
-        # 5) Return full recipes from DB (never from LLM)
-        recipes = list(MealDBRecipe.objects.filter(id__in=selected_ids))
-        rmap = {r.id: r for r in recipes}
-        ordered = [rmap[i] for i in selected_ids if i in rmap]
-
-        out = []
-        for r in ordered:
-            ing_norms = r.ingredient_tokens or []
-            matched = [n for n in ing_norms if n in inv_days]
-
-            expiring_soon = sorted(
-                [{"name_norm": n, "days_left": inv_days[n]} for n in matched],
-                key=lambda d: d["days_left"],
-            )[:5]
-
-            out.append(
-                {
-                    "recipe_id": r.id,
-                    "mealdb_id": r.mealdb_id,
-                    "title": r.title,
-                    "thumbnail": r.thumbnail,
-                    "category": r.category,
-                    "cuisine": r.cuisine,
-                    "instructions": r.instructions,
-                    "tags": r.tags,
-                    "ingredients": r.ingredients,  # list of {"name","measure"}
-                    "mealTime": r.meal_time,
-                    "difficulty": r.difficulty,
-                    "why": why_map.get(r.id, ""),
-                    "match": {
-                        "matched_ingredients_norm": matched,
-                        "expiring_soon": expiring_soon,
-                    },
-                }
-            )
+        mode = llm_mode() if client else LLM_MODE_OFF
 
-        cache.set(ck, out, timeout=CACHE_TTL_SECONDS)
-        return Response(out, status=status.HTTP_200_OK)
+        # 3) LLM selector inline (sync mode): choose ONLY recipe_id from candidates
+        if mode == LLM_MODE_SYNC:
+            selected_ids, why_map = select_with_llm(client, candidates_scored, inv_days, limit)
+            if selected_ids:
+                out = build_response(candidates_scored, selected_ids, why_map, inv_days, RANKED_LLM)
+                cache.set(ck, out, timeout=CACHE_TTL_SECONDS)
+                return _recommend_response(out)
 
+        # 4) Deterministic top matches; async mode refines them in the background
+        out = deterministic_response(candidates_scored, inv_days, limit)
+        cache.set(ck, out, timeout=CACHE_TTL_SECONDS)
+        if mode == LLM_MODE_ASYNC:
+            _schedule_refine(ck, inv_days, limit)
+        return _recommend_response(out)
 
 
 class ConsumePreviewAPIView(APIView):
@@ -298,16 +163,21 @@ class ConsumePreviewAPIView(APIView):
         today = timezone.now().date()
         recipe_norms = sorted(set([x for x in (recipe.ingredient_tokens or []) if x]))
 
-        logs = FoodLogSys.objects.filter(
-            user=request.user,
-            is_consumed=False,
-            expiry_date__gte=today,
-            name_normalized__in=recipe_norms,
-        ).order_by("expiry_date")
+        # grouped by recipe ingredient, as before; the inventory name each one
+        # matched is in the entries. Synonym-expanded tokens that resolve to
+        # the same logs keep only the best-scoring ingredient
+        best = {}
+        matcher = InventoryMatcher.for_user(request.user, fresh_only=True)
+        for match in matcher.match_many(recipe_norms):
+            if match is None:
+                continue
+            kept = best.get(match.matched_name)
+            if kept is None or match.score > kept.score:
+                best[match.matched_name] = match
 
         grouped = {}
-        for fl in logs:
-            grouped.setdefault(fl.name_normalized, []).append(
+        for match in best.values():
+            grouped[match.ingredient] = [
                 {
                     "foodlog_id": fl.id,
                     "name": fl.name,
@@ -316,8 +186,11 @@ class ConsumePreviewAPIView(APIView):
                     "unit": fl.unit,
                     "expiry_date": str(fl.expiry_date),
                     "days_left": (fl.expiry_date - today).days,
+                    "matched_name": match.matched_name,
+                    "match_score": match.score,
                 }
-            )
+                for fl in match.logs
+            ]
 
         return Response(
             {
@@ -332,6 +205,13 @@ class ConsumePreviewAPIView(APIView):
 
 
 
+def _recipe_allowed_norms(user, recipe) -> set:
+    """Recipe tokens plus the inventory names the preview matched them to."""
+    tokens = [t for t in (recipe.ingredient_tokens or []) if t]
+    matches = InventoryMatcher.for_user(user, fresh_only=True).match_many(tokens)
+    return set(tokens) | {m.matched_name for m in matches if m is not None}
+
+
 class ConsumeConfirmAPIView(APIView):
     """
     POST /recipes/consume/confirm
@@ -347,51 +227,18 @@ class ConsumeConfirmAPIView(APIView):
         s = ConsumeConfirmSerializer(data=request.data)
         s.is_valid(raise_exception=True)
 
-        today = timezone.now().date()
-        recipe_id = s.validated_data["recipe_id"]
-        items = s.validated_data["items"]
+        recipe = get_object_or_404(MealDBRecipe, id=s.validated_data["recipe_id"])
 
-        recipe = get_object_or_404(MealDBRecipe, id=recipe_id)
-        recipe_norms = set(recipe.ingredient_tokens or [])
-
-        ids = [x["foodlog_id"] for x in items]
-        with transaction.atomic():
-            logs = list(
-                FoodLogSys.objects.select_for_update().filter(
-                    user=request.user,
-                    id__in=ids,
-                    is_consumed=False,
-                    expiry_date__gte=today,
-                )
+        try:
+            consume_food_logs(
+                request.user,
+                [(it["foodlog_id"], it["used_quantity"]) for it in s.validated_data["items"]],
+                recipe=recipe,
+                allowed_norms=_recipe_allowed_norms(request.user, recipe),
+                fresh_only=True,
             )
-            log_map = {fl.id: fl for fl in logs}
-
-            # validate all ids exist + belong to recipe ingredients
-            for it in items:
-                fl = log_map.get(it["foodlog_id"])
-                if not fl:
-                    return Response(
-                        {"detail": f"Invalid foodlog_id: {it['foodlog_id']}"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                if fl.name_normalized not in recipe_norms:
-                    return Response(
-                        {"detail": f"FoodLog {fl.id} not part of this recipe ingredients"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            # consumption + usage logging
-            for it in items:
-                fl = log_map[it["foodlog_id"]]
-                used_qty = Decimal(str(it["used_quantity"]))
-                fl.consume(used_qty)
-                FoodLogUsage.objects.create(
-                    user=request.user,
-                    recipe=recipe,
-                    foodlog=fl,
-                    used_quantity=used_qty,
-                )
-
+        except ConsumptionError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             {"detail": "Consumption recorded successfully"},
@@ -413,56 +260,88 @@ def mealdb_random(request):
 
     n = max(1, min(n, 50))
 
-    qs = MealDBRecipe.objects.all()
-    total = qs.count()
-    if total == 0:
+    meals = sample_recipe_values(n, "mealdb_id", "title", "thumbnail", "category", "cuisine")
+    if not meals:
         return Response([] if n > 1 else {}, status=status.HTTP_204_NO_CONTENT)
 
-    n = min(n, total)
-    ids = list(qs.values_list("id", flat=True))
-    picked_ids = random.sample(ids, n)
-
-    meals = list(
-        MealDBRecipe.objects.filter(id__in=picked_ids).values(
-            "mealdb_id", "title", "thumbnail", "category", "cuisine"
-        )
-    )
-
     if n == 1:
         return Response(meals[0], status=status.HTTP_200_OK)
 
     return Response(meals, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+def recipe_search(request):
+    """
+    GET /recipes/search/?q=chicken curry&cuisine=Indian&meal_time=dinner&limit=20&offset=0
+    Full-text (+ typo-tolerant title) search over the catalog.
+    No total count: `next_offset` is null on the last page.
+    """
+    params = request.query_params
+    try:
+        limit = max(1, min(int(params.get("limit", 20)), 50))
+        offset = max(0, min(int(params.get("offset", 0)), 1000))
+    except (TypeError, ValueError):
+        return Response({"detail": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    qs = search_recipes(
+        params.get("q", ""),
+        {f: (params.get(f) or "").strip() for f in SEARCH_FILTER_FIELDS},
+    )
+    rows = list(
+        qs.values("id", "mealdb_id", "title", "thumbnail", "category", "cuisine", "meal_time", "difficulty")[
+            offset: offset + limit + 1
+        ]
+    )
+    has_more = len(rows) > limit
+
+    results = [
+        {
+            "recipe_id": r["id"],
+            "mealdb_id": r["mealdb_id"],
+            "title": r["title"],
+            "thumbnail": r["thumbnail"],
+            "category": r["category"],
+            "cuisine": r["cuisine"],
+            "mealTime": r["meal_time"],
+            "difficulty": r["difficulty"],
+        }
+        for r in rows[:limit]
+    ]
+    return Response(
+        {"results": results, "next_offset": offset + limit if has_more else None},
+        status=status.HTTP_200_OK,
+    )
+
+
 @api_view(["GET"])
 def mealdb_detail(request, mealdb_id: str):
-    
-    # Optional: cache this because it’s pure DB read (safe)
-    ck = detail_key(MEALDB_DETAIL_NAMESPACE, 0, int(_safe_int_hash(mealdb_id)))
-    cached = cache.get(ck)
-    if cached is not None:
-        return Response(cached, status=status.HTTP_200_OK)
-
-    meal = get_object_or_404(MealDBRecipe, mealdb_id=mealdb_id)
-
-    data = {
-        "recipe_id": meal.id,
-        "mealdb_id": meal.mealdb_id,
-        "title": meal.title,
-        "category": meal.category,
-        "cuisine": meal.cuisine,
-        "instructions": meal.instructions,
-        "thumbnail": meal.thumbnail,
-        "tags": meal.tags,
-        "ingredients": meal.ingredients,
-        "mealTime": meal.meal_time,
-        "difficulty": meal.difficulty,
-        "created_at": meal.created_at,
-        "updated_at": meal.updated_at,
-    }
+    """
+    GET /mealdb/<mealdb_id>/
+    Served from the recipe-card cache; honours If-None-Match / If-Modified-Since.
+    """
+    card = recipe_cache.get(mealdb_id)
+    if card is None:
+        raise Http404("No MealDBRecipe matches the given query.")
+
+    etag = recipe_cache.card_etag(card)
+    updated = card.get("updated_at")
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(updated.timestamp()) if updated else None,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    resp = Response(card, status=status.HTTP_200_OK)
+    resp["ETag"] = etag
+    last_modified = recipe_cache.card_last_modified(card)
+    if last_modified:
+        resp["Last-Modified"] = last_modified
+    return resp
+
 
-    cache.set(ck, data, timeout=60 * 10)  # 10 minutes
-    return Response(data, status=status.HTTP_200_OK)
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def add_to_favorites(request):